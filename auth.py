@@ -1,3 +1,8 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -34,3 +39,65 @@ def verify_token(token: str):
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+# --- Cache des tokens déjà vérifiés ---
+# Le même token revient à chaque requête d'une session du dashboard : on garde le
+# payload des tokens valides (clef = sha256 du token, pas le token lui-même) jusqu'à
+# leur propre "exp", dans un LRU borné à TOKEN_CACHE_SIZE entrées.
+class VerifiedTokenCache:
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # digest -> (exp, payload)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes):
+        with self._lock:
+            entry = self._data.get(digest)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._data.move_to_end(digest)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[digest]
+            self.misses += 1
+            return None
+
+    def put(self, digest: bytes, payload: dict):
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return  # token sans expiration : on ne le garde pas
+        with self._lock:
+            self._data[digest] = (exp, payload)
+            self._data.move_to_end(digest)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(int(os.environ.get("TOKEN_CACHE_SIZE", 4096)))
+
+
+def verify_token_cached(token: str):
+    """Comme verify_token, sans re-décoder un token déjà vérifié et pas encore expiré."""
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = verify_token(token)  # lève 401 si invalide (jamais mis en cache)
+        token_cache.put(digest, payload)
+    return dict(payload)
@@ -0,0 +1,98 @@
+# auth_middleware.py
+# Vérification du JWT pour toutes les routes, en middleware ASGI pur.
+#
+# Remplace l'ancien @app.middleware("http") (BaseHTTPMiddleware) : pas de Request
+# construite, pas de réponse ré-emballée (le streaming passe tel quel), et un
+# token absent / invalide donne un vrai 401 au lieu d'une HTTPException levée
+# dans le middleware (qui sortait en 500).
+import json
+import time
+
+from fastapi import HTTPException
+
+import metrics
+from auth import verify_token_cached
+
+# Routes accessibles sans token : doc / openapi, obtention du token, création de
+# compte (POST /users), la liste des lignes (GET /api/allline, utilisée par le front public),
+# et les métriques (GET /metrics) seulement avec METRICS_PUBLIC=1
+EXEMPT_PREFIXES = ("/docs", "/openapi.json", "/redoc")
+EXEMPT_ROUTES = frozenset({
+    (None, "/token"),  # None = toutes les méthodes
+    ("POST", "/users"),
+    ("GET", "/api/allline"),
+} | ({("GET", "/metrics")} if metrics.PUBLIC else set()))
+
+
+def _unauthorized(detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    return (
+        {
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"www-authenticate", b"Bearer"),
+            ],
+        },
+        {"type": "http.response.body", "body": body},
+    )
+
+
+# réponses 401 pré-construites (les messages ASGI ne sont pas modifiés par les serveurs)
+MISSING_HEADER = _unauthorized("Missing authorization header")
+BAD_FORMAT = _unauthorized("Invalid authorization header format")
+BAD_SCHEME = _unauthorized("Invalid auth scheme")
+
+
+class JWTAuthMiddleware:
+    def __init__(self, app, exempt_routes=EXEMPT_ROUTES, exempt_prefixes=EXEMPT_PREFIXES):
+        self.app = app
+        self.exempt_routes = frozenset(exempt_routes)
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    def _exempt(self, method: str, path: str) -> bool:
+        return (
+            (method, path) in self.exempt_routes
+            or (None, path) in self.exempt_routes
+            or path.startswith(self.exempt_prefixes)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._exempt(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                break
+
+        if not auth_header:
+            return await self._reject(send, MISSING_HEADER)
+        parts = auth_header.split()
+        if len(parts) != 2:
+            return await self._reject(send, BAD_FORMAT)
+        scheme, token = parts
+        if scheme.lower() != "bearer":
+            return await self._reject(send, BAD_SCHEME)
+
+        try:
+            # cache des tokens vérifiés (auth.token_cache) : pas de décodage si déjà vu
+            verify_token_cached(token)
+        except HTTPException as e:
+            return await self._reject(send, _unauthorized(e.detail))
+
+        timings = metrics.current()
+        if timings is not None:
+            timings.auth = time.perf_counter() - started
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send, messages):
+        start, body = messages
+        await send(start)
+        await send(body)
@@ -0,0 +1,206 @@
+# batch.py
+# POST /api/batch : une liste de créations / modifications / suppressions de
+# catégories, lignes et arrêts, appliquée dans une seule transaction.
+#
+# Les opérations consécutives de même nature (ex. 40 "update stop" à la suite)
+# partent en une seule requête SQL : INSERT multi-lignes avec RETURNING des ids,
+# UPDATE par clef primaire en executemany, DELETE ... WHERE id IN (...). Les ids
+# visés par un groupe d'update / delete sont vérifiés par un seul SELECT.
+# Une opération refusée annule tout le lot (rien n'est écrit) : l'erreur indique
+# les index des opérations en cause.
+#
+# Une création peut porter un "ref" : les opérations suivantes s'en servent comme
+# category_id / line_id sous la forme "$ref" (ex. créer une ligne puis ses arrêts).
+#
+# Pas de décalage automatique des stop_order comme dans add_stop / remove_stop :
+# le client envoie les ordres voulus.
+import os
+from datetime import datetime, time
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+import topology
+from models import categories, TransportLine, Stop
+from schemas.schemas import (
+    CategoryCreate, CategoryUpdate, TransportLineCreate, TransportLineUpdate, StopCreate, StopUpdate,
+)
+from writes import INVALID_TIME, NAME_TAKEN, integrity_http_error, parse_times
+
+MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", 1000))
+REF_FIELDS = ("category_id", "line_id")
+
+
+class Entity:
+    def __init__(self, model, table, create, update, not_found, foreign_key, in_use):
+        self.model = model
+        self.table = table  # nom pour topology.notify
+        self.create = create
+        self.update = update
+        self.not_found = not_found
+        self.foreign_key = foreign_key  # (status, message) si la table référencée n'a pas l'id
+        self.in_use = in_use            # message si une suppression est bloquée par une clef étrangère
+
+
+ENTITIES = {
+    "category": Entity(categories, topology.CATEGORY, CategoryCreate, CategoryUpdate,
+                       "Catégorie non trouvée", None, "Catégorie utilisée par des lignes"),
+    "line": Entity(TransportLine, topology.LINE, TransportLineCreate, TransportLineUpdate,
+                   "Ligne non trouvée", (404, "Catégorie non trouvée"), "Ligne utilisée par des arrêts"),
+    "stop": Entity(Stop, topology.STOP, StopCreate, StopUpdate,
+                   "Arrêt non trouvé", (404, "Ligne de transport non trouvée"), None),
+}
+
+
+def _fail(status, message, indexes):
+    raise HTTPException(status_code=status, detail={"error": message, "operations": indexes})
+
+
+def _groups(operations):
+    """Suites d'opérations consécutives de même (op, entity), avec leur index dans le lot."""
+    group = []
+    for index, operation in enumerate(operations):
+        if group and (operation.op, operation.entity) != (group[0][1].op, group[0][1].entity):
+            yield group
+            group = []
+        group.append((index, operation))
+    if group:
+        yield group
+
+
+def _values(entity, index, operation, refs) -> dict:
+    """Champs de l'opération validés par le schéma Create / Update de l'entité, "$ref" remplacés."""
+    data = dict(operation.data)
+    for name in REF_FIELDS:
+        value = data.get(name)
+        if isinstance(value, str) and value.startswith("$"):
+            if value[1:] not in refs:
+                _fail(400, f"référence inconnue : {value}", [index])
+            data[name] = refs[value[1:]]
+
+    schema = entity.create if operation.op == "create" else entity.update
+    try:
+        values = schema.model_validate(data).model_dump()
+        if entity.model is TransportLine and operation.op == "create":
+            values["start_time"] = values["start_time"] or time(5, 0)
+            values["end_time"] = values["end_time"] or time(23, 0)
+            values["created_at"] = datetime.utcnow()
+        values = parse_times(values)
+    except ValidationError as e:
+        error = e.errors()[0]
+        _fail(422, f"{'.'.join(map(str, error['loc']))} : {error['msg']}", [index])
+    except HTTPException:
+        # heure invalide (parse_times) : même erreur, avec l'index de l'opération
+        _fail(422, INVALID_TIME, [index])
+
+    if operation.op == "update":
+        values = {name: value for name, value in values.items() if value is not None}
+    return values
+
+
+def _check_ids(session, entity, group):
+    missing = [index for index, operation in group if operation.id is None]
+    if missing:
+        _fail(400, "id obligatoire pour update / delete", missing)
+    model = entity.model
+    ids = {operation.id for _, operation in group}
+    found = set(session.execute(select(model.id).where(model.id.in_(ids))).scalars())
+    missing = [index for index, operation in group if operation.id not in found]
+    if missing:
+        _fail(404, entity.not_found, missing)
+
+
+def _check_names(session, model, renames):
+    """renames = [(index, id, nouveau nom)] : 400 si le nom est déjà celui d'une autre
+    ligne (base ou lot), comme update_category / update_line. Les noms ne sont pas uniques
+    en base : un seul SELECT pour tout le groupe."""
+    taken = {}
+    statement = select(model.id, model.name).where(model.name.in_({name for _, _, name in renames}))
+    for row_id, name in session.execute(statement):
+        taken.setdefault(name, set()).add(row_id)
+    conflicts = []
+    for index, row_id, name in renames:
+        if taken.setdefault(name, set()) - {row_id}:
+            conflicts.append(index)
+        taken[name].add(row_id)
+    if conflicts:
+        _fail(400, NAME_TAKEN, conflicts)
+
+
+def _insert(session, model, rows) -> list:
+    if session.get_bind().dialect.insert_executemany_returning:
+        # un INSERT multi-lignes : les ids auto-incrémentés y sont attribués dans l'ordre
+        # des VALUES (SQLite : rowid max + 1 ; InnoDB : insert "simple", ids consécutifs),
+        # il suffit de les trier pour les faire correspondre aux opérations.
+        # (sort_by_parameter_order=True repasserait à un INSERT par ligne sur ces deux bases)
+        return sorted(session.execute(insert(model).returning(model.id), rows).scalars())
+    # sans RETURNING multi-lignes (MySQL, MariaDB < 10.5) : un INSERT par ligne
+    return [session.execute(insert(model).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+def _run_group(session, entity, group, refs) -> list:
+    """Exécute un groupe, renvoie les ids touchés dans l'ordre du groupe."""
+    action = group[0][1].op
+    model = entity.model
+
+    if action == "create":
+        rows = [_values(entity, index, operation, refs) for index, operation in group]
+        ids = _insert(session, model, rows)
+        for (index, operation), new_id in zip(group, ids):
+            if operation.ref is not None:
+                if operation.ref in refs:
+                    _fail(400, f"ref déjà utilisée dans le lot : {operation.ref}", [index])
+                refs[operation.ref] = new_id
+        return ids
+
+    _check_ids(session, entity, group)
+    ids = [operation.id for _, operation in group]
+
+    if action == "update":
+        rows = []
+        renames = []
+        for index, operation in group:
+            values = _values(entity, index, operation, refs)
+            if values:
+                rows.append({"id": operation.id, **values})
+            if "name" in values and model is not Stop:
+                renames.append((index, operation.id, values["name"]))
+        if renames:
+            _check_names(session, model, renames)
+        if rows:
+            session.execute(update(model), rows)
+    else:
+        session.execute(delete(model).where(model.id.in_(ids)), execution_options={"synchronize_session": False})
+    return ids
+
+
+def apply(session, operations) -> list:
+    """Applique le lot et commit ; HTTPException (rien n'est écrit) si une opération est refusée."""
+    if len(operations) > MAX_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"Au plus {MAX_OPERATIONS} opérations par lot")
+
+    refs = {}     # ref -> id créé plus haut dans le lot
+    touched = {}  # table -> ids, pour topology.notify après le commit
+    results = []
+    for group in _groups(operations):
+        entity = ENTITIES[group[0][1].entity]
+        try:
+            ids = _run_group(session, entity, group, refs)
+        except IntegrityError as e:
+            # la base ne dit pas quelle ligne du groupe est en cause : on renvoie tout le groupe
+            if group[0][1].op == "delete":
+                error = HTTPException(status_code=400, detail=entity.in_use or "Contrainte de la base non respectée")
+            else:
+                error = integrity_http_error(e, entity.foreign_key)
+            _fail(error.status_code, error.detail, [index for index, _ in group])
+        touched.setdefault(entity.table, []).extend(ids)
+        for (index, operation), row_id in zip(group, ids):
+            results.append({"index": index, "op": operation.op, "entity": operation.entity, "id": row_id})
+
+    session.commit()
+    for table, ids in touched.items():
+        topology.notify(table, ids)
+    return results
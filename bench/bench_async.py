@@ -0,0 +1,128 @@
+# bench/bench_async.py
+# Compare le débit (requêtes/s) du chemin sync (thread pool anyio) et du chemin
+# async (AsyncSession) sur une base SQLite locale, à forte concurrence.
+#
+# Usage : python bench/bench_async.py --concurrency 200 --requests 5000 --db-latency-ms 100
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_db_latency(sync_engine, ms, event):
+    # SQLite répond en quelques µs : pour simuler l'aller-retour réseau vers MariaDB,
+    # chaque SELECT appelle une fonction SQL qui dort `ms` millisecondes.
+    # Elle s'exécute dans le thread du driver (thread anyio en sync, thread aiosqlite
+    # en async), comme l'attente d'une vraie socket.
+    @event.listens_for(sync_engine, "connect")
+    def register_pause(dbapi_conn, record):
+        dbapi_conn.create_function("db_pause", 1, lambda v: time.sleep(v / 1000) or 0)
+
+    @event.listens_for(sync_engine, "before_cursor_execute", retval=True)
+    def pause_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            statement = re.sub(r"\sFROM\s", f" FROM (SELECT db_pause({ms}) AS _pause), ", statement, count=1)
+        return statement, parameters
+
+
+def run_child(args):
+    # l'environnement (DATABASE_URL / DB_ASYNC) est fixé par le parent avant l'import
+    sys.path.insert(0, ROOT)
+    import httpx
+    from sqlmodel import SQLModel, Session
+    from sqlalchemy import event
+
+    import database
+    import main
+    from auth import create_access_token
+    from models import categories, TransportLine, Stop
+
+    # même taille de pool pour les deux modes ; en sync une requête garde sa connexion
+    # jusqu'au teardown de get_session (qui lui-même attend un thread du pool anyio),
+    # donc un pool plus petit que la concurrence finit en TimeoutError
+    database.engine = database.make_engine(pool_size=args.pool_size, max_overflow=0)
+    if database.USE_ASYNC_DB:
+        database.async_session_maker.kw["bind"] = database.make_async_engine(pool_size=args.pool_size, max_overflow=0)
+    if args.db_latency_ms:
+        add_db_latency(database.engine, args.db_latency_ms, event)
+        if database.USE_ASYNC_DB:
+            add_db_latency(database.async_session_maker.kw["bind"].sync_engine, args.db_latency_ms, event)
+    SQLModel.metadata.create_all(database.engine)
+    with Session(database.engine) as session:
+        session.add(categories(name="Métro"))
+        session.commit()
+        for i in range(args.lines):
+            session.add(TransportLine(name=f"L{i}", category_id=1))
+        session.commit()
+        for i in range(args.lines * 20):
+            session.add(Stop(line_id=i % args.lines + 1, name=f"S{i}", latitude=43.6, longitude=1.44, stop_order=i))
+        session.commit()
+
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+    nb_stops = args.lines * 20
+
+    async def load():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            queue = asyncio.Queue()
+            for i in range(args.requests):
+                queue.put_nowait(i)
+
+            async def worker():
+                while not queue.empty():
+                    i = queue.get_nowait()
+                    r = await client.get(f"/api/stop/{i % nb_stops + 1}", headers=headers)
+                    assert r.status_code == 200, r.text
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(load())
+    print(json.dumps({"requests": args.requests, "elapsed_s": elapsed, "rps": args.requests / elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=None, help="par défaut = concurrency")
+    parser.add_argument("--db-latency-ms", type=float, default=100, help="latence simulée par SELECT (0 = aucune)")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+    if args.pool_size is None:
+        args.pool_size = args.concurrency
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = {}
+    for mode, flag in (("sync", "0"), ("async", "1")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", DB_ASYNC=flag)
+            out = subprocess.run(
+                [sys.executable, __file__, "--child",
+                 "--concurrency", str(args.concurrency),
+                 "--requests", str(args.requests),
+                 "--lines", str(args.lines),
+                 "--pool-size", str(args.pool_size),
+                 "--db-latency-ms", str(args.db_latency_ms)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:5s} : {results[mode]['rps']:8.1f} req/s ({results[mode]['elapsed_s']:.2f}s)")
+
+    print(f"gain async / sync : x{results['async']['rps'] / results['sync']['rps']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# bench/bench_auth.py
+# Coût de la vérification du token par requête : jose (décodage + HMAC à chaque
+# fois) contre le cache des tokens vérifiés (auth.verify_token_cached).
+#
+# Usage : python bench/bench_auth.py --requests 50000 --sessions 50
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import create_access_token, verify_token, verify_token_cached, token_cache
+
+
+def per_call_us(fn, tokens, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--sessions", type=int, default=50, help="nombre de tokens distincts en circulation")
+    args = parser.parse_args()
+
+    tokens = [create_access_token({"sub": str(i), "email": f"user{i}@example.com"}) for i in range(args.sessions)]
+
+    before = per_call_us(verify_token, tokens, args.requests)
+    token_cache.clear()
+    after = per_call_us(verify_token_cached, tokens, args.requests)
+
+    print(f"verify_token        : {before:7.2f} µs / requête")
+    print(f"verify_token_cached : {after:7.2f} µs / requête  (x{before / after:.1f})")
+    print(f"cache : {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench/bench_fastjson.py
+# GET /api/allstop sur 100k arrêts : chemin normal (modèles ORM + StopRead +
+# jsonable_encoder) contre FAST_JSON (tuples de colonnes + orjson).
+#
+# Chaque requête vide le cache de topologie avant d'appeler l'endpoint, pour
+# mesurer le chargement + la sérialisation (pas un hit de cache). Le pic mémoire
+# est mesuré avec tracemalloc sur une requête.
+#
+# Usage : python bench/bench_fastjson.py --stops 100000 --runs 5
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stops", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_fastjson.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("DB_ASYNC", None)
+    sys.path.insert(0, ROOT)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from sqlmodel import SQLModel, Session
+
+    import database
+    import fastjson
+    import main as app_module
+    from auth import create_access_token
+    from cache import topology_cache
+    from models import categories, TransportLine, Stop
+
+    SQLModel.metadata.create_all(database.engine)
+    with Session(database.engine) as session:
+        session.add(categories(name="Bus"))
+        session.commit()
+        session.execute(insert(TransportLine), [{"name": f"L{i}", "category_id": 1} for i in range(100)])
+        session.execute(insert(Stop), [
+            {"line_id": i % 100 + 1, "name": f"Arrêt {i}", "latitude": 43.5 + i * 1e-6,
+             "longitude": 1.4 + i * 1e-6, "stop_order": i // 100}
+            for i in range(args.stops)
+        ])
+        session.commit()
+
+    client = TestClient(app_module.app)
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+    print(f"{args.stops} arrêts, orjson {'installé' if fastjson.orjson else 'absent (json standard)'}")
+
+    bodies = {}
+    for fast in (False, True):
+        fastjson.ENABLED = fast
+        timings = []
+        for _ in range(args.runs):
+            topology_cache.clear()
+            start = time.perf_counter()
+            r = client.get("/api/allstop", headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert r.status_code == 200
+        bodies[fast] = r.json()
+
+        topology_cache.clear()
+        tracemalloc.start()
+        client.get("/api/allstop", headers=headers)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        name = "FAST_JSON" if fast else "normal"
+        print(f"{name:10s}: médiane {statistics.median(timings):7.0f} ms  min {min(timings):7.0f} ms  "
+              f"pic mémoire {peak / 2**20:6.1f} Mo  ({len(r.content) / 2**20:.1f} Mo de JSON)")
+
+    assert bodies[False] == bodies[True], "les deux modes doivent renvoyer le même JSON"
+
+
+if __name__ == "__main__":
+    main()
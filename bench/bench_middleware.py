@@ -0,0 +1,134 @@
+# bench/bench_middleware.py
+# Coût par requête du middleware d'authentification : ancien jwt_middleware
+# (@app.middleware("http") = BaseHTTPMiddleware) contre JWTAuthMiddleware (ASGI pur),
+# et surcoût des métriques (metrics.MetricsMiddleware + TimedRoute) par-dessus.
+#
+# Les deux versions protègent la même petite app FastAPI ; les requêtes sont
+# envoyées directement en ASGI (sans serveur ni client HTTP) pour ne mesurer que
+# la pile de middlewares. Le token est le même à chaque requête (cache des
+# tokens actif dans les deux cas).
+#
+# Usage : python bench/bench_middleware.py --requests 20000
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, HTTPException, Request
+
+from auth import create_access_token, verify_token_cached
+from auth_middleware import JWTAuthMiddleware
+import metrics
+
+
+def make_app(route_class=None):
+    app = FastAPI()
+    if route_class is not None:
+        app.router.route_class = route_class
+
+    @app.get("/api/ping")
+    def ping():
+        return {"ok": True}
+
+    return app
+
+
+def app_base_http():
+    app = make_app()
+
+    # version précédente de main.py, à l'identique
+    @app.middleware("http")
+    async def jwt_middleware(request: Request, call_next):
+        path = request.url.path
+        if (
+            path.startswith("/docs")
+            or path.startswith("/openapi.json")
+            or path.startswith("/redoc")
+            or path == "/token"
+            or (path == "/users" and request.method == "POST")
+            or (path == "/api/allline" and request.method == "GET")
+        ):
+            return await call_next(request)
+        auth_header = request.headers.get("authorization")
+        if not auth_header:
+            raise HTTPException(status_code=401, detail="Missing authorization header")
+        try:
+            scheme, token = auth_header.split()
+        except ValueError:
+            raise HTTPException(status_code=401, detail="Invalid authorization header format")
+        if scheme.lower() != "bearer":
+            raise HTTPException(status_code=401, detail="Invalid auth scheme")
+        verify_token_cached(token)
+        return await call_next(request)
+
+    return app
+
+
+def app_asgi():
+    app = make_app()
+    app.add_middleware(JWTAuthMiddleware)
+    return app
+
+
+def app_asgi_metrics():
+    app = make_app(metrics.TimedRoute)
+    app.add_middleware(JWTAuthMiddleware)
+    app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+async def call(app, headers):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/ping", "raw_path": b"/api/ping",
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    try:
+        await app(scope, receive, send)
+    except HTTPException:
+        pass  # BaseHTTPMiddleware : l'exception remonte après la réponse 500
+    return status
+
+
+async def run(app, headers, n):
+    status = await call(app, headers)  # démarrage de la pile de middlewares
+    start = time.perf_counter()
+    for _ in range(n):
+        await call(app, headers)
+    return (time.perf_counter() - start) / n * 1e6, status
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    token = create_access_token({"sub": "1"})
+    cases = [
+        ("token valide", [(b"authorization", f"Bearer {token}".encode())]),
+        ("sans token", []),
+    ]
+    apps = [("BaseHTTPMiddleware", app_base_http()), ("ASGI pur", app_asgi()), ("ASGI pur + métriques", app_asgi_metrics())]
+    for label, headers in cases:
+        print(f"--- {label}")
+        for name, app in apps:
+            us, status = await run(app, headers, args.requests)
+            print(f"{name:20s}: {us:7.1f} µs / requête  (HTTP {status})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+# bench/bench_route.py
+# Temps de calcul d'itinéraire (routing.TransitGraph) sur un réseau synthétique
+# autour de Toulouse (densité STOPS_PER_KM2) : lignes droites (avec quelques virages) d'arrêts espacés de
+# ~400 m, correspondances à pied entre lignes qui se croisent.
+#
+# Compare A* (vol d'oiseau seul, puis avec les repères ALT) à Dijkstra (même
+# graphe, sans heuristique) et vérifie que tous trouvent la même durée ; mesure aussi la mise à jour d'une ligne (écriture).
+#
+# Usage : python bench/bench_route.py --lines 1000 --stops-per-line 50 --queries 300
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import routing
+from spatial import METERS_PER_DEG_LAT
+
+CENTER_LAT, CENTER_LON = 43.6045, 1.4440
+SPACING_M = 400
+STOPS_PER_KM2 = 4   # densité d'un grand réseau urbain + périurbain (~40k arrêts sur ~10 000 km²)
+
+
+def synthetic_lines(n_lines, stops_per_line, rnd):
+    # surface proportionnelle au nombre d'arrêts
+    spread_m = math.sqrt(n_lines * stops_per_line / STOPS_PER_KM2) * 1000 / 2
+    kx = METERS_PER_DEG_LAT * math.cos(math.radians(CENTER_LAT))
+    lines = {}
+    stop_id = 1
+    for line_id in range(1, n_lines + 1):
+        x, y = rnd.uniform(-spread_m, spread_m), rnd.uniform(-spread_m, spread_m)
+        heading = rnd.uniform(0, 2 * math.pi)
+        rows = []
+        for i in range(stops_per_line):
+            rows.append((stop_id, f"L{line_id}-{i}", CENTER_LAT + y / METERS_PER_DEG_LAT, CENTER_LON + x / kx))
+            stop_id += 1
+            heading += rnd.gauss(0, 0.15)
+            x = max(-spread_m, min(spread_m, x + SPACING_M * math.cos(heading)))
+            y = max(-spread_m, min(spread_m, y + SPACING_M * math.sin(heading)))
+        lines[line_id] = rows
+    return lines
+
+
+def dijkstra_cost(graph, source, target):
+    # même recherche sans heuristique : vitesse "infinie" et pas de repères => minorant nul
+    saved = graph.ride_speed, graph.walk_speed, graph.landmarks
+    graph.ride_speed = graph.walk_speed = math.inf
+    graph.landmarks = None
+    try:
+        return graph.shortest_path(source, target)
+    finally:
+        graph.ride_speed, graph.walk_speed, graph.landmarks = saved
+
+
+def timed(fn, pairs):
+    durations, results = [], []
+    for source, target in pairs:
+        start = time.perf_counter()
+        results.append(fn(source, target))
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations, results
+
+
+def describe(durations):
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"moy {statistics.mean(ordered):7.2f} ms | p50 {statistics.median(ordered):7.2f} ms | p95 {p95:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1000)
+    parser.add_argument("--stops-per-line", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--landmarks", type=int, default=routing.LANDMARKS)
+    parser.add_argument("--dijkstra-queries", type=int, default=30, help="Dijkstra est lent")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    lines = synthetic_lines(args.lines, args.stops_per_line, rnd)
+
+    start = time.perf_counter()
+    graph = routing.TransitGraph(ref_lat=CENTER_LAT)
+    for line_id, rows in lines.items():
+        graph.set_line(line_id, rows)
+    graph.link(list(graph.stops))
+    print(f"construction : {(time.perf_counter() - start) * 1000:.0f} ms pour {len(graph.stops)} arrêts, "
+          f"{graph.edge_count()} arêtes")
+
+    start = time.perf_counter()
+    table = routing.landmark_table(graph.adjacency(), args.landmarks)
+    print(f"repères ALT ({args.landmarks}) : {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    ids = list(graph.stops)
+    pairs = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(args.queries)]
+
+    def astar(source, target):
+        found = graph.shortest_path(source, target)
+        explored.append(graph.last_explored)
+        return found
+
+    # A* avec la seule distance à vol d'oiseau (repères pas encore à jour), puis avec les repères
+    results = {}
+    for label, landmarks in (("A*      ", None), ("A* + ALT", table)):
+        graph.set_landmarks(graph.version, landmarks)
+        explored = []
+        astar_ms, results[label] = timed(astar, pairs)
+        reachable = sum(r is not None for r in results[label])
+        print(f"{label} {describe(astar_ms)} | {statistics.mean(explored):,.0f} nœuds visités en moyenne "
+              f"({reachable}/{len(pairs)} trajets possibles)")
+
+    sample = pairs[:args.dijkstra_queries]
+    dijkstra_ms, dijkstra_results = timed(lambda s, t: dijkstra_cost(graph, s, t), sample)
+    print(f"Dijkstra {describe(dijkstra_ms)}")
+    for label, found in results.items():
+        for (source, target), a, d in zip(sample, found, dijkstra_results):
+            assert (a is None) == (d is None), (label, source, target)
+            assert a is None or abs(a[0] - d[0]) < 1e-6, f"{label} {source} -> {target} : {a[0]} != Dijkstra {d[0]}"
+
+    # écriture sur une ligne : on la replace entièrement avec ses correspondances
+    line_id = rnd.choice(list(lines))
+    start = time.perf_counter()
+    graph.link(graph.set_line(line_id, lines[line_id]))
+    print(f"mise à jour d'une ligne ({args.stops_per_line} arrêts) : {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# bench/bench_search.py
+# Latence de la recherche par nom (search.NameIndex) à chaque frappe, sur des
+# noms d'arrêts synthétiques ("Place de l'Église 12", "Hôtel de Ville"...).
+# Chaque requête est un début de nom tapé lettre par lettre ; les requêtes
+# « faute de frappe » (deux lettres inversées) passent par les trigrammes.
+# Comparé à un parcours de tous les noms, et mesure des mises à jour une par une.
+#
+# Code de sortie 1 si le p99 par frappe dépasse le budget.
+#
+# Usage : python bench/bench_search.py --names 100000 --queries 300 --budget-ms 5
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import NameIndex, STOP, normalize
+
+KINDS = ["Gare", "Place", "Rue", "Avenue", "Boulevard", "Allées", "Pont", "Lycée", "Collège", "Église",
+         "Hôpital", "Parc", "Quai", "Porte", "Cité", "Résidence", "Marché", "Château", "Rond-point", "Impasse"]
+NAMES = ["de Lyon", "de l'Hôtel de Ville", "Jean Jaurès", "Victor Hugo", "Saint-Cyprien", "des Carmes",
+         "Matabiau", "Arènes", "Compans-Caffarelli", "Esquirol", "Capitole", "François Verdier", "Jeanne d'Arc",
+         "Marengo", "Saint-Agne", "Empalot", "Mirail", "Borderouge", "Minimes", "Barrière de Paris",
+         "Pierre Baudis", "Saint-Michel", "Rangueil", "Ramonville", "Balma", "Colomiers", "Blagnac",
+         "Émile Zola", "Clémence Isaure", "Ozenne", "Hérédia", "Bellefontaine", "Reynerie", "Fontaine Lumineuse"]
+
+
+SYLLABLES = ["bor", "de", "rou", "ge", "mi", "rail", "ca", "pi", "tol", "san", "cy", "prien", "mar", "en", "go",
+             "lan", "gue", "doc", "ver", "dier", "fon", "taine", "bel", "vue", "sa", "bla", "gnac", "col", "mier",
+             "lé", "on", "ar", "nau", "be", "rna", "dé", "ro", "mon", "ville", "cas", "tel", "gi", "nes", "tou"]
+
+
+def vocabulary(count, rnd):
+    # noms propres inventés (2 à 4 syllabes) : un vrai réseau a des milliers de noms de rues
+    words = set()
+    while len(words) < count:
+        words.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize())
+    return sorted(words)
+
+
+def synthetic_names(count, rnd):
+    # noms les plus courants très fréquents (NAMES), les autres tirés d'un grand vocabulaire
+    proper = vocabulary(max(count // 10, 100), rnd)
+    names = []
+    for _ in range(count):
+        name = f"{rnd.choice(KINDS)} {rnd.choice(NAMES) if rnd.random() < 0.3 else rnd.choice(proper)}"
+        if rnd.random() < 0.5:
+            name += f" {rnd.choice(proper)}"
+        if rnd.random() < 0.2:
+            name += f" {rnd.randrange(1, 100)}"
+        names.append(name)
+    return names
+
+
+def typo(name, rnd):
+    """(nom avec deux lettres voisines inversées dans son mot le plus long, ce mot normalisé)."""
+    words = name.split()
+    w = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[w]
+    if len(word) > 3:
+        i = rnd.randrange(1, len(word) - 2)
+        words[w] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return " ".join(words), normalize(word)
+
+
+def brute(normalized, query, limit):
+    tokens = normalize(query).split()
+    return [i for i, words in enumerate(normalized)
+            if all(any(w.startswith(t) for w in words) for t in tokens)][:limit]
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))]
+    return sum(values) / len(values), pick(50), pick(95), pick(99), values[-1]
+
+
+def timed_queries(index, queries, limit):
+    durations = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, limit)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=300, help="noms tapés lettre par lettre")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--brute-queries", type=int, default=50, help="le parcours complet est lent")
+    parser.add_argument("--budget-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    names = synthetic_names(args.names, rnd)
+
+    start = time.perf_counter()
+    index = NameIndex(((STOP, i), name, None) for i, name in enumerate(names))
+    build_s = time.perf_counter() - start
+    print(f"{args.names} noms : construction {build_s:.2f} s, {len(index.words)} mots, {len(index.postings)} trigrammes")
+
+    targets = rnd.sample(names, args.queries)
+    keystrokes = [t[:n] for t in targets for n in range(1, len(t) + 1) if not t[:n].endswith(" ")]
+    typos, mistyped = zip(*(typo(t, rnd) for t in targets))
+
+    results = {}
+    for label, queries in (("frappe (préfixe)", keystrokes), ("faute de frappe", typos)):
+        results[label] = percentiles(timed_queries(index, queries, args.limit))
+        mean, p50, p95, p99, worst = results[label]
+        print(f"{label:17s}: {len(queries):6d} requêtes | moy {mean:.3f} ms, p50 {p50:.3f}, p95 {p95:.3f}, "
+              f"p99 {p99:.3f}, max {worst:.2f} ms")
+
+    # premier résultat qui contient le mot mal tapé (les noms se ressemblent : le nom exact n'est pas forcément 1er)
+    found = 0
+    for q, word in zip(typos, mistyped):
+        hits = index.search(q, args.limit)
+        found += bool(hits) and word in normalize(hits[0][1]).split()
+    print(f"faute de frappe   : mot corrigé dans le 1er résultat pour {found}/{len(typos)} requêtes")
+
+    normalized = [normalize(name).split() for name in names]
+    sample = keystrokes[::max(1, len(keystrokes) // args.brute_queries)][:args.brute_queries]
+    start = time.perf_counter()
+    for q in sample:
+        brute(normalized, q, args.limit)
+    print(f"parcours complet  : {(time.perf_counter() - start) / len(sample) * 1000:.2f} ms/requête (préfixes seulement)")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.insert((STOP, args.names + i), f"Arrêt ajouté {i}")
+    for i in range(1000):
+        index.remove((STOP, args.names + i))
+    print(f"mise à jour       : {(time.perf_counter() - start) / 2000 * 1000:.3f} ms par ajout / suppression")
+
+    p99 = max(r[3] for r in results.values())
+    ok = p99 <= args.budget_ms
+    print(f"{'ok' if ok else 'DÉPASSÉ'} : p99 {p99:.2f} ms pour un budget de {args.budget_ms} ms par frappe")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench/bench_service_hours.py
+# Compare l'index d'intervalles des horaires de service (service_hours.IntervalIndex)
+# à un parcours de toutes les lignes, pour des réseaux de taille croissante.
+# Chaque catégorie garde ~50 lignes : avec ?category_id= le nombre de lignes
+# trouvées reste le même, le temps de l'index ne doit pas grandir avec le réseau.
+#
+# Usage : python bench/bench_service_hours.py --lines 1000,10000,100000 --queries 2000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service_hours import IntervalIndex, MINUTES_PER_DAY, service_ranges
+
+LINES_PER_CATEGORY = 50
+OVERNIGHT_SHARE = 0.1  # part des services qui passent minuit
+
+
+def synthetic_lines(count, rnd):
+    lines = []
+    for line_id in range(1, count + 1):
+        if rnd.random() < OVERNIGHT_SHARE:
+            start, end = rnd.randrange(20 * 60, 24 * 60, 5), rnd.randrange(0, 3 * 60, 5)
+        else:
+            start = rnd.randrange(4 * 60, 8 * 60, 5)
+            end = rnd.randrange(max(start, 18 * 60), 24 * 60, 5)
+        lines.append((line_id, rnd.randrange(count // LINES_PER_CATEGORY or 1), start, end))
+    return lines
+
+
+def brute(lines, minute, category_id=None):
+    return [line_id for line_id, cat, start, end in lines
+            if (category_id is None or cat == category_id)
+            and any(first <= minute <= last for first, last in service_ranges(start, end))]
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(minute, cat) for minute, cat in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", default="1000,10000,100000", help="tailles de réseau, séparées par des virgules")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--brute-queries", type=int, default=50, help="le parcours complet est lent")
+    args = parser.parse_args()
+
+    for count in (int(n) for n in args.lines.split(",")):
+        rnd = random.Random(42)
+        lines = synthetic_lines(count, rnd)
+        categories = count // LINES_PER_CATEGORY or 1
+
+        start = time.perf_counter()
+        index = IntervalIndex()
+        for line_id, cat, first, last in lines:
+            index.insert(line_id, cat, first, last)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        queries = [(rnd.randrange(MINUTES_PER_DAY), rnd.randrange(categories)) for _ in range(args.queries)]
+        sample = queries[:args.brute_queries]
+        index_ms, _ = timed(index.at, queries)
+        brute_ms, expected = timed(lambda m, c: brute(lines, m, c), sample)
+        _, got = timed(index.at, sample)
+        assert got == expected, "résultats différents"
+        all_ms, _ = timed(lambda m, c: index.at(m), queries[:200])
+        print(f"{count:7d} lignes | construction {build_ms:6.0f} ms | category_id : index {index_ms:7.3f} ms/requête, "
+              f"parcours {brute_ms:7.2f} ms/requête | toutes catégories : index {all_ms:6.2f} ms/requête")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench/bench_spatial.py
+# Compare l'index spatial en grille (spatial.GridIndex) à un parcours complet
+# avec haversine, sur un réseau synthétique autour de Toulouse.
+#
+# Usage : python bench/bench_spatial.py --stops 100000 --queries 1000
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial import GridIndex, haversine_m
+
+CENTER_LAT, CENTER_LON = 43.6045, 1.4440
+SPREAD_DEG = 0.5  # ~55 km autour du centre
+
+
+def brute_nearest(points, lat, lon, k):
+    return heapq.nsmallest(k, ((haversine_m(lat, lon, p[0], p[1]), i) for i, p in enumerate(points)))
+
+
+def brute_within(points, lat, lon, radius_m):
+    return sorted(d for d in ((haversine_m(lat, lon, p[0], p[1]), i) for i, p in enumerate(points)) if d[0] <= radius_m)
+
+
+def same_results(got, expected, tolerance_m=1e-6):
+    """Mêmes arrêts, dans le même ordre, pour chaque requête (listes vides comprises)."""
+    for hits, wanted in zip(got, expected, strict=True):
+        if [i for _, i in hits] != [i for _, i in wanted]:
+            return False
+        if any(abs(d - e) > tolerance_m for (d, _), (e, _) in zip(hits, wanted)):
+            return False
+    return True
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(lat, lon) for lat, lon in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stops", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--brute-queries", type=int, default=20, help="le parcours complet est lent")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--radius", type=float, default=500)
+    parser.add_argument("--cell-deg", type=float, default=0.01)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    points = [(CENTER_LAT + rnd.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER_LON + rnd.uniform(-SPREAD_DEG, SPREAD_DEG))
+              for _ in range(args.stops)]
+    queries = [(CENTER_LAT + rnd.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER_LON + rnd.uniform(-SPREAD_DEG, SPREAD_DEG))
+               for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    grid = GridIndex(args.cell_deg)
+    for i, (lat, lon) in enumerate(points):
+        grid.insert(i, lat, lon)
+    print(f"construction de l'index : {(time.perf_counter() - start) * 1000:.0f} ms pour {args.stops} arrêts")
+
+    sample = queries[:args.brute_queries]
+    for name, indexed, brute in (
+        (f"nearest k={args.k}", lambda la, lo: grid.nearest(la, lo, args.k), lambda la, lo: brute_nearest(points, la, lo, args.k)),
+        (f"within {args.radius:.0f} m", lambda la, lo: grid.within(la, lo, args.radius), lambda la, lo: brute_within(points, la, lo, args.radius)),
+    ):
+        grid_ms, _ = timed(indexed, queries)
+        brute_ms, expected = timed(brute, sample)
+        _, got = timed(indexed, sample)
+        assert same_results(got, expected), f"{name} : résultats différents"
+        print(f"{name:15s} grille {grid_ms:8.3f} ms/requête | parcours complet {brute_ms:8.1f} ms/requête | x{brute_ms / grid_ms:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
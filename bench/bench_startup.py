@@ -0,0 +1,96 @@
+# bench/bench_startup.py
+# Démarrage à froid d'un worker : import de main, startup de l'app, première
+# requête (GET /api/allline), chacun dans un nouveau process Python, sur une base
+# SQLite déjà migrée (le schéma est une étape à part : python migrations.py).
+#
+# Code de sortie 1 si la médiane (import + startup + première requête) dépasse
+# le budget : à lancer après un changement des imports ou du démarrage.
+#
+# Usage : python bench/bench_startup.py --runs 5 --budget-ms 1500 [--imports]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHILD = """
+import json, resource, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+client.__enter__()
+ready = time.perf_counter()
+status = client.get("/api/allline").status_code
+done = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (done - ready) * 1000,
+    "total_ms": (done - started) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "status": status,
+}))
+"""
+
+
+def run_child(env, importtime=False) -> tuple:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD]
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, top=10) -> list:
+    # lignes "import time: self | cumulative | module" ; on garde les paquets de premier niveau
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            if cumulative.isdigit() and not name.startswith(" ") and "." not in name:
+                rows.append((int(cumulative) / 1000, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("COLD_START_BUDGET_MS", 1500)))
+    parser.add_argument("--imports", action="store_true", help="affiche les imports les plus lents")
+    args = parser.parse_args()
+
+    import migrations
+    from database import make_engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/startup.db"
+        migrations.upgrade(make_engine(url))
+        env = dict(os.environ, DATABASE_URL=url, PYTHONWARNINGS="ignore")
+        env.pop("DB_AUTO_MIGRATE", None)
+
+        results = [run_child(env)[0] for _ in range(args.runs)]
+        for key in ("import_ms", "startup_ms", "first_request_ms", "total_ms", "rss_mb"):
+            values = [r[key] for r in results]
+            unit = "Mo" if key == "rss_mb" else "ms"
+            print(f"{key:18s}: médiane {statistics.median(values):7.1f} {unit}  (min {min(values):.1f}, max {max(values):.1f})")
+        if args.imports:
+            _, stderr = run_child(env, importtime=True)
+            print("imports les plus lents (cumulé) :")
+            for ms, name in slowest_imports(stderr):
+                print(f"  {ms:7.1f} ms  {name}")
+
+    total = statistics.median(r["total_ms"] for r in results)
+    statuses = {r["status"] for r in results}
+    ok = total <= args.budget_ms and statuses == {200}
+    print(f"{'ok' if ok else 'DÉPASSÉ'} : {total:.0f} ms pour un budget de {args.budget_ms:.0f} ms (HTTP {sorted(statuses)})")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
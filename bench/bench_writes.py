@@ -0,0 +1,126 @@
+# bench/bench_writes.py
+# Nombre d'allers-retours DB (requêtes SQL + commits) de chaque endpoint d'écriture.
+#
+# Base SQLite temporaire ; chaque appel est compté avec les événements du moteur
+# (before_cursor_execute / commit). Chaque scénario a un statut HTTP attendu et
+# un nombre maximal d'allers-retours : code de sortie 1 si l'un d'eux est dépassé
+# (vérifié aussi par tests/test_write_queries.py).
+#
+# Usage : python bench/bench_writes.py
+import os
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (libellé, méthode, url, corps JSON, statut attendu, allers-retours max : requêtes SQL + commits)
+SCENARIO = [
+    ("create_user", "POST", "/users", {"username": "alice", "email": "alice@example.com", "password": "pw"}, 200, 2),
+    ("create_user (email pris)", "POST", "/users", {"username": "alice2", "email": "alice@example.com", "password": "pw"}, 400, 1),
+    ("update_user (nom)", "PUT", "/update/users/1", {"username": "alice_b"}, 200, 4),
+    ("update_user (nom + email)", "PUT", "/update/users/1", {"username": "alice_c", "email": "c@example.com"}, 200, 3),
+    ("update_user (inconnu)", "PUT", "/update/users/999", {"username": "x"}, 404, 2),
+    ("create_category", "POST", "/api/creat/category", {"name": "Tram"}, 200, 2),
+    ("update_category", "PUT", "/api/update/category/2", {"name": "Tramway"}, 200, 3),
+    ("update_category (nom pris)", "PUT", "/api/update/category/2", {"name": "Bus"}, 400, 1),
+    ("create_line", "POST", "/api/creat/line", {"name": "T1", "category_id": 2, "start_time": "05:30"}, 200, 2),
+    ("create_line (catégorie inconnue)", "POST", "/api/creat/line", {"name": "T9", "category_id": 999}, 404, 1),
+    ("update_line (nom)", "PUT", "/api/update/line/2", {"name": "T1bis"}, 200, 4),
+    ("update_line (tout)", "PUT", "/api/update/line/2", {"name": "T2", "category_id": 1, "start_time": "06:00", "end_time": "22:00"}, 200, 3),
+    ("create_stop", "POST", "/api/creat/stop", {"line_id": 1, "name": "A", "latitude": 43.6, "longitude": 1.44, "stop_order": 1}, 200, 2),
+    ("create_stop (ligne inconnue)", "POST", "/api/creat/stop", {"line_id": 999, "name": "Z", "latitude": 43.6, "longitude": 1.44, "stop_order": 1}, 404, 1),
+    ("update_stop (nom)", "PUT", "/api/update/stop/1", {"name": "A2"}, 200, 3),
+    ("add_stop", "POST", "/api/line/1/add_stop", {"line_id": 1, "name": "B", "latitude": 43.6, "longitude": 1.45, "stop_order": 1}, 200, 4),
+    ("remove_stop", "DELETE", "/api/line/1/remove_stop/2", None, 200, 5),
+    ("delete_stop", "DELETE", "/api/delete/stop/1", None, 200, 3),
+    ("delete_category (utilisée)", "DELETE", "/api/delete/category/1", None, 400, 2),
+    ("delete_line", "DELETE", "/api/delete/line/2", None, 200, 3),
+    # équivalent de 1 + 10 + 5 appels ci-dessus, en une requête
+    ("batch (1 ligne, 10 arrêts, 5 modifs)", "POST", "/api/batch", {"operations": [
+        {"op": "create", "entity": "line", "ref": "B", "data": {"name": "B1", "category_id": 1}},
+        *({"op": "create", "entity": "stop", "data": {"line_id": "$B", "name": f"S{i}", "latitude": 43.6, "longitude": 1.44, "stop_order": i}} for i in range(10)),
+        *({"op": "update", "entity": "stop", "id": stop_id, "data": {"stop_order": 20 + stop_id}} for stop_id in (3, 4, 5, 6, 7)),
+    ]}, 200, 5),
+]
+
+
+def seed(engine):
+    """Base migrée vide -> catégorie 1 "Bus" et ligne 1 "L1" (ids utilisés par SCENARIO)."""
+    from sqlmodel import Session
+
+    from models import categories, TransportLine
+
+    with Session(engine) as session:
+        session.add(categories(name="Bus"))
+        session.commit()
+        session.add(TransportLine(name="L1", category_id=1))
+        session.commit()
+
+
+def measure(client, engine) -> list:
+    """[(libellé, statut, requêtes SQL, commits, statut attendu, budget)] pour chaque scénario."""
+    from sqlalchemy import event
+
+    from auth import create_access_token
+
+    counts = {"sql": 0, "commit": 0}
+
+    # la reconstruction en fond du document réseau (snapshot.py), relancée par les
+    # écritures, n'est pas un coût de la requête mesurée
+    def counted():
+        return threading.current_thread().name != "network-snapshot"
+
+    def count_sql(*args):
+        if counted():
+            counts["sql"] += 1
+
+    def count_commit(*args):
+        if counted():
+            counts["commit"] += 1
+
+    event.listen(engine, "before_cursor_execute", count_sql)
+    event.listen(engine, "commit", count_commit)
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+    results = []
+    try:
+        for label, method, url, body, expected, budget in SCENARIO:
+            counts["sql"] = counts["commit"] = 0
+            r = client.request(method, url, json=body, headers=headers)
+            results.append((label, r.status_code, counts["sql"], counts["commit"], expected, budget))
+    finally:
+        event.remove(engine, "before_cursor_execute", count_sql)
+        event.remove(engine, "commit", count_commit)
+    return results
+
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_writes.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("DB_ASYNC", None)
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    sys.path.insert(0, ROOT)
+
+    from fastapi.testclient import TestClient
+
+    import database
+    import main as app_module
+    import migrations
+
+    migrations.upgrade(database.engine)
+    seed(database.engine)
+    client = TestClient(app_module.app, raise_server_exceptions=False)
+
+    failed = False
+    print(f"{'endpoint':36s} {'HTTP':>4s} {'SQL':>4s} {'commit':>6s} {'total':>5s} {'max':>4s}")
+    for label, status, sql, commits, expected, budget in measure(client, database.engine):
+        total = sql + commits
+        problem = total > budget or status != expected
+        failed |= problem
+        note = f"  <- attendu HTTP {expected}, au plus {budget}" if problem else ""
+        print(f"{label:36s} {status:4d} {sql:4d} {commits:6d} {total:5d} {budget:4d}{note}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
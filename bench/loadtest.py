@@ -0,0 +1,273 @@
+# bench/loadtest.py
+# Test de charge reproductible des endpoints principaux, dans le process (httpx
+# ASGITransport, pas de serveur ni de réseau), sur une base SQLite temporaire
+# remplie d'un réseau synthétique : N catégories, M lignes, K arrêts par ligne
+# (tracés autour de Toulouse, ~400 m entre deux arrêts).
+#
+# Chaque endpoint tourne dans un nouveau process (RSS max propre à l'endpoint,
+# caches vides au départ) : quelques requêtes de chauffe, puis `--requests`
+# requêtes à `--concurrency` en parallèle. Résultats : latences p50/p95/p99,
+# débit, RSS max, statuts HTTP ; enregistrés en JSON pour comparer deux commits.
+#
+# Usage :
+#   python bench/loadtest.py --categories 5 --lines 200 --stops-per-line 20 --concurrency 20
+#   python bench/loadtest.py --endpoints line_stops,allstop --compare bench/results/loadtest-abc1234.json
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+CENTER_LAT, CENTER_LON = 43.6045, 1.4440
+SPREAD_DEG = 0.15        # départ des lignes à ~15 km du centre au plus
+STOP_SPACING_DEG = 0.004  # ~400 m entre deux arrêts
+USER_EMAIL, USER_PASSWORD = "loadtest@example.com", "loadtest"
+
+# nom -> (méthode, chemin, part de --requests) ; {line} : ligne tirée au hasard
+# /token vérifie un hash scrypt (~50 ms de CPU, voulu) : moins de requêtes, et pas
+# plus en parallèle que PASSWORD_HASH_QUEUE (au-delà, 503 immédiats)
+ENDPOINTS = {
+    "token": ("POST", "/token", 0.1),
+    "allstop": ("GET", "/api/allstop", 1.0),
+    "allstop_page": ("GET", "/api/allstop?limit=100", 1.0),
+    "line_stops": ("GET", "/api/line/{line}/stops", 1.0),
+}
+
+
+#------------------------------------------------------------------------------
+# Réseau synthétique
+#------------------------------------------------------------------------------
+
+def seed(url, categories, lines, stops_per_line, rnd):
+    """Schéma (migrations) + réseau synthétique + un utilisateur pour /token."""
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import insert
+    from sqlmodel import Session
+
+    import migrations
+    from database import make_engine
+    from models import categories as Category, Stop, TransportLine, Users
+    from passwords import PasswordHasher
+
+    engine = make_engine(url)
+    migrations.upgrade(engine)
+    stops = []
+    for line_id in range(1, lines + 1):
+        lat = CENTER_LAT + rnd.uniform(-SPREAD_DEG, SPREAD_DEG)
+        lon = CENTER_LON + rnd.uniform(-SPREAD_DEG, SPREAD_DEG)
+        heading = rnd.uniform(0, 2 * math.pi)
+        for order in range(1, stops_per_line + 1):
+            stops.append({"line_id": line_id, "name": f"Arrêt {line_id}-{order}",
+                          "latitude": round(lat, 6), "longitude": round(lon, 6), "stop_order": order})
+            heading += rnd.uniform(-0.5, 0.5)  # tracé qui tourne un peu
+            lat += STOP_SPACING_DEG * math.sin(heading)
+            lon += STOP_SPACING_DEG * math.cos(heading) / math.cos(math.radians(lat))
+
+    with Session(engine) as session:
+        session.execute(insert(Category), [{"id": i, "name": f"Catégorie {i}"} for i in range(1, categories + 1)])
+        session.execute(insert(TransportLine), [{"id": i, "name": f"Ligne {i}", "category_id": rnd.randint(1, categories)}
+                                                for i in range(1, lines + 1)])
+        session.execute(insert(Stop), stops)
+        session.add(Users(username="loadtest", email=USER_EMAIL,
+                          hashed_password=PasswordHasher(workers=0).hash(USER_PASSWORD)))
+        session.commit()
+    engine.dispose()
+
+
+#------------------------------------------------------------------------------
+# Process de mesure (un par endpoint)
+#------------------------------------------------------------------------------
+
+def percentile(sorted_values, p):
+    # rang le plus proche : valeur réellement observée
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def run_child(args):
+    # DATABASE_URL est fixé par le parent avant l'import
+    import resource
+
+    sys.path.insert(0, ROOT)
+    import httpx
+
+    import main
+    import passwords
+    from auth import create_access_token
+
+    method, path, share = ENDPOINTS[args.endpoint]
+    total = max(1, int(args.requests * share))
+    concurrency = args.concurrency
+    if args.endpoint == "token":
+        concurrency = min(concurrency, passwords.HASH_QUEUE)
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+    rnd = random.Random(args.seed)
+
+    def request_args():
+        if args.endpoint == "token":
+            return {"data": {"username": USER_EMAIL, "password": USER_PASSWORD}}
+        return {"headers": headers}
+
+    async def load():
+        main.on_startup()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            async def call():
+                url = path.format(line=rnd.randint(1, args.lines))
+                start = time.perf_counter()
+                response = await client.request(method, url, **request_args())
+                return time.perf_counter() - start, response.status_code
+
+            for _ in range(args.warmup):
+                await call()
+
+            latencies, statuses = [], {}
+            remaining = total
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    elapsed, status = await call()
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return time.perf_counter() - start, latencies, statuses
+
+    wall, latencies, statuses = asyncio.run(load())
+    main.on_shutdown()
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    print(json.dumps({
+        "method": method,
+        "path": path,
+        "requests": len(ms),
+        "concurrency": concurrency,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "mean_ms": statistics.fmean(ms),
+        "max_ms": ms[-1],
+        "throughput_rps": len(ms) / wall,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }))
+
+
+#------------------------------------------------------------------------------
+# Rapport
+#------------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+
+
+def _delta(new, old):
+    if not old:
+        return ""
+    return f" ({(new - old) / old * 100:+.0f}%)"
+
+
+def print_report(results, baseline=None):
+    baseline = (baseline or {}).get("results", {})
+    print(f"{'endpoint':14s} {'p50 ms':>16s} {'p95 ms':>16s} {'p99 ms':>16s} {'req/s':>16s} {'RSS Mo':>8s}  statuts")
+    for name, r in results.items():
+        old = baseline.get(name, {})
+        cells = [f"{r[key]:.2f}{_delta(r[key], old.get(key))}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        cells.append(f"{r['throughput_rps']:.0f}{_delta(r['throughput_rps'], old.get('throughput_rps'))}")
+        print(f"{name:14s} " + " ".join(f"{c:>16s}" for c in cells) + f" {r['peak_rss_mb']:8.1f}  {r['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--stops-per-line", type=int, default=20)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="séparés par des virgules")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="par endpoint (x0.1 pour /token)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON (défaut : bench/results/loadtest-<commit>.json)")
+    parser.add_argument("--compare", help="résultats JSON d'une exécution précédente")
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"endpoint inconnu : {', '.join(unknown)} (disponibles : {', '.join(ENDPOINTS)})")
+
+    commit = git_commit()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/loadtest.db"
+        start = time.perf_counter()
+        seed(url, args.categories, args.lines, args.stops_per_line, random.Random(args.seed))
+        print(f"réseau : {args.categories} catégories, {args.lines} lignes, {args.lines * args.stops_per_line} arrêts "
+              f"({time.perf_counter() - start:.1f} s)")
+
+        env = dict(os.environ, DATABASE_URL=url, PYTHONWARNINGS="ignore")
+        env.pop("DB_AUTO_MIGRATE", None)
+        env.pop("SQL_DEBUG", None)
+        for name in endpoints:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", "--endpoint", name,
+                 "--lines", str(args.lines), "--concurrency", str(args.concurrency),
+                 "--requests", str(args.requests), "--warmup", str(args.warmup), "--seed", str(args.seed)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            results[name] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    report = {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: getattr(args, key) for key in
+                   ("categories", "lines", "stops_per_line", "concurrency", "requests", "warmup", "seed")},
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != report["params"]:
+            print(f"attention : paramètres différents de {args.compare} ({baseline.get('params')})")
+        print(f"comparaison avec {baseline.get('commit')} ({baseline.get('date')})")
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"loadtest-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"résultats : {os.path.relpath(output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# bulk_import.py
+# Import en masse de lignes et d'arrêts depuis un CSV (format propre à ce
+# projet, décrit ci-dessous), utilisé par POST /api/import/{lines,stops} et en CLI :
+#
+#   python bulk_import.py stops stops.csv --batch-size 2000
+#   python bulk_import.py lines lines.csv
+#
+# Le fichier est lu ligne par ligne (csv.DictReader) et inséré par paquets de
+# batch_size lignes : un INSERT multi-lignes + un commit par paquet au lieu d'un
+# aller-retour par arrêt. Les références (ligne d'un arrêt, catégorie d'une
+# ligne) sont vérifiées contre un ensemble chargé une fois au début. Un paquet
+# refusé par la DB est recoupé pour n'écarter que ses lignes fautives.
+#
+# Colonnes acceptées :
+#   lignes : name, category_id, start_time, end_time ; le routes.txt d'un flux
+#            GTFS convient aussi (route_short_name / route_long_name, route_type)
+#   arrêts : line_id (id ou nom de ligne), name, latitude, longitude, stop_order.
+#            Ce n'est pas le stops.txt GTFS : un arrêt GTFS n'a ni ligne ni ordre
+#            (ils sont dans trips.txt / stop_times.txt), le fichier est à préparer.
+import csv
+import io
+import time as _time
+from datetime import time
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+import topology
+from models import categories, TransportLine, Stop
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# route_type GTFS -> nom de catégorie
+GTFS_ROUTE_TYPES = {"0": "tramway", "1": "métro", "2": "train", "3": "bus", "6": "téléphérique", "7": "funiculaire"}
+
+LINE_COLUMNS = {
+    "name": ("name", "route_short_name", "route_long_name"),
+    "category_id": ("category_id",),
+    "route_type": ("route_type",),
+    "start_time": ("start_time",),
+    "end_time": ("end_time",),
+}
+STOP_COLUMNS = {
+    "line_id": ("line_id",),
+    "name": ("name",),
+    "latitude": ("latitude",),
+    "longitude": ("longitude",),
+    "stop_order": ("stop_order",),
+}
+
+
+class ImportReport:
+    def __init__(self, table):
+        self.table = table
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self._start = _time.perf_counter()
+        self.elapsed_s = 0.0
+
+    def error(self, row_number, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def finish(self):
+        self.elapsed_s = _time.perf_counter() - self._start
+        return self
+
+    def as_dict(self):
+        rows = self.inserted + self.rejected
+        return {
+            "table": self.table,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "rows_per_sec": round(rows / self.elapsed_s, 1) if self.elapsed_s else 0.0,
+            "errors": self.errors,
+        }
+
+
+def open_csv(binary_file):
+    """DictReader sur un fichier binaire (UploadFile.file ou open(..., 'rb')), lu en flux."""
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    return csv.DictReader(text)
+
+
+def _pick(row, aliases):
+    for name in aliases:
+        value = row.get(name)
+        if value not in (None, ""):
+            return value.strip()
+    return None
+
+
+def _db_message(e) -> str:
+    # message du pilote ("FOREIGN KEY constraint failed"...) plutôt que la requête SQL complète
+    return str(getattr(e, "orig", None) or e).splitlines()[0]
+
+
+def _insert(session, model, batch, report):
+    try:
+        session.execute(insert(model), [values for _, values in batch])
+        session.commit()
+        report.inserted += len(batch)
+    except Exception as e:
+        session.rollback()
+        if len(batch) == 1:
+            report.error(batch[0][0], f"refusé par la base : {_db_message(e)}")
+            return
+        # paquet refusé : on le coupe en deux jusqu'à isoler les lignes fautives,
+        # les autres sont insérées (quelques INSERT de plus par ligne refusée)
+        middle = len(batch) // 2
+        _insert(session, model, batch[:middle], report)
+        _insert(session, model, batch[middle:], report)
+
+
+def _flush(session, model, batch, report):
+    if batch:
+        _insert(session, model, batch, report)
+    batch.clear()
+
+
+def import_lines(session: Session, reader, batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    report = ImportReport("transportline")
+    category_ids = set()
+    category_by_name = {}
+    for c in session.exec(select(categories)).all():
+        category_ids.add(c.id)
+        category_by_name[c.name.strip().lower()] = c.id
+
+    batch = []
+    # ligne 1 = en-tête
+    for row_number, row in enumerate(reader, start=2):
+        name = _pick(row, LINE_COLUMNS["name"])
+        if not name:
+            report.error(row_number, "nom de ligne manquant")
+            continue
+
+        category_id = _pick(row, LINE_COLUMNS["category_id"])
+        route_type = _pick(row, LINE_COLUMNS["route_type"])
+        if category_id is not None:
+            try:
+                category_id = int(category_id)
+            except ValueError:
+                report.error(row_number, f"category_id invalide : {category_id!r}")
+                continue
+        elif route_type is not None:
+            category_id = category_by_name.get(GTFS_ROUTE_TYPES.get(route_type, ""))
+        if category_id not in category_ids:
+            report.error(row_number, "catégorie inconnue")
+            continue
+
+        try:
+            start_time = time.fromisoformat(_pick(row, LINE_COLUMNS["start_time"]) or "05:00")
+            end_time = time.fromisoformat(_pick(row, LINE_COLUMNS["end_time"]) or "23:00")
+        except ValueError:
+            report.error(row_number, "heure invalide (HH:MM attendu)")
+            continue
+
+        batch.append((row_number, {"name": name, "category_id": category_id, "start_time": start_time, "end_time": end_time}))
+        if len(batch) >= batch_size:
+            _flush(session, TransportLine, batch, report)
+
+    _flush(session, TransportLine, batch, report)
+    topology.notify(topology.LINE)
+    return report.finish()
+
+
+def import_stops(session: Session, reader, batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    report = ImportReport("stop")
+    # ids et noms des lignes existantes, chargés une seule fois
+    line_ids = set()
+    line_by_name = {}
+    for line_id, line_name in session.exec(select(TransportLine.id, TransportLine.name)).all():
+        line_ids.add(line_id)
+        line_by_name[line_name] = line_id
+
+    missing = [column for column in ("line_id", "name", "latitude", "longitude") if column not in (reader.fieldnames or ())]
+    if missing:
+        # typiquement un stops.txt GTFS : toutes ses lignes seraient refusées une par une
+        report.error(1, "colonnes manquantes : " + ", ".join(missing))
+        return report.finish()
+
+    batch = []
+    for row_number, row in enumerate(reader, start=2):
+        line_ref = _pick(row, STOP_COLUMNS["line_id"])
+        name = _pick(row, STOP_COLUMNS["name"])
+        if not line_ref or not name:
+            report.error(row_number, "line_id et name sont obligatoires")
+            continue
+
+        # référence par id, sinon par nom de ligne
+        line_id = int(line_ref) if line_ref.isdigit() and int(line_ref) in line_ids else line_by_name.get(line_ref)
+        if line_id is None:
+            report.error(row_number, f"ligne inconnue : {line_ref!r}")
+            continue
+
+        try:
+            latitude = float(_pick(row, STOP_COLUMNS["latitude"]))
+            longitude = float(_pick(row, STOP_COLUMNS["longitude"]))
+            stop_order = int(_pick(row, STOP_COLUMNS["stop_order"]) or 0)
+        except (TypeError, ValueError):
+            report.error(row_number, "latitude / longitude / stop_order invalides")
+            continue
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            report.error(row_number, "coordonnées hors limites")
+            continue
+
+        batch.append((row_number, {
+            "line_id": line_id,
+            "name": name,
+            "latitude": latitude,
+            "longitude": longitude,
+            "stop_order": stop_order,
+        }))
+        if len(batch) >= batch_size:
+            _flush(session, Stop, batch, report)
+
+    _flush(session, Stop, batch, report)
+    # ids générés inconnus : les index en mémoire se rechargent entièrement
+    topology.notify(topology.STOP)
+    return report.finish()
+
+
+IMPORTERS = {"lines": import_lines, "stops": import_stops}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Import CSV de lignes ou d'arrêts")
+    parser.add_argument("table", choices=sorted(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f, Session(engine) as session:
+        result = IMPORTERS[args.table](session, open_csv(f), args.batch_size)
+    print(json.dumps(result.as_dict(), ensure_ascii=False, indent=2))
@@ -0,0 +1,111 @@
+# cache.py
+# Cache en mémoire (read-through) pour la topologie du réseau : catégories,
+# lignes et arrêts changent rarement mais sont lus en permanence.
+#
+# - TTL : une entrée expire après TOPOLOGY_CACHE_TTL secondes (300 par défaut)
+# - taille bornée : au-delà de TOPOLOGY_CACHE_SIZE entrées, la moins récemment
+#   utilisée est évincée (LRU)
+# - invalidation : chaque entrée déclare les tables dont elle dépend, une écriture
+#   sur une de ces tables (topology.notify) supprime les entrées concernées
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import topology
+
+
+class TopologyCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # clef -> (expire_at, tables, valeur)
+        self._generations = {}       # table -> nb d'invalidations
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def _generation(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(t, 0) for t in tables)
+
+    def _store(self, key, tables, value, generation):
+        with self._lock:
+            # une écriture a eu lieu pendant le chargement : la valeur est peut-être
+            # déjà périmée, on la renvoie sans la mettre en cache
+            if generation != tuple(self._generations.get(t, 0) for t in tables):
+                return
+            self._data[key] = (time.monotonic() + self.ttl, frozenset(tables), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, tables, loader):
+        found, value = self._lookup(key)
+        if found:
+            return value
+        generation = self._generation(tables)
+        value = loader()
+        self._store(key, tables, value, generation)
+        return value
+
+    async def aget_or_load(self, key, tables, loader):
+        # même chose pour les handlers async : loader() renvoie une coroutine
+        found, value = self._lookup(key)
+        if found:
+            return value
+        generation = self._generation(tables)
+        value = await loader()
+        self._store(key, tables, value, generation)
+        return value
+
+    def invalidate(self, table: str):
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._data.items() if table in entry[1]]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+topology_cache = TopologyCache(
+    maxsize=int(os.environ.get("TOPOLOGY_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("TOPOLOGY_CACHE_TTL", 300)),
+)
+
+
+@topology.on_change
+def _invalidate_on_write(table, ids):
+    topology_cache.invalidate(table)
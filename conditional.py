@@ -0,0 +1,39 @@
+# conditional.py
+# GET conditionnel (ETag / If-None-Match) pour les endpoints de lecture de la topologie.
+#
+# L'ETag est calculé à partir des versions des tables (topology.etag), sans lire
+# la DB : si le client a déjà la bonne version on répond 304 avant de charger
+# ou sérialiser la moindre ligne.
+from typing import Optional
+
+from fastapi import Request, Response
+
+import topology
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # comparaison faible (RFC 9110) : on ignore le préfixe W/ des deux côtés
+    etag = etag[2:] if etag.startswith("W/") else etag
+    candidates = (c.strip() for c in if_none_match.split(","))
+    return any((c[2:] if c.startswith("W/") else c) == etag for c in candidates)
+
+
+def client_has(request: Request, etag: str) -> bool:
+    """True si l'If-None-Match de la requête correspond à cet ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and _matches(if_none_match, etag)
+
+
+def not_modified(request: Request, response: Response, *tables) -> Optional[Response]:
+    """Renvoie une réponse 304 si le client a déjà cette version, sinon None.
+
+    Dans les deux cas l'en-tête ETag est posé sur la réponse.
+    """
+    etag = topology.etag(*tables)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if client_has(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,62 @@
+# export.py
+# Export complet des tables (arrêts, lignes, utilisateurs) en NDJSON ou CSV, en flux.
+#
+# GET /api/export/{stops,lines,users}.{ndjson,csv}
+#
+# Les lignes sont lues avec un curseur côté serveur (stream_results + yield_per)
+# et envoyées par paquets de EXPORT_CHUNK_ROWS au fur et à mesure : la mémoire
+# ne dépend pas de la taille de la table et le premier octet part dès le premier
+# paquet lu. Le générateur ouvre sa propre connexion (il tourne après la fin du
+# handler, donc après la fermeture de la session de la requête).
+import csv
+import io
+import os
+
+from sqlmodel import select
+
+import database
+import fastjson
+from models import Users, TransportLine, Stop
+from schemas.schemas import LINE_FIELDS, STOP_FIELDS, USER_LIST_FIELDS
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 1000))
+
+# nom dans l'URL -> (modèle, colonnes exportées) ; jamais le hash du mot de passe
+EXPORTS = {
+    "stops": (Stop, STOP_FIELDS),
+    "lines": (TransportLine, LINE_FIELDS),
+    "users": (Users, USER_LIST_FIELDS),
+}
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _partitions(model, fields, chunk_rows):
+    statement = select(*fastjson.columns(model, fields)).order_by(model.id)
+    with database.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(statement)
+        yield from result.partitions()
+
+
+def _iso(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def iter_ndjson(model, fields, chunk_rows=EXPORT_CHUNK_ROWS):
+    for rows in _partitions(model, fields, chunk_rows):
+        yield b"".join(fastjson.dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+def iter_csv(model, fields, chunk_rows=EXPORT_CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in _partitions(model, fields, chunk_rows):
+        writer.writerows([_iso(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # table vide : juste l'en-tête
+
+
+ENCODERS = {"ndjson": iter_ndjson, "csv": iter_csv}
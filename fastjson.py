@@ -0,0 +1,66 @@
+# fastjson.py
+# Mode de réponse rapide pour les grosses listes (/api/allline, /api/allstop, /allusers).
+#
+# Activé avec FAST_JSON=1 : au lieu de charger des objets ORM, de construire un
+# schéma pydantic par ligne puis de tout repasser dans jsonable_encoder, on lit
+# des tuples de colonnes (dans l'ordre des champs du schéma de réponse) et on
+# les encode directement en octets avec orjson (json standard s'il n'est pas
+# installé). Le JSON produit est le même ; dans les caches on garde les octets.
+import json
+import os
+from datetime import date, time
+
+from fastapi import Response
+
+from pagination import next_cursor, NEXT_CURSOR_HEADER
+
+ENABLED = os.environ.get("FAST_JSON", "0").lower() in ("1", "true", "yes")
+
+try:
+    import orjson
+except ImportError:  # optionnel
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} non sérialisable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        # datetime / time sont écrits en ISO 8601, comme isoformat()
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def columns(model, fields):
+    """Colonnes de `model` dans l'ordre des champs `fields` (select(*columns(...)))."""
+    return [getattr(model, name) for name in fields]
+
+
+class FastPage:
+    """Page déjà encodée : le corps JSON et le curseur de la page suivante."""
+    __slots__ = ("body", "next_after")
+
+    def __init__(self, body: bytes, next_after):
+        self.body = body
+        self.next_after = next_after
+
+
+def encode_page(rows, fields, page) -> FastPage:
+    # rows : tuples dont le premier élément est l'id
+    body = dumps([dict(zip(fields, row)) for row in rows])
+    return FastPage(body, next_cursor(rows, page, lambda row: row[0]))
+
+
+def page_response(fast_page: FastPage, response: Response) -> Response:
+    # la Response renvoyée remplace `response` : on reprend ses en-têtes (ETag...)
+    out = Response(content=fast_page.body, media_type="application/json")
+    for name, value in response.headers.items():
+        if name not in ("content-length", "content-type"):
+            out.headers[name] = value
+    if fast_page.next_after is not None:
+        out.headers[NEXT_CURSOR_HEADER] = str(fast_page.next_after)
+    return out
@@ -11,6 +11,10 @@ $allHeaders = function_exists('getallheaders') ? getallheaders() : [];
 if (!empty($allHeaders['Authorization'])) {
     $headers[] = "Authorization: " . $allHeaders['Authorization'];
 }
+// GET conditionnel : on transmet l'ETag connu du navigateur (l'API répond 304 si rien n'a changé)
+if (!empty($allHeaders['If-None-Match'])) {
+    $headers[] = "If-None-Match: " . $allHeaders['If-None-Match'];
+}
 
 // URL finale de l'API distante
 $apiUrl = "http://apivw.vicode.agency/" . $endpoint;
@@ -19,6 +23,8 @@ $apiUrl = "http://apivw.vicode.agency/" . $endpoint;
 $ch = curl_init($apiUrl);
 curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
 curl_setopt($ch, CURLOPT_CUSTOMREQUEST, $method);
+// Accepte gzip / br de l'API (api/network est servi compressé), cURL décompresse
+curl_setopt($ch, CURLOPT_ENCODING, "");
 
 // Ajouter les headers
 $contentType = $_SERVER["CONTENT_TYPE"] ?? "application/x-www-form-urlencoded";
@@ -26,6 +32,15 @@ $headers[] = "Content-Type: " . $contentType;
 $headers[] = "Accept: application/json";
 curl_setopt($ch, CURLOPT_HTTPHEADER, $headers);
 
+// Récupérer l'ETag de la réponse pour le renvoyer au navigateur
+$etag = null;
+curl_setopt($ch, CURLOPT_HEADERFUNCTION, function ($ch, $line) use (&$etag) {
+    if (stripos($line, "ETag:") === 0) {
+        $etag = trim(substr($line, 5));
+    }
+    return strlen($line);
+});
+
 // Pour POST/PUT, envoyer le corps de la requête
 if (in_array($method, ['POST', 'PUT'])) {
     $input = file_get_contents("php://input");
@@ -49,5 +64,9 @@ curl_close($ch);
 
 // Renvoie la réponse et le code HTTP
 http_response_code($httpCode);
+if ($etag !== null) {
+    header("ETag: " . $etag);
+    header("Cache-Control: no-cache");
+}
 echo $response;
 ?>
@@ -1,25 +1,86 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException, Request
+from typing import Optional
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import SQLModel, Session
-from database import engine, get_session
+from sqlmodel import Session, select
+from sqlalchemy import case, update
+import database
+from database import get_engine, get_session, USE_ASYNC_DB
 from models import *
 from schemas.schemas import *
-
-import hashlib  # pour hasher le mot de passe (à remplacer par bcrypt en prod)
-
-from auth import create_access_token, verify_token, oauth2_scheme
+from pagination import PageParams, keyset, set_next_cursor
+import topology
+from cache import topology_cache
+from conditional import client_has, not_modified
+import fastjson
+from spatial import stop_index
+from routing import route_planner
+from service_hours import service_hours, parse_at
+from search import search_index
+from snapshot import network_snapshot, choose_encoding
+from bulk_import import IMPORTERS, DEFAULT_BATCH_SIZE, open_csv
+import export
+import batch
+import migrations
+import metrics
+import querycount
+
+from passwords import password_hasher
+from writes import constraint_errors, changes, check_name_free, parse_times, with_current, iso
+
+from auth import create_access_token, token_cache
+from auth_middleware import JWTAuthMiddleware
 app = FastAPI()
+# chaque route compte ses requêtes en cours et chronomètre son endpoint (voir metrics.py)
+app.router.route_class = metrics.TimedRoute
+
+# --- Mode async (DB_ASYNC=1) : les handlers CRUD async sont enregistrés en premier,
+# ils répondent donc à la place des versions sync définies plus bas ---
+if USE_ASYNC_DB:
+    from routers.async_routes import router as async_router
+    app.include_router(async_router)
 
-# --- Création des tables à chaque démarrage si elles n'existent pas ---
+# --- Schéma : étape explicite du déploiement (python migrations.py), pas à chaque démarrage
+# de worker ; DB_AUTO_MIGRATE=1 pour créer les tables / migrer ici (dev, base SQLite locale) ---
 @app.on_event("startup")
 def on_startup():
-    SQLModel.metadata.create_all(engine)
+    if database.AUTO_MIGRATE:
+        migrations.upgrade(get_engine())
+
+@app.on_event("shutdown")
+def on_shutdown():
+    password_hasher.shutdown()
+
+# --- Etat du pool de connexions (connexions prises, overflow, temps d'attente) ---
+# un wait élevé = pool trop petit, un wait nul avec des requêtes lentes = SQL lent
+@app.get("/api/db/pool")
+def get_pool_stats():
+    stats = {"profile": database.ENGINE_PROFILE, "sync": database.pool_stats(database.engine)}
+    if database.async_engine is not None:
+        stats["async"] = database.pool_stats(database.async_engine)
+    return stats
+
+# --- Compteurs du cache de topologie (hits / misses / évictions) ---
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return {**topology_cache.stats(), "network_snapshot": network_snapshot.stats(), "route_planner": route_planner.stats(),
+            "service_hours": service_hours.stats(), "search_index": search_index.stats()}
+
+# --- Métriques Prometheus par route : latence, requêtes en cours, temps DB, auth / handler / sérialisation ---
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+# --- Compteurs du cache des tokens vérifiés (JWTAuthMiddleware) et du hachage des mots de passe ---
+@app.get("/api/auth/stats")
+def get_auth_stats():
+    return {"token_cache": token_cache.stats(), "password_hasher": password_hasher.stats()}
 
 #------------------------------------------------------------------------------
 # Endpoints pour la gestion des utilisateurs
 #------------------------------------------------------------------------------
-# NOTE: removed duplicate middleware. JWT protection is handled in `jwt_middleware` below.
+# NOTE: removed duplicate middleware. JWT protection is handled by `JWTAuthMiddleware` below.
 
 # --- Endpoint POST pour créer un utilisateur ---
 @app.post("/users", response_model=UserRead)
@@ -29,13 +90,9 @@ def create_user(user_api: UserCreate, session: Session = Depends(get_session)):
     db_user : instance de User (DB) avec hashed_password
     """
 
-    # Vérifier si l'email existe déjà dans la DB
-    existing_user = session.query(Users).filter(Users.email == user_api.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email déjà utilisé")
-
     # Hacher le mot de passe reçu via l'API
-    hashed_pwd = hashlib.sha256(user_api.password.encode()).hexdigest()
+    # scrypt, calculé dans le pool de process de passwords.py
+    hashed_pwd = password_hasher.hash(user_api.password)
 
     # Créer un utilisateur DB à partir des données de l'API
     db_user = Users(
@@ -44,48 +101,24 @@ def create_user(user_api: UserCreate, session: Session = Depends(get_session)):
         hashed_password=hashed_pwd
     )
 
-    # Ajouter dans la session et commit
+    # Email déjà utilisé : refusé par l'index unique (400), sans SELECT avant
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)  # recharge l'utilisateur pour récupérer l'ID généré
-
-    # Retourner une réponse API (UserRead) sans mot de passe
-    return db_user
-
-@app.middleware("http")
-async def jwt_middleware(request: Request, call_next):
-    # Exempt paths: openapi, docs, redoc and token endpoint
-    path = request.url.path
-    # Allow unauthenticated access to docs/openapi, the token endpoint,
-    # and only POST /users (user registration). All other routes require a valid JWT.
-    if (
-        path.startswith("/docs")
-        or path.startswith("/openapi.json")
-        or path.startswith("/redoc")
-        or path == "/token"
-        or (path == "/users" and request.method == "POST")
-        or (path == "/api/allline" and request.method == "GET")
-
-    ):
-        return await call_next(request)
-
-    auth_header = request.headers.get("authorization")
-    if not auth_header:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-
-    try:
-        scheme, token = auth_header.split()
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
-
-    if scheme.lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid auth scheme")
-
-    # verify token (will raise HTTPException on failure)
-    verify_token(token)
+    with constraint_errors():
+        session.flush()  # INSERT : l'id généré est connu sans relire la ligne
+        # Réponse API (UserRead) sans mot de passe, construite avant le commit (qui expire l'objet)
+        user_read = UserRead(id=db_user.id, username=db_user.username, email=db_user.email)
+        session.commit()
+
+    return user_read
+
+# --- Authentification JWT de toutes les routes (sauf exceptions, cf. auth_middleware.EXEMPT_ROUTES) ---
+app.add_middleware(JWTAuthMiddleware)
+# --- SQL_DEBUG=1 : en-têtes X-DB-Queries / X-DB-Time-Ms / X-DB-Repeated (N+1) sur chaque réponse ---
+if querycount.DEBUG:
+    app.add_middleware(querycount.QueryDebugMiddleware)
+# --- Durée / statut de chaque requête pour GET /metrics : ajouté en dernier, donc le plus externe ---
+app.add_middleware(metrics.MetricsMiddleware)
 
-    return await call_next(request)
-    
 # --- Endpoint GET pour récupérer un utilisateur par ID ---
 @app.get("/users/{user_id}", response_model=UserRead)
 def get_read_user_wtf(user_id: int, session = Depends(get_session)):
@@ -117,9 +150,14 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), ses
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
-    hashed_pwd = hashlib.sha256(form_data.password.encode()).hexdigest()
-    if hashed_pwd != user.hashed_password:
+    ok, new_hash = password_hasher.verify(form_data.password, user.hashed_password)
+    if not ok:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
+    if new_hash is not None:
+        # ancien hash sha256 (ou coût scrypt modifié) : remplacé maintenant qu'on a le mot de passe
+        user.hashed_password = new_hash
+        session.add(user)
+        session.commit()
 
     access_token = create_access_token(data={"sub": str(user.id), "email": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -127,42 +165,32 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), ses
 # --- Endpoint PUT pour mettre à jour un utilisateur ---
 @app .put("/update/users/{user_id}", response_model=UserUpdate)
 def update_user(user_id: int, user_update: UserUpdate, session: Session = Depends(get_session)):
-    db_user = session.get(Users, user_id)
-    if not db_user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
-    # Mettre à jour les champs si fournis
-    if user_update.username is not None:
-        existing_user_name = session.query(Users).filter(Users.username == user_update.username, Users.id != user_id).first()
-        if existing_user_name:
-            raise HTTPException(status_code=400, detail="le nom est déjà utilisé")
-        db_user.username = user_update.username
-        
-    if user_update.email is not None:
-        # Vérifier si le nouvel email est déjà utilisé par un autre utilisateur
-        existing_user_email = session.query(Users).filter(Users.email == user_update.email, Users.id != user_id).first()
-        if existing_user_email:
-            raise HTTPException(status_code=400, detail="Email déjà utilisé")
-        db_user.email = user_update.email
-        
+    # Champs fournis, appliqués en un seul UPDATE ... WHERE id
+    values = changes(user_update, "username", "email")
     if user_update.password is not None:
-        db_user.hashed_password = hashlib.sha256(user_update.password.encode()).hexdigest() # Hacher le nouveau mot de passe
-
+        values["hashed_password"] = password_hasher.hash(user_update.password) # Hacher le nouveau mot de passe
+
+    if values:
+        # nom déjà utilisé par un autre utilisateur => 400 ; email : index unique => 400
+        check_name_free(session, Users, "username", values, user_id)
+        with constraint_errors():
+            matched = session.execute(update(Users).where(Users.id == user_id).values(**values)).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        session.commit()
+
+    # les champs non modifiés ne sont relus que s'il en manque pour la réponse
+    current = with_current(session, Users, user_id, values, ("username", "email"))
+    if current is None:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    user_api = UserUpdate(
-        username=db_user.username,
-        email=db_user.email,
+    return UserUpdate(
+        username=current["username"],
+        email=current["email"],
         password=None,  # Ne pas renvoyer le mot de passe
         mots = "modification réussie" 
     )
 
-    # je met a jour la base de donnée
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-
-    return user_api
-
 # --- Endpoint DELETE pour supprimer un utilisateur ---
 @app.delete("/delete/users/{user_id}", response_model=UserDelete)
 def delete_user(user_id: int, session: Session = Depends(get_session)):
@@ -183,8 +211,12 @@ def delete_user(user_id: int, session: Session = Depends(get_session)):
     return user_api
 
 @app.get("/allusers")
-def get_all_users(session: Session = Depends(get_session)):
-    users = session.query(Users).all()
+def get_all_users(response: Response, page: PageParams = Depends(), session: Session = Depends(get_session)):
+    if fastjson.ENABLED:
+        rows = session.exec(keyset(select(*fastjson.columns(Users, USER_LIST_FIELDS)), Users.id, page)).all()
+        return fastjson.page_response(fastjson.encode_page(rows, USER_LIST_FIELDS, page), response)
+    users = session.exec(keyset(select(Users), Users.id, page)).all()
+    set_next_cursor(response, users, page)
     return [
         {"id": u.id, "username": u.username, "email": u.email}
         for u in users
@@ -202,10 +234,13 @@ def create_category(category_api: CategoryCreate, session: Session = Depends(get
     )
     
     session.add(db_category)
-    session.commit()
-    session.refresh(db_category)
+    with constraint_errors():
+        session.flush()
+        category_read = CategoryRead(id=db_category.id, name=db_category.name)
+        session.commit()
+    topology.notify(topology.CATEGORY, category_read.id)
     
-    return db_category
+    return category_read
 
 # --- Endpoints pour la lecture de transport ---
 @app.get("/api/category/{category_id}" , response_model=CategoryRead)
@@ -218,25 +253,21 @@ def get_category(category_id: int, session: Session = Depends(get_session)):
 # --- Endpoints pour la mise a jour de transport ---
 @app.put("/api/update/category/{category_id}" , response_model=CategoryUpdate)
 def update_category(category_id: int, category_update: CategoryUpdate, session: Session = Depends(get_session)):
-    db_category = session.get(categories, category_id)
-    if not db_category:
+    values = changes(category_update, "name")
+    if values:
+        check_name_free(session, categories, "name", values, category_id)
+        with constraint_errors():
+            matched = session.execute(update(categories).where(categories.id == category_id).values(**values)).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Catégorie non trouvée")
+        session.commit()
+        topology.notify(topology.CATEGORY, category_id)
+
+    current = with_current(session, categories, category_id, values, ("name",))
+    if current is None:
         raise HTTPException(status_code=404, detail="Catégorie non trouvée")
     
-    if category_update.name is not None:
-        existing_category_name = session.query(categories).filter(categories.name == category_update.name, categories.id != category_id).first()
-        if existing_category_name:
-            raise HTTPException(status_code=400, detail="le nom est déjà utilisé")
-        db_category.name = category_update.name
-        
-    category_api = CategoryUpdate(
-        name=db_category.name
-    )
-    
-    session.add(db_category)
-    session.commit()
-    session.refresh(db_category)
-    
-    return category_api
+    return CategoryUpdate(name=current["name"])
 
 # --- Endpoints pour la suppression de transport ---
 @app.delete("/api/delete/category/{category_id}" , response_model=CategoryDelete)
@@ -250,15 +281,23 @@ def delete_category(category_id: int, session: Session = Depends(get_session)):
         name=db_category.name
     )
     
+    # encore des lignes dans cette catégorie : refusé par la clef étrangère
     session.delete(db_category)
-    session.commit()
+    with constraint_errors(foreign_key=(400, "Catégorie utilisée par des lignes")):
+        session.commit()
+    topology.notify(topology.CATEGORY, category_id)
     
     return category_api
 
 # --- Endpoints pour la lecture de toutes les categories ---
 @app.get("/api/allcategory" , response_model=list[CategoryRead])
-def get_all_category(session: Session = Depends(get_session)):
-    category = session.query(categories).all()
+def get_all_category(response: Response, page: PageParams = Depends(), session: Session = Depends(get_session)):
+    category = topology_cache.get_or_load(
+        ("allcategory", page.limit, page.after),
+        (topology.CATEGORY,),
+        lambda: [CategoryRead(id=c.id, name=c.name) for c in session.exec(keyset(select(categories), categories.id, page)).all()],
+    )
+    set_next_cursor(response, category, page)
     return category
 
 #------------------------------------------------------------------------------
@@ -268,23 +307,24 @@ def get_all_category(session: Session = Depends(get_session)):
 # --- Endpoints pour la creation de transport line ---
 @app.post("/api/creat/line" , response_model=TransportLineRead)
 def create_transport_line(line_api: TransportLineCreate, session: Session = Depends(get_session)):
-    # Vérifier si la catégorie existe
-    db_category = session.get(categories, line_api.category_id)
-    if not db_category:
-        raise HTTPException(status_code=404, detail="Catégorie non trouvée")
-    
-    db_line = TransportLine( 
+    # heure invalide => 422 (parse_times) ; non fournie => horaires par défaut
+    times = parse_times({"start_time": line_api.start_time or None, "end_time": line_api.end_time or None})
+    db_line = TransportLine(
         name=line_api.name,
         category_id=line_api.category_id,
-        start_time=line_api.start_time if line_api.start_time else time(5, 0),
-        end_time=line_api.end_time if line_api.end_time else time(23, 0)
+        start_time=times["start_time"] or time(5, 0),
+        end_time=times["end_time"] or time(23, 0)
     )
     
+    # catégorie inexistante : clef étrangère => 404
     session.add(db_line)
-    session.commit()
-    session.refresh(db_line)
+    with constraint_errors(foreign_key=(404, "Catégorie non trouvée")):
+        session.flush()
+        line_read = line_to_read(db_line)
+        session.commit()
+    topology.notify(topology.LINE, line_read.id)
     
-    return db_line
+    return line_read
 
 # --- Endpoints pour la lecture de transport line ---
 @app.get("/api/line/{line_id}" , response_model=TransportLineRead)
@@ -297,41 +337,27 @@ def get_transport_line(line_id: int, session: Session = Depends(get_session)):
 # --- Endpoints pour la mise a jour de transport line ---
 @app.put("/api/update/line/{line_id}" , response_model=TransportLineUpdate)
 def update_transport_line(line_id: int, line_update: TransportLineUpdate, session: Session = Depends(get_session)):
-    db_line = session.get(TransportLine, line_id)
-    if not db_line:
+    values = parse_times(changes(line_update, "name", "category_id", "start_time", "end_time"))
+    if values:
+        # nom déjà utilisé par une autre ligne => 400, nouvelle catégorie inexistante => 404 (clef étrangère)
+        check_name_free(session, TransportLine, "name", values, line_id)
+        with constraint_errors(foreign_key=(404, "Catégorie non trouvée")):
+            matched = session.execute(update(TransportLine).where(TransportLine.id == line_id).values(**values)).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Ligne non trouvée")
+        session.commit()
+        topology.notify(topology.LINE, line_id)
+
+    current = with_current(session, TransportLine, line_id, values, ("name", "category_id", "start_time", "end_time"))
+    if current is None:
         raise HTTPException(status_code=404, detail="Ligne non trouvée")
-    
-    if line_update.name is not None:
-        existing_line_name = session.query(TransportLine).filter(TransportLine.name == line_update.name, TransportLine.id != line_id).first()
-        if existing_line_name:
-            raise HTTPException(status_code=400, detail="le nom est déjà utilisé")
-        db_line.name = line_update.name
         
-    if line_update.category_id is not None:
-        # Vérifier si la nouvelle catégorie existe
-        db_category = session.get(categories, line_update.category_id)
-        if not db_category:
-            raise HTTPException(status_code=404, detail="Catégorie non trouvée")
-        db_line.category_id = line_update.category_id
-        
-    if line_update.start_time is not None:
-        db_line.start_time = line_update.start_time
-        
-    if line_update.end_time is not None:
-        db_line.end_time = line_update.end_time
-        
-    line_api = TransportLineUpdate(
-        name=db_line.name,
-        category_id=db_line.category_id,
-        start_time=db_line.start_time,
-        end_time=db_line.end_time
+    return TransportLineUpdate(
+        name=current["name"],
+        category_id=current["category_id"],
+        start_time=iso(current["start_time"]),
+        end_time=iso(current["end_time"])
     )
-    
-    session.add(db_line)
-    session.commit()
-    session.refresh(db_line)
-    
-    return line_api
 
 # --- Endpoints pour la suppression de transport line ---
 @app.delete("/api/delete/line/{line_id}" , response_model=TransportLineDelete)
@@ -340,39 +366,51 @@ def delete_transport_line(line_id: int, session: Session = Depends(get_session))
     if not db_line:
         raise HTTPException(status_code=404, detail="Ligne non trouvée")
     
-    line_api = TransportLineDelete(
-        id=db_line.id,
-        name=db_line.name,
-        category_id=db_line.category_id,
-        created_at=db_line.created_at,
-        start_time=db_line.start_time,
-        end_time=db_line.end_time
-    )
+    line_api = TransportLineDelete(**line_to_read(db_line).model_dump())
     
+    # encore des arrêts sur cette ligne : refusé par la clef étrangère
     session.delete(db_line)
-    session.commit()
+    with constraint_errors(foreign_key=(400, "Ligne utilisée par des arrêts")):
+        session.commit()
+    topology.notify(topology.LINE, line_id)
     
     return line_api
 
 # --- Endpoints pour la lecture de toutes les lignes de transport ---
+# ?limit=&after= pour paginer, ?category_id= pour filtrer côté serveur
 @app.get("/api/allline" , response_model=list[TransportLineRead])
-def get_all_transport_lines(session: Session = Depends(get_session)):
-    try:
-        lines = session.query(TransportLine).all()
+def get_all_transport_lines(
+    request: Request,
+    response: Response,
+    category_id: Optional[int] = None,
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
+    # 304 si le client a déjà cette version (aucune lecture DB)
+    cached = not_modified(request, response, topology.LINE)
+    if cached:
+        return cached
+
+    # FAST_JSON=1 : tuples de colonnes encodés directement en octets (voir fastjson.py)
+    fast = fastjson.ENABLED
+
+    def load():
+        statement = select(*fastjson.columns(TransportLine, LINE_FIELDS)) if fast else select(TransportLine)
+        if category_id is not None:
+            statement = statement.where(TransportLine.category_id == category_id)
+        rows = session.exec(keyset(statement, TransportLine.id, page)).all()
+        if fast:
+            return fastjson.encode_page(rows, LINE_FIELDS, page)
         # Convert DB models to response schema explicitly to avoid serialization surprises
-        result: list[TransportLineRead] = []
-        for l in lines:
-            created_at = l.created_at.isoformat() if getattr(l, 'created_at', None) is not None else None
-            start_time = l.start_time.isoformat() if getattr(l, 'start_time', None) is not None else None
-            end_time = l.end_time.isoformat() if getattr(l, 'end_time', None) is not None else None
-            result.append(TransportLineRead(
-                id=l.id,
-                name=l.name,
-                category_id=l.category_id,
-                created_at=created_at,
-                start_time=start_time,
-                end_time=end_time,
-            ))
+        return [line_to_read(l) for l in rows]
+
+    try:
+        result = topology_cache.get_or_load(
+            ("allline", fast, category_id, page.limit, page.after), (topology.LINE,), load
+        )
+        if fast:
+            return fastjson.page_response(result, response)
+        set_next_cursor(response, result, page)
         return result
     except Exception as e:
         # Return a 500 with the error message to help debugging (remove message in prod)
@@ -385,11 +423,6 @@ def get_all_transport_lines(session: Session = Depends(get_session)):
 # --- Endpoints pour la creation d'arrêt ---
 @app.post("/api/creat/stop" , response_model=StopRead)
 def create_stop(stop_api: StopCreate, session: Session = Depends(get_session)):
-    # Vérifier si la ligne de transport existe
-    db_line = session.get(TransportLine, stop_api.line_id)
-    if not db_line:
-        raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
-    
     db_stop = Stop(
         line_id=stop_api.line_id,
         name=stop_api.name,
@@ -398,11 +431,15 @@ def create_stop(stop_api: StopCreate, session: Session = Depends(get_session)):
         stop_order=stop_api.stop_order
     )
     
+    # ligne de transport inexistante : refusé par la clef étrangère (404)
     session.add(db_stop)
-    session.commit()
-    session.refresh(db_stop)
+    with constraint_errors(foreign_key=(404, "Ligne de transport non trouvée")):
+        session.flush()
+        stop_read = stop_to_read(db_stop)
+        session.commit()
+    topology.notify(topology.STOP, stop_read.id)
     
-    return db_stop
+    return stop_read
 
 # --- Endpoints pour la lecture d'arrêt ---
 @app.get("/api/stop/{stop_id}" , response_model=StopRead)
@@ -415,42 +452,21 @@ def get_stop(stop_id: int, session: Session = Depends(get_session)):
 # --- Endpoints pour la mise a jour d'arrêt ---
 @app.put("/api/update/stop/{stop_id}" , response_model=StopUpdate)
 def update_stop(stop_id: int, stop_update: StopUpdate, session: Session = Depends(get_session)):
-    db_stop = session.get(Stop, stop_id)
-    if not db_stop:
+    values = changes(stop_update, *STOP_UPDATE_FIELDS)
+    if values:
+        # nouvelle ligne inexistante : clef étrangère => 404
+        with constraint_errors(foreign_key=(404, "Ligne de transport non trouvée")):
+            matched = session.execute(update(Stop).where(Stop.id == stop_id).values(**values)).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Arrêt non trouvé")
+        session.commit()
+        topology.notify(topology.STOP, stop_id)
+
+    current = with_current(session, Stop, stop_id, values, STOP_UPDATE_FIELDS)
+    if current is None:
         raise HTTPException(status_code=404, detail="Arrêt non trouvé")
     
-    if stop_update.line_id is not None:
-        # Vérifier si la nouvelle ligne de transport existe
-        db_line = session.get(TransportLine, stop_update.line_id)
-        if not db_line:
-            raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
-        db_stop.line_id = stop_update.line_id
-        
-    if stop_update.name is not None:
-        db_stop.name = stop_update.name
-        
-    if stop_update.latitude is not None:
-        db_stop.latitude = stop_update.latitude
-        
-    if stop_update.longitude is not None:
-        db_stop.longitude = stop_update.longitude
-        
-    if stop_update.stop_order is not None:
-        db_stop.stop_order = stop_update.stop_order
-        
-    stop_api = StopUpdate(
-        line_id=db_stop.line_id,
-        name=db_stop.name,
-        latitude=db_stop.latitude,
-        longitude=db_stop.longitude,
-        stop_order=db_stop.stop_order
-    )
-    
-    session.add(db_stop)
-    session.commit()
-    session.refresh(db_stop)
-    
-    return stop_api
+    return StopUpdate(**current)
 
 # --- Endpoints pour la suppression d'arrêt ---
 @app.delete("/api/delete/stop/{stop_id}" , response_model=StopRead)
@@ -470,13 +486,44 @@ def delete_stop(stop_id: int, session: Session = Depends(get_session)):
     
     session.delete(db_stop)
     session.commit()
+    topology.notify(topology.STOP, stop_id)
     
     return stop_api
 
 # --- Endpoints pour la lecture de tous les arrêts ---
+# ?limit=&after= pour paginer, ?line_id= / ?category_id= pour filtrer côté serveur
 @app.get("/api/allstop" , response_model=list[StopRead])
-def get_all_stops(session: Session = Depends(get_session)):
-    stops = session.query(Stop).all()
+def get_all_stops(
+    request: Request,
+    response: Response,
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
+    cached = not_modified(request, response, topology.STOP, topology.LINE)
+    if cached:
+        return cached
+
+    fast = fastjson.ENABLED
+
+    def load():
+        statement = select(*fastjson.columns(Stop, STOP_FIELDS)) if fast else select(Stop)
+        if line_id is not None:
+            statement = statement.where(Stop.line_id == line_id)
+        if category_id is not None:
+            statement = statement.join(TransportLine).where(TransportLine.category_id == category_id)
+        rows = session.exec(keyset(statement, Stop.id, page)).all()
+        if fast:
+            return fastjson.encode_page(rows, STOP_FIELDS, page)
+        return [stop_to_read(s) for s in rows]
+
+    stops = topology_cache.get_or_load(
+        ("allstop", fast, line_id, category_id, page.limit, page.after), (topology.STOP, topology.LINE), load
+    )
+    if fast:
+        return fastjson.page_response(stops, response)
+    set_next_cursor(response, stops, page)
     return stops
 
 
@@ -485,12 +532,23 @@ def get_all_stops(session: Session = Depends(get_session)):
 #recupere tout les lignes appartenant a une categorie
 
 @app.get("/api/category/{category_id}/lines", response_model=list[TransportLineRead])
-def get_lines_by_category(category_id: int, session: Session = Depends(get_session)):
-    db_category = session.get(categories, category_id)
-    if not db_category:
+def get_lines_by_category(category_id: int, request: Request, response: Response, session: Session = Depends(get_session)):
+    cached = not_modified(request, response, topology.CATEGORY, topology.LINE)
+    if cached:
+        return cached
+
+    # None en cache = catégorie inexistante (évite de relire la DB pour un 404 répété)
+    def load():
+        if not session.get(categories, category_id):
+            return None
+        lines = session.query(TransportLine).filter(TransportLine.category_id == category_id).all()
+        return [line_to_read(l) for l in lines]
+
+    lines = topology_cache.get_or_load(
+        ("lines_by_category", category_id), (topology.CATEGORY, topology.LINE), load
+    )
+    if lines is None:
         raise HTTPException(status_code=404, detail="Catégorie non trouvée")
-    
-    lines = session.query(TransportLine).filter(TransportLine.category_id == category_id).all()
     return lines
 
 
@@ -499,12 +557,20 @@ def get_lines_by_category(category_id: int, session: Session = Depends(get_sessi
 #recupere tout les arrets appartenant a une ligne de transport dans l'ordre des arrets
 
 @app.get("/api/line/{line_id}/stops", response_model=list[StopRead])
-def get_stops_by_line(line_id: int, session: Session = Depends(get_session)):
-    db_line = session.get(TransportLine, line_id)
-    if not db_line:
+def get_stops_by_line(line_id: int, request: Request, response: Response, session: Session = Depends(get_session)):
+    cached = not_modified(request, response, topology.LINE, topology.STOP)
+    if cached:
+        return cached
+
+    def load():
+        if not session.get(TransportLine, line_id):
+            return None
+        stops = session.query(Stop).filter(Stop.line_id == line_id).order_by(Stop.stop_order).all()
+        return [stop_to_read(s) for s in stops]
+
+    stops = topology_cache.get_or_load(("stops_by_line", line_id), (topology.LINE, topology.STOP), load)
+    if stops is None:
         raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
-    
-    stops = session.query(Stop).filter(Stop.line_id == line_id).order_by(Stop.stop_order).all()
     return stops
 
 
@@ -513,26 +579,190 @@ def get_stops_by_line(line_id: int, session: Session = Depends(get_session)):
 
 @app.get("/api/category/{category_id}/stops", response_model=list[StopRead])
 def get_stops_by_category(category_id: int, session: Session = Depends(get_session)):
-    db_category = session.get(categories, category_id)
-    if not db_category:
+    def load():
+        if not session.get(categories, category_id):
+            return None
+        stops = session.query(Stop).join(TransportLine).filter(TransportLine.category_id == category_id).order_by(Stop.line_id, Stop.stop_order).all()
+        return [stop_to_read(s) for s in stops]
+
+    stops = topology_cache.get_or_load(
+        ("stops_by_category", category_id), (topology.CATEGORY, topology.LINE, topology.STOP), load
+    )
+    if stops is None:
         raise HTTPException(status_code=404, detail="Catégorie non trouvée")
-    
-    stops = session.query(Stop).join(TransportLine).filter(TransportLine.category_id == category_id).order_by(Stop.line_id, Stop.stop_order).all()
     return stops
 
 
+#-----------------------------
+#tout le réseau en un seul document (catégories > lignes > arrêts), voir snapshot.py
+#les octets (json, gzip, br) sont préparés en mémoire et reconstruits en fond après une écriture
+
+@app.get("/api/network")
+def get_network(request: Request):
+    snapshot = network_snapshot.get()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if client_has(request, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding"), snapshot.bodies)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.bodies[encoding], media_type="application/json", headers=headers)
+
+
+#-----------------------------
+#recherche géographique des arrêts (index spatial en mémoire, voir spatial.py)
+
+@app.get("/api/stops/nearest", response_model=list[StopDistance])
+def get_nearest_stops(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=100),
+    session: Session = Depends(get_session),
+):
+    return [
+        StopDistance(**stop.model_dump(), distance_m=round(dist, 1))
+        for dist, stop in stop_index.nearest(session, lat, lon, k)
+    ]
+
+
+@app.get("/api/stops/within", response_model=list[StopDistance])
+def get_stops_within(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0, le=50_000),
+    limit: int = Query(500, ge=1, le=5000),
+    session: Session = Depends(get_session),
+):
+    return [
+        StopDistance(**stop.model_dump(), distance_m=round(dist, 1))
+        for dist, stop in stop_index.within(session, lat, lon, radius_m, limit)
+    ]
+
+
+# vue carte : bbox=minLon,minLat,maxLon,maxLat (ordre Leaflet / GeoJSON), zoom optionnel
+@app.get("/api/stops", response_model=StopViewport)
+def get_stops_in_viewport(
+    request: Request,
+    response: Response,
+    bbox: str,
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    session: Session = Depends(get_session),
+):
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox attendu : minLon,minLat,maxLon,maxLat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox invalide : min supérieur à max")
+
+    cached = not_modified(request, response, topology.STOP)
+    if cached:
+        return cached
+
+    stops, clusters = stop_index.viewport(session, min_lat, min_lon, max_lat, max_lon, zoom)
+    return StopViewport(
+        clustered=bool(clusters),
+        stops=stops,
+        clusters=[StopCluster(latitude=lat, longitude=lon, count=n) for lat, lon, n in clusters],
+    )
+
+
+#-----------------------------
+#itinéraire entre deux arrêts : A* sur le graphe du réseau gardé en mémoire (voir routing.py)
+#GET /api/route?from=12&to=345
+
+@app.get("/api/route", response_model=RouteResult)
+def get_route(
+    from_stop: int = Query(..., alias="from"),
+    to_stop: int = Query(..., alias="to"),
+    session: Session = Depends(get_session),
+):
+    try:
+        route = route_planner.route(session, from_stop, to_stop)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Arrêt non trouvé")
+    if route is None:
+        raise HTTPException(status_code=404, detail="Aucun itinéraire entre ces deux arrêts")
+    return route
+
+#-----------------------------
+#lignes en service / arrêts desservis à une heure donnée (index d'intervalles, voir service_hours.py)
+#GET /api/lines/active?at=07:30&category_id=2 ; les services après minuit (22:00 -> 01:30) sont pris en compte
+
+def _minute(at: str) -> int:
+    try:
+        return parse_at(at)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="heure invalide (HH:MM attendu)")
+
+
+@app.get("/api/lines/active", response_model=list[TransportLineRead])
+def get_active_lines(
+    request: Request,
+    response: Response,
+    at: str,
+    category_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+):
+    minute = _minute(at)
+    cached = not_modified(request, response, topology.LINE)
+    if cached:
+        return cached
+    return service_hours.active_lines(session, minute, category_id)
+
+
+@app.get("/api/stops/served", response_model=list[StopRead])
+def get_served_stops(
+    request: Request,
+    response: Response,
+    at: str,
+    category_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+):
+    minute = _minute(at)
+    cached = not_modified(request, response, topology.LINE, topology.STOP)
+    if cached:
+        return cached
+    return service_hours.served_stops(session, minute, category_id)
+
+#-----------------------------
+#recherche par nom des arrêts et des lignes pour l'autocomplétion (index en mémoire, voir search.py)
+#GET /api/search?q=hotel de v&limit=10 ; sans accents ni majuscules, préfixes de mots puis fautes de frappe
+
+@app.get("/api/search", response_model=list[SearchResult])
+def search_names(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session),
+):
+    cached = not_modified(request, response, topology.LINE, topology.STOP)
+    if cached:
+        return cached
+    return [
+        SearchResult(type=kind, id=id_, name=name, line_id=line_id)
+        for (kind, id_), name, line_id in search_index.search(session, q, limit)
+    ]
+
 #-----------------------------
 
 #ajouter un nouvelle arrét a une ligne existante
 @app.post("/api/line/{line_id}/add_stop", response_model=StopRead)
 def add_stop_to_line(line_id: int, stop_api: StopCreate, session: Session = Depends(get_session)):
-    db_line = session.get(TransportLine, line_id)
-    if not db_line:
-        raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
-    
     if stop_api.line_id != line_id:
         raise HTTPException(status_code=400, detail="L'ID de la ligne dans le corps de la requête doit correspondre à l'ID de la ligne dans l'URL")
     
+    # ligne inexistante : pas de SELECT préalable, l'INSERT est refusé par la clef étrangère (404)
+    # Décaler d'un cran les arrêts à partir de la position d'insertion (un seul UPDATE)
+    shifted = session.exec(select(Stop.id).where(Stop.line_id == line_id, Stop.stop_order >= stop_api.stop_order)).all()
+    if shifted:
+        session.execute(
+            update(Stop)
+            .where(Stop.line_id == line_id, Stop.stop_order >= stop_api.stop_order)
+            .values(stop_order=Stop.stop_order + 1)
+        )
+
     db_stop = Stop(
         line_id=line_id,
         name=stop_api.name,
@@ -542,20 +772,22 @@ def add_stop_to_line(line_id: int, stop_api: StopCreate, session: Session = Depe
     )
     
     session.add(db_stop)
-    session.commit()
-    session.refresh(db_stop)
+    with constraint_errors(foreign_key=(404, "Ligne de transport non trouvée")):
+        session.flush()
+        stop_read = stop_to_read(db_stop)
+        session.commit()
+    topology.notify(topology.STOP, [stop_read.id, *shifted])
     
-    return db_stop
+    return stop_read
 
 #supprumer un arrét d une ligne existante sans casser la séquence des ordres
 @app.delete("/api/line/{line_id}/remove_stop/{stop_id}", response_model=StopRead)
 def remove_stop_from_line(line_id: int, stop_id: int, session: Session = Depends(get_session)):
-    db_line = session.get(TransportLine, line_id)
-    if not db_line:
-        raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
-    
     db_stop = session.get(Stop, stop_id)
     if not db_stop or db_stop.line_id != line_id:
+        # la ligne n'est relue que pour choisir le message d'erreur
+        if not session.get(TransportLine, line_id):
+            raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
         raise HTTPException(status_code=404, detail="Arrêt non trouvé pour cette ligne")
     
     stop_api = StopRead(
@@ -570,12 +802,95 @@ def remove_stop_from_line(line_id: int, stop_id: int, session: Session = Depends
     # Supprimer l'arrêt
     session.delete(db_stop)
     
-    # Mettre à jour les ordres des autres arrêts
-    subsequent_stops = session.query(Stop).filter(Stop.line_id == line_id, Stop.stop_order > db_stop.stop_order).all()
-    for stop in subsequent_stops:
-        stop.stop_order -= 1
-        session.add(stop)
+    # Mettre à jour les ordres des autres arrêts en un seul UPDATE
+    # (on ne lit que leurs ids, pour la mise à jour des index en mémoire)
+    shifted = session.exec(select(Stop.id).where(Stop.line_id == line_id, Stop.stop_order > stop_api.stop_order)).all()
+    if shifted:
+        session.execute(
+            update(Stop)
+            .where(Stop.line_id == line_id, Stop.stop_order > stop_api.stop_order)
+            .values(stop_order=Stop.stop_order - 1)
+        )
     
     session.commit()
+    topology.notify(topology.STOP, [stop_id, *shifted])
     
-    return stop_api
\ No newline at end of file
+    return stop_api
+
+#réordonner tous les arrêts d'une ligne : la liste complète des ids dans le nouvel ordre
+#(stop_order = 1, 2, 3...), appliquée en un seul UPDATE ... CASE dans une transaction
+@app.put("/api/line/{line_id}/stops/order", response_model=list[StopRead])
+def reorder_line_stops(line_id: int, order: StopOrder, session: Session = Depends(get_session)):
+    stops = session.exec(select(Stop).where(Stop.line_id == line_id)).all()
+    if not stops and not session.get(TransportLine, line_id):
+        raise HTTPException(status_code=404, detail="Ligne de transport non trouvée")
+
+    by_id = {s.id: s for s in stops}
+    if len(order.stop_ids) != len(set(order.stop_ids)) or set(order.stop_ids) != set(by_id):
+        raise HTTPException(status_code=400, detail="La liste doit contenir chaque arrêt de la ligne exactement une fois")
+
+    new_orders = {stop_id: position for position, stop_id in enumerate(order.stop_ids, start=1)}
+    # réponse construite avant le commit (après, chaque objet serait relu en DB)
+    result = [stop_to_read(by_id[stop_id]) for stop_id in order.stop_ids]
+    for stop in result:
+        stop.stop_order = new_orders[stop.id]
+
+    if new_orders:
+        # limité aux arrêts lus plus haut : un arrêt ajouté entre-temps à la ligne
+        # n'est pas dans le CASE et recevrait stop_order = NULL
+        session.execute(
+            update(Stop)
+            .where(Stop.line_id == line_id, Stop.id.in_(list(new_orders)))
+            .values(stop_order=case(new_orders, value=Stop.id)),
+            execution_options={"synchronize_session": False},
+        )
+    session.commit()
+    topology.notify(topology.STOP, list(new_orders))
+
+    return result
+
+#-----------------------------
+#plusieurs créations / modifications / suppressions (catégories, lignes, arrêts) en une
+#requête et une transaction : tout est appliqué ou rien, voir batch.py
+#{"operations": [{"op": "create", "entity": "line", "ref": "L", "data": {"name": "T3", "category_id": 2}},
+#                {"op": "create", "entity": "stop", "data": {"line_id": "$L", "name": "Gare", ...}},
+#                {"op": "update", "entity": "stop", "id": 12, "data": {"stop_order": 4}},
+#                {"op": "delete", "entity": "stop", "id": 15}]}
+
+@app.post("/api/batch", response_model=BatchResponse)
+def apply_batch(payload: BatchRequest, session: Session = Depends(get_session)):
+    return {"results": batch.apply(session, payload.operations)}
+
+#-----------------------------
+#import en masse d'un CSV de lignes ou d'arrêts (colonnes : voir bulk_import.py)
+#le fichier est lu en flux et inséré par paquets de batch_size lignes, voir bulk_import.py
+
+@app.post("/api/import/{table}", response_model=ImportResult)
+def bulk_import(
+    table: str,
+    file: UploadFile = File(...),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10_000),
+    session: Session = Depends(get_session),
+):
+    importer = IMPORTERS.get(table)
+    if importer is None:
+        raise HTTPException(status_code=404, detail="Import possible uniquement pour : " + ", ".join(sorted(IMPORTERS)))
+    report = importer(session, open_csv(file.file), batch_size)
+    return report.as_dict()
+
+#-----------------------------
+#export complet d'une table en flux (NDJSON ou CSV), voir export.py
+#curl -H "Authorization: Bearer ..." http://localhost:8000/api/export/stops.ndjson > stops.ndjson
+
+@app.get("/api/export/{table}.{fmt}")
+def export_table(table: str, fmt: str):
+    if table not in export.EXPORTS:
+        raise HTTPException(status_code=404, detail="Export possible uniquement pour : " + ", ".join(sorted(export.EXPORTS)))
+    if fmt not in export.ENCODERS:
+        raise HTTPException(status_code=404, detail="Formats disponibles : " + ", ".join(sorted(export.ENCODERS)))
+    model, fields = export.EXPORTS[table]
+    return StreamingResponse(
+        export.ENCODERS[fmt](model, fields),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
@@ -0,0 +1,273 @@
+# metrics.py
+# Mesures par route exposées au format Prometheus sur GET /metrics.
+#
+# Pour chaque gabarit de route (ex. /api/line/{line_id}/stops) et méthode :
+#   - histogramme de la durée des requêtes, nombre de requêtes par statut ;
+#   - requêtes en cours ;
+#   - temps passé en DB (histogramme) et nombre de requêtes SQL (querycount.py) ;
+#   - répartition du temps : auth (JWTAuthMiddleware), handler (la fonction de
+#     l'endpoint, DB comprise), serialization (de la valeur renvoyée au début de
+#     la réponse : validation response_model + JSON), other (routage,
+#     dépendances, lecture du corps, envoi de la réponse).
+#
+# Coût : quelques perf_counter() et additions par requête, pas de verrou. Les
+# compteurs ne sont modifiés que depuis la boucle asyncio (middleware, routage) ;
+# les threads des handlers sync et les events SQLAlchemy n'écrivent que dans les
+# objets RequestTimings / querycount.QueryCounter de leur requête (contextvars).
+#
+# Comme topology : local au process, chaque worker uvicorn a ses propres
+# compteurs (Prometheus les additionne par instance).
+import contextvars
+import functools
+import inspect
+import os
+import time
+from bisect import bisect_left
+
+from fastapi.routing import APIRoute
+
+import querycount
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# secondes ; les endpoints servis depuis la mémoire répondent en moins d'une ms
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("auth", "handler", "serialization", "other")
+UNMATCHED = "<unmatched>"  # 404 : le chemin brut ferait exploser le nombre de séries
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+# GET /metrics sans token (chemins, état du pool, tailles des caches) : seulement si
+# le port n'est joignable que par Prometheus ou que le proxy filtre /metrics
+PUBLIC = os.environ.get("METRICS_PUBLIC", "0").lower() in ("1", "true", "yes")
+
+
+class RequestTimings:
+    """Temps d'une requête en cours, rempli par les différentes couches."""
+
+    __slots__ = ("auth", "handler", "handler_end", "response_start")
+
+    def __init__(self):
+        self.auth = 0.0
+        self.handler = 0.0
+        self.handler_end = None     # perf_counter() à la sortie de l'endpoint
+        self.response_start = None  # perf_counter() à l'envoi de http.response.start
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def current():
+    """RequestTimings de la requête en cours (None hors requête)."""
+    return _current.get()
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds=DURATION_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # dernier = au-delà de la plus grande borne
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class RouteStats:
+    __slots__ = ("in_flight", "duration", "db", "queries", "phases", "statuses")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.duration = Histogram()
+        self.db = Histogram()
+        self.queries = 0
+        self.phases = [0.0] * len(PHASES)
+        self.statuses = {}
+
+
+class Registry:
+    def __init__(self):
+        self.routes = {}  # (méthode, gabarit) -> RouteStats
+        self.in_flight = 0
+
+    def route(self, method, template) -> RouteStats:
+        key = (method, template)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats()
+        return stats
+
+    def observe(self, method, template, status, total, timings, queries):
+        stats = self.route(method, template)
+        stats.duration.observe(total)
+        stats.db.observe(queries.seconds)
+        stats.queries += queries.count
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        phases = stats.phases
+        phases[0] += timings.auth
+        phases[1] += timings.handler
+        serialization = 0.0
+        if timings.handler_end is not None and timings.response_start is not None:
+            serialization = max(timings.response_start - timings.handler_end, 0.0)
+        phases[2] += serialization
+        phases[3] += max(total - timings.auth - timings.handler - serialization, 0.0)
+
+    def render(self) -> str:
+        """Texte au format d'exposition Prometheus 0.0.4."""
+        routes = sorted(self.routes.items())
+        out = [
+            "# HELP http_requests_in_flight Requêtes en cours de traitement (toutes routes).",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_route_requests_in_flight Requêtes en cours par route (après le routage).",
+            "# TYPE http_route_requests_in_flight gauge",
+        ]
+        out += [f"http_route_requests_in_flight{{{_labels(key)}}} {s.in_flight}" for key, s in routes]
+
+        out += ["# HELP http_requests_total Requêtes terminées par route et statut.",
+                "# TYPE http_requests_total counter"]
+        for key, s in routes:
+            for status, count in sorted(s.statuses.items()):
+                out.append(f'http_requests_total{{{_labels(key)},status="{status}"}} {count}')
+
+        out += _histogram("http_request_duration_seconds", "Durée des requêtes (secondes).",
+                          ((key, s.duration) for key, s in routes))
+        out += _histogram("http_request_db_duration_seconds", "Temps passé en DB par requête (secondes).",
+                          ((key, s.db) for key, s in routes))
+
+        out += ["# HELP http_request_db_queries_total Requêtes SQL exécutées.",
+                "# TYPE http_request_db_queries_total counter"]
+        out += [f"http_request_db_queries_total{{{_labels(key)}}} {s.queries}" for key, s in routes]
+
+        out += ["# HELP http_request_phase_seconds_total Temps cumulé par étape : auth, handler, serialization, other.",
+                "# TYPE http_request_phase_seconds_total counter"]
+        for key, s in routes:
+            for phase, seconds in zip(PHASES, s.phases):
+                out.append(f'http_request_phase_seconds_total{{{_labels(key)},phase="{phase}"}} {seconds!r}')
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key) -> str:
+    method, template = key
+    return f'method="{method}",route="{_escape(template)}"'
+
+
+def _histogram(name, help_text, series) -> list:
+    out = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, h in series:
+        labels = _labels(key)
+        for bound, count in zip(h.bounds + ("+Inf",), h.cumulative()):
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        out.append(f"{name}_sum{{{labels}}} {h.sum!r}")
+        out.append(f"{name}_count{{{labels}}} {count}")
+    return out
+
+
+registry = Registry()
+
+
+#------------------------------------------------------------------------------
+# Collecte
+#------------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """Middleware ASGI à placer en dernier (le plus externe) : durée totale et statut."""
+
+    def __init__(self, app, registry=registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500  # exception avant toute réponse
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                timings.response_start = time.perf_counter()
+                status = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            with querycount.counting() as queries:
+                await self.app(scope, receive, send_timed)
+        finally:
+            total = time.perf_counter() - start
+            registry.in_flight -= 1
+            _current.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED
+            method = scope["method"] if scope["method"] in METHODS else "OTHER"
+            registry.observe(method, template, status, total, timings, queries)
+
+
+def _timed_endpoint(call):
+    # même nature que l'endpoint d'origine : FastAPI décide sync (threadpool) / async
+    # en regardant la fonction
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(**values):
+            timings = _current.get()
+            start = time.perf_counter()
+            try:
+                return await call(**values)
+            finally:
+                if timings is not None:
+                    timings.handler_end = time.perf_counter()
+                    timings.handler += timings.handler_end - start
+    else:
+        @functools.wraps(call)
+        def endpoint(**values):
+            timings = _current.get()
+            start = time.perf_counter()
+            try:
+                return call(**values)
+            finally:
+                if timings is not None:
+                    timings.handler_end = time.perf_counter()
+                    timings.handler += timings.handler_end - start
+    endpoint.__timed__ = True
+    return endpoint
+
+
+class TimedRoute(APIRoute):
+    """APIRoute qui compte les requêtes en cours et chronomètre la fonction de l'endpoint.
+
+    À utiliser comme route_class (app.router.route_class, APIRouter(route_class=...)).
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        # endpoint enveloppé avant que FastAPI ne l'analyse : la signature (paramètres,
+        # dépendances) est lue à travers functools.wraps. Une route recopiée par
+        # include_router arrive avec l'endpoint déjà chronométré (__timed__) : pas
+        # de deuxième enveloppe, le temps du handler serait compté deux fois
+        # (les endpoints générateurs, réponse en flux, sont laissés tels quels)
+        if not (getattr(endpoint, "__timed__", False)
+                or inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint)):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    async def handle(self, scope, receive, send):
+        stats = registry.route(scope["method"] if scope["method"] in METHODS else "OTHER", self.path)
+        stats.in_flight += 1
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            stats.in_flight -= 1
@@ -0,0 +1,142 @@
+# migrations.py
+# Migrations versionnées du schéma, appliquées à la main, étape explicite du
+# déploiement (le worker ne touche pas au schéma au démarrage, sauf avec
+# DB_AUTO_MIGRATE=1 : voir database.py) :
+#
+#   python migrations.py            # applique les migrations manquantes
+#   python migrations.py status     # version actuelle / migrations en attente
+#
+# create_all crée les tables manquantes (avec leurs index) mais ne touche jamais
+# une table existante : tout changement sur une table déjà en production (index,
+# contrainte...) s'ajoute ici, à la fin de MIGRATIONS, avec un numéro croissant.
+# Les versions appliquées sont notées dans la table schema_version.
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select
+from sqlmodel import SQLModel
+
+import models  # noqa: F401  (déclare les tables pour create_all)
+
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []  # (version, description, fonction(conn))
+
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def _index(table, name, columns, unique=False):
+    # Index écrit en dur (et non repris des modèles) : une migration doit produire le
+    # même résultat même si les modèles changent plus tard. La table n'est décrite
+    # que par les colonnes de l'index, pour le DDL.
+    t = Table(table, MetaData(), *(Column(c, Integer) for c in columns))
+    return Index(name, *(t.c[c] for c in columns), unique=unique)
+
+
+def _create_index(conn, table, name, columns, unique=False):
+    """Crée l'index, sauf si un index équivalent existe déjà."""
+    for existing in inspect(conn).get_indexes(table):
+        # MariaDB crée lui-même un index sur chaque clef étrangère (nommé comme la colonne)
+        if existing["column_names"] == columns and (existing.get("unique") or not unique):
+            return
+    _index(table, name, columns, unique).create(conn)
+
+
+def _check_no_duplicates(conn, table, column):
+    t = Table(table, MetaData(), Column(column, String(255)))
+    duplicates = conn.execute(
+        select(t.c[column]).group_by(t.c[column]).having(func.count() > 1).limit(20)
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"Valeurs en double dans {table}.{column}, à corriger avant de rendre la colonne unique : "
+            + ", ".join(map(str, duplicates))
+        )
+
+
+def _make_unique(conn, table, name, column):
+    """Remplace l'index simple `name` sur `column` par un index unique du même nom."""
+    for existing in inspect(conn).get_indexes(table):
+        if existing["column_names"] == [column] and existing.get("unique"):
+            return
+    _check_no_duplicates(conn, table, column)
+    if any(existing["name"] == name for existing in inspect(conn).get_indexes(table)):
+        _index(table, name, [column]).drop(conn)
+    _index(table, name, [column], unique=True).create(conn)
+
+
+#------------------------------------------------------------------------------
+# Migrations (ne jamais modifier une migration déjà livrée : en ajouter une nouvelle)
+#------------------------------------------------------------------------------
+
+@migration(1, "index des colonnes filtrées par les endpoints")
+def _search_indexes(conn):
+    _create_index(conn, "users", "ix_users_username", ["username"])
+    _create_index(conn, "categories", "ix_categories_name", ["name"])
+    _create_index(conn, "transportline", "ix_transportline_name", ["name"])
+    _create_index(conn, "transportline", "ix_transportline_category_id", ["category_id"])
+    _create_index(conn, "stop", "ix_stop_line_id_stop_order", ["line_id", "stop_order"])
+
+
+@migration(2, "email unique pour les utilisateurs")
+def _unique_email(conn):
+    _make_unique(conn, "users", "ix_users_email", "email")
+
+
+#------------------------------------------------------------------------------
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine) -> list:
+    """Crée les tables manquantes puis applique les migrations en attente. Renvoie les versions appliquées."""
+    SQLModel.metadata.create_all(engine)
+    _metadata.create_all(engine)
+    applied = []
+    with engine.connect() as conn:
+        done = set(conn.execute(select(schema_version.c.version)).scalars())
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        # une transaction par migration (sous MariaDB les DDL sont de toute façon auto-commit)
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_version.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+
+def pending(engine) -> list:
+    with engine.connect() as conn:
+        version = current_version(conn)
+    return [(v, d) for v, d, _ in sorted(MIGRATIONS, key=lambda m: m[0]) if v > version]
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database import engine
+
+    if sys.argv[1:] == ["status"]:
+        with engine.connect() as conn:
+            print(f"version actuelle : {current_version(conn)}")
+        for version, description in pending(engine):
+            print(f"  en attente : {version} - {description}")
+    else:
+        applied = upgrade(engine)
+        print("migrations appliquées : " + (", ".join(map(str, applied)) if applied else "aucune"))
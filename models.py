@@ -1,14 +1,21 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime, time
 
 # -----------------------------
 # 🧍 Utilisateurs
 # -----------------------------
+# Index : toute colonne filtrée par un endpoint (email au login, noms dans les
+# update_*, arrêts d'une ligne...). L'email est unique : les endpoints d'écriture
+# comptent sur cette contrainte pour refuser les doublons (writes.py). Les noms
+# ne le sont pas (deux lignes peuvent porter le même nom).
+# Les nouveaux index doivent aussi être ajoutés dans migrations.py pour les bases
+# existantes (create_all ne modifie pas une table).
 class Users(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    username: str
-    email: str
+    username: str = Field(index=True)
+    email: str = Field(index=True, unique=True)
     hashed_password: str
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
 
@@ -18,7 +25,7 @@ class Users(SQLModel, table=True):
 # -----------------------------
 class categories(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True)
 
 
 
@@ -27,8 +34,8 @@ class categories(SQLModel, table=True):
 # -----------------------------
 class TransportLine(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
-    category_id: int = Field(foreign_key="categories.id")
+    name: str = Field(index=True)
+    category_id: int = Field(foreign_key="categories.id", index=True)
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     start_time: time = Field(default=time(5, 0))   # 05:00 par défaut
     end_time: time = Field(default=time(23, 0))   # 23:00 par défaut
@@ -38,6 +45,10 @@ class TransportLine(SQLModel, table=True):
 # 🚏 Arrêts
 # -----------------------------
 class Stop(SQLModel, table=True):
+    # arrêts d'une ligne triés par ordre (get_stops_by_line, add_stop, remove_stop) ;
+    # pas unique : les décalages d'ordre passent par des doublons transitoires
+    __table_args__ = (Index("ix_stop_line_id_stop_order", "line_id", "stop_order"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     line_id: int = Field(foreign_key="transportline.id")
     name: str
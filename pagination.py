@@ -0,0 +1,50 @@
+# pagination.py
+# Pagination par curseur (keyset) pour les endpoints de liste.
+#
+# Au lieu de OFFSET (qui relit toutes les lignes sautées), on filtre sur la clef
+# primaire : WHERE id > :after ORDER BY id LIMIT :limit. Avec l'index de la
+# clef primaire, le coût d'une page est le même à la page 1 ou à la page 1000.
+#
+# La réponse reste une liste (compatible avec le front) ; le curseur de la page
+# suivante est renvoyé dans l'en-tête X-Next-After, absent sur la dernière page.
+from typing import Optional
+
+from fastapi import Query, Response
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-After"
+
+
+class PageParams:
+    """Dépendance FastAPI : ?limit=&after= (sans limit, toute la table est renvoyée)."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="taille de la page"),
+        after: Optional[int] = Query(None, ge=0, description="id du dernier élément de la page précédente"),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+def keyset(statement, id_column, page: PageParams):
+    """Applique le curseur et la limite à un select() trié par id."""
+    if page.after is not None:
+        statement = statement.where(id_column > page.after)
+    statement = statement.order_by(id_column)
+    if page.limit is not None:
+        statement = statement.limit(page.limit)
+    return statement
+
+
+def next_cursor(rows, page: PageParams, get_id=lambda row: row.id) -> Optional[int]:
+    # page pleine => il reste peut-être des éléments après le dernier id renvoyé
+    if page.limit is not None and len(rows) == page.limit:
+        return get_id(rows[-1])
+    return None
+
+
+def set_next_cursor(response: Response, rows, page: PageParams, get_id=lambda row: row.id):
+    after = next_cursor(rows, page, get_id)
+    if after is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(after)
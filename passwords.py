@@ -0,0 +1,189 @@
+# passwords.py
+# Hachage des mots de passe (scrypt) dans un pool de process dédié.
+#
+# Un KDF lent coûte volontairement des dizaines de ms de CPU : fait dans les
+# threads des requêtes il ralentirait toutes les autres routes pendant un pic
+# de connexions. Les calculs partent donc dans PASSWORD_HASH_WORKERS process, et
+# au plus PASSWORD_HASH_QUEUE calculs peuvent être en cours ou en attente : au-delà
+# la requête reçoit un 503 (Retry-After) au lieu d'occuper un thread de plus.
+#
+# Format stocké : scrypt$<n>$<r>$<p>$<sel base64>$<hash base64>
+# Les anciens hashs (sha256 hex, sans sel) sont toujours acceptés et remplacés
+# par un hash scrypt à la connexion suivante ; idem si le coût a été changé.
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+
+from fastapi import HTTPException
+
+SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", 2 ** 14))  # coût (puissance de 2)
+SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", 1))
+SALT_BYTES = 16
+
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))  # 0 = dans le thread appelant
+# doit rester bien en dessous du nombre de threads du serveur (40 pour les handlers sync)
+HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 8))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # exécuté dans les process du pool : fonction de module, arguments picklables
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and not stored.startswith("scrypt$")
+
+
+class _Latency:
+    def __init__(self, keep: int = 512):
+        self.count = 0
+        self.recent = deque(maxlen=keep)  # dernières durées en ms
+
+    def add(self, ms: float):
+        self.count += 1
+        self.recent.append(ms)
+
+    def stats(self) -> dict:
+        if not self.recent:
+            return {"count": self.count}
+        ordered = sorted(self.recent)
+        return {
+            "count": self.count,
+            "avg_ms": round(sum(ordered) / len(ordered), 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE,
+                 n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.params = (n, r, p)
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.latency = _Latency()
+
+    # --- pool de process ---
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+                    # spawn : pas de fork d'un process qui a déjà des threads (serveur, pool DB)
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Trop de connexions en cours, réessayez", headers={"Retry-After": "1"})
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self, started):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+        self.latency.add((time.perf_counter() - started) * 1000)
+
+    def _derive(self, password, salt, params):
+        """Calcule scrypt dans le pool en bloquant le thread appelant (handlers sync)."""
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return _scrypt(password, salt, *params)
+            return self._get_executor().submit(_scrypt, password, salt, *params).result()
+        finally:
+            self._release(started)
+
+    async def _aderive(self, password, salt, params):
+        """Même chose pour les handlers async : on attend sans bloquer la boucle."""
+        import asyncio
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return await asyncio.to_thread(_scrypt, password, salt, *params)
+            return await asyncio.wrap_future(self._get_executor().submit(_scrypt, password, salt, *params))
+        finally:
+            self._release(started)
+
+    # --- format ---
+
+    def _encode(self, salt, digest):
+        n, r, p = self.params
+        return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+    @staticmethod
+    def _decode(stored):
+        _, n, r, p, salt, digest = stored.split("$")
+        return (int(n), int(r), int(p)), base64.b64decode(salt), base64.b64decode(digest)
+
+    # --- API ---
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_BYTES)
+        return self._encode(salt, self._derive(password, salt, self.params))
+
+    async def ahash(self, password: str) -> str:
+        salt = os.urandom(SALT_BYTES)
+        return self._encode(salt, await self._aderive(password, salt, self.params))
+
+    def verify(self, password: str, stored: str):
+        """(mot de passe correct, nouveau hash à enregistrer ou None)."""
+        if _is_legacy(stored):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            if not hmac.compare_digest(legacy, stored):
+                return False, None
+            self.rehashed += 1
+            return True, self.hash(password)
+        try:
+            params, salt, expected = self._decode(stored)
+        except ValueError:
+            return False, None
+        ok = hmac.compare_digest(self._derive(password, salt, params), expected)
+        if ok and params != self.params:
+            # coût changé depuis : on profite d'avoir le mot de passe en clair pour mettre à jour
+            self.rehashed += 1
+            return True, self.hash(password)
+        return ok, None
+
+    def stats(self) -> dict:
+        n, r, p = self.params
+        return {
+            "algorithm": "scrypt",
+            "n": n, "r": r, "p": p,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "latency": self.latency.stats(),
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,115 @@
+# query_budgets.py
+# Nombre maximal de requêtes SQL par endpoint : un aller-retour DB ajouté par
+# erreur (relecture, vérification d'existence, boucle ligne par ligne = N+1)
+# fait échouer la vérification.
+#
+#   python query_budgets.py      # code de sortie 1 si un endpoint dépasse son budget
+#
+# Tourne toujours sur une base SQLite temporaire (jamais sur la base configurée) :
+# l'app est lancée avec SQL_DEBUG=1 et chaque réponse donne son nombre de requêtes
+# (en-tête X-DB-Queries, voir querycount.py). Les lectures sont faites juste après
+# une écriture : cache de la topologie vide, c'est le cas le plus coûteux.
+#
+# Un budget se baisse quand un endpoint fait moins d'allers-retours ; le monter
+# doit rester une décision (et se voir dans la revue).
+import os
+import sys
+import tempfile
+
+# (nom, méthode, chemin, corps JSON, budget) ; {line}, {stop}... : ids créés par seed()
+BUDGETS = [
+    ("création d'utilisateur", "POST", "/users", {"username": "budget2", "email": "budget2@example.com", "password": "secret"}, 1),
+    ("lecture d'un utilisateur", "GET", "/users/{user}", None, 1),
+    ("modification d'un utilisateur", "PUT", "/update/users/{user}", {"username": "budget-renamed"}, 3),
+    ("création de catégorie", "POST", "/api/creat/category", {"name": "budget-cat2"}, 1),
+    ("modification de catégorie", "PUT", "/api/update/category/{category}", {"name": "budget-cat-renamed"}, 2),
+    ("création de ligne", "POST", "/api/creat/line", {"name": "budget-line2", "category_id": "{category}"}, 1),
+    ("modification de ligne", "PUT", "/api/update/line/{line}", {"start_time": "06:00"}, 2),
+    ("liste des lignes", "GET", "/api/allline", None, 1),
+    ("lignes d'une catégorie", "GET", "/api/category/{category}/lines", None, 2),
+    ("création d'arrêt", "POST", "/api/creat/stop", {"line_id": "{line}", "name": "budget-stop", "latitude": 43.6, "longitude": 1.44, "stop_order": 9}, 1),
+    ("modification d'arrêt", "PUT", "/api/update/stop/{stop}", {"name": "budget-stop-renamed"}, 2),
+    ("liste des arrêts", "GET", "/api/allstop", None, 1),
+    ("arrêts d'une ligne", "GET", "/api/line/{line}/stops", None, 2),
+    ("ajout d'arrêt dans une ligne", "POST", "/api/line/{line}/add_stop", {"line_id": "{line}", "name": "budget-insert", "latitude": 43.6, "longitude": 1.45, "stop_order": 1}, 3),
+    ("retrait d'arrêt d'une ligne", "DELETE", "/api/line/{line}/remove_stop/{stop}", None, 4),
+    ("réordonnancement des arrêts", "PUT", "/api/line/{line}/stops/order", "{order}", 2),  # arrêts de la ligne, inversés
+    ("lot de modifications", "POST", "/api/batch", {"operations": [
+        {"op": "create", "entity": "line", "ref": "L", "data": {"name": "budget-batch", "category_id": "{category}"}},
+        *({"op": "create", "entity": "stop", "data": {"line_id": "$L", "name": f"b{i}", "latitude": 43.6, "longitude": 1.4 + i / 100, "stop_order": i}} for i in range(10)),
+    ]}, 2),
+    ("arrêts les plus proches", "GET", "/api/stops/nearest?lat=43.6&lon=1.44&k=3", None, 1),
+    ("lignes en service", "GET", "/api/lines/active?at=12:00", None, 2),
+    ("recherche par nom", "GET", "/api/search?q=budget", None, 2),
+    ("suppression d'arrêt", "DELETE", "/api/delete/stop/{last_stop}", None, 2),
+]
+
+
+def _fill(value, ids):
+    # "{line}" -> id créé par seed() ; les chaînes qui ne sont qu'un id redeviennent des entiers
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {k: _fill(v, ids) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, ids) for v in value]
+    return value
+
+
+def seed(client) -> dict:
+    """Un utilisateur, une catégorie, une ligne de 5 arrêts ; renvoie les ids et l'en-tête d'auth."""
+    user = client.post("/users", json={"username": "budget", "email": "budget@example.com", "password": "secret"}).json()
+    token = client.post("/token", data={"username": "budget@example.com", "password": "secret"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    category = client.post("/api/creat/category", json={"name": "budget-cat"}, headers=headers).json()
+    ops = [{"op": "create", "entity": "line", "ref": "L", "data": {"name": "budget-line", "category_id": category["id"]}}]
+    ops += [{"op": "create", "entity": "stop", "data": {"line_id": "$L", "name": f"s{i}", "latitude": 43.6,
+                                                        "longitude": 1.44 + i / 1000, "stop_order": i}} for i in range(5)]
+    results = client.post("/api/batch", json={"operations": ops}, headers=headers).json()["results"]
+    stops = [r["id"] for r in results[1:]]
+    return {
+        "headers": headers, "user": user["id"], "category": category["id"], "line": results[0]["id"],
+        "stop": stops[2], "last_stop": stops[-1],
+    }
+
+
+def check(client) -> list:
+    """[(nom, requêtes, budget, statut HTTP)] pour chaque endpoint de BUDGETS."""
+    ids = seed(client)
+    headers = ids.pop("headers")
+    results = []
+    for name, method, path, body, budget in BUDGETS:
+        if body == "{order}":
+            # liste complète des arrêts de la ligne au moment de l'appel (lue par une requête à part)
+            stops = client.get(f"/api/line/{ids['line']}/stops", headers=headers).json()
+            body = {"stop_ids": [s["id"] for s in reversed(stops)]}
+        response = client.request(method, _fill(path, ids), json=_fill(body, ids), headers=headers)
+        count = int(response.headers["x-db-queries"])
+        results.append((name, count, budget, response.status_code))
+    return results
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp(prefix="query-budgets-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'budgets.db')}"
+    os.environ["SQL_DEBUG"] = "1"
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+    from fastapi.testclient import TestClient
+
+    import database
+    import main
+    import migrations
+
+    migrations.upgrade(database.get_engine())
+    with TestClient(main.app) as client:
+        results = check(client)
+    failed = False
+    for name, count, budget, status in results:
+        if count > budget or status >= 400:
+            failed = True
+        label = "ok      " if count <= budget else "DÉPASSÉ "
+        print(f"{label}{name} : {count} / {budget} requêtes" + (f" (HTTP {status})" if status >= 400 else ""))
+    sys.exit(1 if failed else 0)
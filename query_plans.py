@@ -0,0 +1,70 @@
+# query_plans.py
+# Vérifie que les requêtes fréquentes (login, recherches par nom, arrêts d'une
+# ligne...) passent par un index : EXPLAIN de chaque requête, échec si l'une
+# d'elles parcourt une table entière.
+#
+#   python query_plans.py      # code de sortie 1 si une requête fait un full scan
+#
+# À lancer après migrations.py, sur la base cible (MariaDB) ou sur une base SQLite
+# de test (DATABASE_URL=sqlite:///test.db). Sous MariaDB, tout "type: ALL" est
+# signalé, même si un index était utilisable (possible_keys) : l'optimiseur l'a
+# écarté, c'est justement ce qu'on veut voir. Seules les tables de SMALL_TABLES
+# (quelques lignes, où lire la table coûte moins qu'un index) en sont exemptées.
+from sqlalchemy import text
+from sqlmodel import select
+
+from models import Users, categories, TransportLine, Stop
+
+# nom -> requête (telle qu'écrite dans les endpoints)
+HOT_QUERIES = {
+    "login (Users.email)": select(Users).where(Users.email == "a@b.c"),
+    # writes.check_name_free : nom déjà pris par une autre ligne (update_*)
+    "nom pris Users.username": select(Users.id).where(Users.username == "a", Users.id != 1).limit(1),
+    "nom pris categories.name": select(categories.id).where(categories.name == "a", categories.id != 1).limit(1),
+    "nom pris TransportLine.name": select(TransportLine.id).where(TransportLine.name == "a", TransportLine.id != 1).limit(1),
+    "get_lines_by_category": select(TransportLine).where(TransportLine.category_id == 1),
+    "get_stops_by_line": select(Stop).where(Stop.line_id == 1).order_by(Stop.stop_order),
+    "get_stops_by_category": (
+        select(Stop).join(TransportLine).where(TransportLine.category_id == 1).order_by(Stop.line_id, Stop.stop_order)
+    ),
+}
+
+
+# tables de quelques dizaines de lignes au plus
+SMALL_TABLES = frozenset({"categories"})
+
+
+def _explain_scans(rows) -> list:
+    """Lignes d'un EXPLAIN MariaDB -> tables lues en entier."""
+    return [f"{r['table']} (type ALL)" for r in rows if r["type"] == "ALL" and r["table"] not in SMALL_TABLES]
+
+
+def _full_scans(conn, statement) -> list:
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        # "SCAN stop" = table entière ; "SEARCH ... USING INDEX" / "SCAN ... USING INDEX" = index
+        details = [row[3] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        return [d for d in details if d.startswith("SCAN ") and "INDEX" not in d]
+    return _explain_scans(conn.execute(text("EXPLAIN " + sql)).mappings().all())
+
+
+def check(engine) -> dict:
+    """{nom de la requête: [tables lues en entier]} pour les requêtes en défaut."""
+    problems = {}
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            scans = _full_scans(conn, statement)
+            if scans:
+                problems[name] = scans
+    return problems
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database import engine
+
+    problems = check(engine)
+    for name in HOT_QUERIES:
+        print(("FULL SCAN " if name in problems else "ok        ") + name + (f" : {problems[name]}" if name in problems else ""))
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,138 @@
+# querycount.py
+# Nombre de requêtes SQL et temps DB par requête HTTP, et détection des N+1.
+#
+# database.py branche des events SQLAlchemy sur ses moteurs (count_queries) : chaque
+# requête SQL exécutée est ajoutée aux QueryCounter ouverts dans le contexte courant
+# (counting() ; un compteur imbriqué alimente aussi ceux qui l'entourent).
+# executemany compte pour une requête : c'est un seul aller-retour.
+#
+# Une même requête SQL (même texte, paramètres à part) répétée au moins
+# SQL_REPEAT_THRESHOLD fois dans une requête HTTP est le signe d'un N+1 : une
+# boucle qui lit ou écrit ligne par ligne.
+#
+# SQL_DEBUG=1 : QueryDebugMiddleware ajoute à chaque réponse les en-têtes
+#   X-DB-Queries: 3          X-DB-Time-Ms: 1.284
+#   X-DB-Repeated: 12        (si une requête est répétée, avec un warning dans les logs)
+#
+# Budgets : max_queries() pour du code appelé directement, assert_max_queries()
+# pour une réponse obtenue avec SQL_DEBUG=1 ; query_budgets.py vérifie les
+# endpoints principaux.
+import contextvars
+import logging
+import os
+from contextlib import contextmanager
+
+DEBUG = os.environ.get("SQL_DEBUG", "").lower() in ("1", "true", "yes")
+REPEAT_THRESHOLD = int(os.environ.get("SQL_REPEAT_THRESHOLD", 5))
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    __slots__ = ("count", "seconds", "statements", "parent")
+
+    def __init__(self, parent=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}  # texte SQL -> nombre d'exécutions
+        self.parent = parent
+
+    def add(self, statement, seconds):
+        counter = self
+        while counter is not None:
+            counter.count += 1
+            counter.seconds += seconds
+            counter.statements[statement] = counter.statements.get(statement, 0) + 1
+            counter = counter.parent
+
+    def repeated(self, threshold=REPEAT_THRESHOLD) -> list:
+        """[(nb, texte SQL)] des requêtes exécutées au moins `threshold` fois, les plus répétées d'abord."""
+        return sorted(((n, sql) for sql, n in self.statements.items() if n >= threshold), reverse=True)
+
+    def summary(self) -> str:
+        lines = [f"{self.count} requêtes SQL, {self.seconds * 1000:.1f} ms"]
+        lines += [f"  {n} x {sql}" for sql, n in sorted(self.statements.items(), key=lambda s: -s[1])]
+        return "\n".join(lines)
+
+
+_current = contextvars.ContextVar("query_counter", default=None)
+
+
+def current():
+    """QueryCounter le plus proche dans le contexte courant (None si aucun)."""
+    return _current.get()
+
+
+@contextmanager
+def counting():
+    counter = QueryCounter(parent=_current.get())
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+#------------------------------------------------------------------------------
+# En-têtes de debug
+#------------------------------------------------------------------------------
+
+class QueryDebugMiddleware:
+    """Middleware ASGI : en-têtes X-DB-* sur chaque réponse (installé si SQL_DEBUG=1).
+
+    Les en-têtes partent avec le début de la réponse : pour une réponse en flux
+    (export) ils ne comptent pas les requêtes faites pendant l'envoi.
+    """
+
+    def __init__(self, app, threshold=REPEAT_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with counting() as counter:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(counter.count).encode()))
+                    headers.append((b"x-db-time-ms", f"{counter.seconds * 1000:.3f}".encode()))
+                    repeated = counter.repeated(self.threshold)
+                    if repeated:
+                        headers.append((b"x-db-repeated", str(repeated[0][0]).encode()))
+                        logger.warning("N+1 possible sur %s %s : %d x %s",
+                                       scope["method"], scope["path"], repeated[0][0], repeated[0][1])
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+
+
+#------------------------------------------------------------------------------
+# Budgets
+#------------------------------------------------------------------------------
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def max_queries(budget: int):
+    """Échoue si le bloc exécute plus de `budget` requêtes SQL (code appelé dans ce thread)."""
+    with counting() as counter:
+        yield counter
+    if counter.count > budget:
+        raise QueryBudgetExceeded(f"budget de {budget} requêtes SQL dépassé\n{counter.summary()}")
+
+
+def assert_max_queries(response, budget: int):
+    """Même vérification sur une réponse HTTP (app lancée avec SQL_DEBUG=1)."""
+    if "x-db-queries" not in response.headers:
+        raise AssertionError("en-tête X-DB-Queries absent : l'app doit tourner avec SQL_DEBUG=1")
+    count = int(response.headers["x-db-queries"])
+    if count > budget:
+        request = response.request
+        raise QueryBudgetExceeded(f"{request.method} {request.url.path} : {count} requêtes SQL (budget {budget})")
+    return count
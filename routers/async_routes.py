@@ -0,0 +1,363 @@
+# routers/async_routes.py
+# Versions async des endpoints CRUD (utilisateurs, catégories, lignes, arrêts).
+# Activées avec DB_ASYNC=1 : main.py inclut ce router avant les routes sync,
+# donc ce sont ces handlers qui répondent sur les mêmes chemins.
+from datetime import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import get_async_session
+from models import Users, categories, TransportLine, Stop
+from schemas.schemas import *
+from pagination import PageParams, keyset, set_next_cursor
+import topology
+from cache import topology_cache
+from conditional import not_modified
+import fastjson
+import batch
+from metrics import TimedRoute
+from passwords import password_hasher
+from writes import constraint_errors, changes, acheck_name_free, parse_times, awith_current, iso
+
+router = APIRouter(route_class=TimedRoute)
+
+
+#------------------------------------------------------------------------------
+# Utilisateurs
+#------------------------------------------------------------------------------
+
+@router.post("/users", response_model=UserRead)
+async def create_user(user_api: UserCreate, session: AsyncSession = Depends(get_async_session)):
+    db_user = Users(
+        username=user_api.username,
+        email=user_api.email,
+        hashed_password=await password_hasher.ahash(user_api.password)
+    )
+    # email déjà utilisé : index unique => 400
+    session.add(db_user)
+    with constraint_errors():
+        await session.flush()
+        user_read = UserRead(id=db_user.id, username=db_user.username, email=db_user.email)
+        await session.commit()
+    return user_read
+
+@router.get("/users/{user_id}", response_model=UserRead)
+async def get_user(user_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_user = await session.get(Users, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    return UserRead(id=db_user.id, username=db_user.username, email=db_user.email)
+
+@router.put("/update/users/{user_id}", response_model=UserUpdate)
+async def update_user(user_id: int, user_update: UserUpdate, session: AsyncSession = Depends(get_async_session)):
+    values = changes(user_update, "username", "email")
+    if user_update.password is not None:
+        values["hashed_password"] = await password_hasher.ahash(user_update.password)
+
+    if values:
+        await acheck_name_free(session, Users, "username", values, user_id)
+        with constraint_errors():
+            matched = (await session.execute(update(Users).where(Users.id == user_id).values(**values))).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        await session.commit()
+
+    current = await awith_current(session, Users, user_id, values, ("username", "email"))
+    if current is None:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    return UserUpdate(username=current["username"], email=current["email"], password=None, mots="modification réussie")
+
+@router.delete("/delete/users/{user_id}", response_model=UserDelete)
+async def delete_user(user_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_user = await session.get(Users, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    user_api = UserDelete(id=db_user.id, username=db_user.username, email=db_user.email, mots="suppression réussie")
+    await session.delete(db_user)
+    await session.commit()
+    return user_api
+
+@router.get("/allusers")
+async def get_all_users(response: Response, page: PageParams = Depends(), session: AsyncSession = Depends(get_async_session)):
+    if fastjson.ENABLED:
+        rows = (await session.exec(keyset(select(*fastjson.columns(Users, USER_LIST_FIELDS)), Users.id, page))).all()
+        return fastjson.page_response(fastjson.encode_page(rows, USER_LIST_FIELDS, page), response)
+    users = (await session.exec(keyset(select(Users), Users.id, page))).all()
+    set_next_cursor(response, users, page)
+    return [{"id": u.id, "username": u.username, "email": u.email} for u in users]
+
+#------------------------------------------------------------------------------
+# Catégories
+#------------------------------------------------------------------------------
+
+@router.post("/api/creat/category", response_model=CategoryRead)
+async def create_category(category_api: CategoryCreate, session: AsyncSession = Depends(get_async_session)):
+    db_category = categories(name=category_api.name)
+    session.add(db_category)
+    with constraint_errors():
+        await session.flush()
+        category_read = CategoryRead(id=db_category.id, name=db_category.name)
+        await session.commit()
+    topology.notify(topology.CATEGORY, category_read.id)
+    return category_read
+
+@router.get("/api/category/{category_id}", response_model=CategoryRead)
+async def get_category(category_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_category = await session.get(categories, category_id)
+    if not db_category:
+        raise HTTPException(status_code=404, detail="Catégorie non trouvée")
+    return db_category
+
+@router.put("/api/update/category/{category_id}", response_model=CategoryUpdate)
+async def update_category(category_id: int, category_update: CategoryUpdate, session: AsyncSession = Depends(get_async_session)):
+    values = changes(category_update, "name")
+    if values:
+        await acheck_name_free(session, categories, "name", values, category_id)
+        with constraint_errors():
+            matched = (await session.execute(update(categories).where(categories.id == category_id).values(**values))).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Catégorie non trouvée")
+        await session.commit()
+        topology.notify(topology.CATEGORY, category_id)
+
+    current = await awith_current(session, categories, category_id, values, ("name",))
+    if current is None:
+        raise HTTPException(status_code=404, detail="Catégorie non trouvée")
+    return CategoryUpdate(name=current["name"])
+
+@router.delete("/api/delete/category/{category_id}", response_model=CategoryDelete)
+async def delete_category(category_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_category = await session.get(categories, category_id)
+    if not db_category:
+        raise HTTPException(status_code=404, detail="Catégorie non trouvée")
+
+    category_api = CategoryDelete(id=db_category.id, name=db_category.name)
+    await session.delete(db_category)
+    with constraint_errors(foreign_key=(400, "Catégorie utilisée par des lignes")):
+        await session.commit()
+    topology.notify(topology.CATEGORY, category_id)
+    return category_api
+
+@router.get("/api/allcategory", response_model=list[CategoryRead])
+async def get_all_category(response: Response, page: PageParams = Depends(), session: AsyncSession = Depends(get_async_session)):
+    async def load():
+        rows = (await session.exec(keyset(select(categories), categories.id, page))).all()
+        return [CategoryRead(id=c.id, name=c.name) for c in rows]
+
+    category = await topology_cache.aget_or_load(("allcategory", page.limit, page.after), (topology.CATEGORY,), load)
+    set_next_cursor(response, category, page)
+    return category
+
+#------------------------------------------------------------------------------
+# Lignes de transport
+#------------------------------------------------------------------------------
+
+@router.post("/api/creat/line", response_model=TransportLineRead)
+async def create_transport_line(line_api: TransportLineCreate, session: AsyncSession = Depends(get_async_session)):
+    # heure invalide => 422 (parse_times) ; non fournie => horaires par défaut
+    times = parse_times({"start_time": line_api.start_time or None, "end_time": line_api.end_time or None})
+    db_line = TransportLine(
+        name=line_api.name,
+        category_id=line_api.category_id,
+        start_time=times["start_time"] or time(5, 0),
+        end_time=times["end_time"] or time(23, 0)
+    )
+    # catégorie inexistante => 404
+    session.add(db_line)
+    with constraint_errors(foreign_key=(404, "Catégorie non trouvée")):
+        await session.flush()
+        line_read = line_to_read(db_line)
+        await session.commit()
+    topology.notify(topology.LINE, line_read.id)
+    return line_read
+
+@router.get("/api/line/{line_id}", response_model=TransportLineRead)
+async def get_transport_line(line_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_line = await session.get(TransportLine, line_id)
+    if not db_line:
+        raise HTTPException(status_code=404, detail="Ligne non trouvée")
+    return line_to_read(db_line)
+
+@router.put("/api/update/line/{line_id}", response_model=TransportLineUpdate)
+async def update_transport_line(line_id: int, line_update: TransportLineUpdate, session: AsyncSession = Depends(get_async_session)):
+    values = parse_times(changes(line_update, "name", "category_id", "start_time", "end_time"))
+    if values:
+        await acheck_name_free(session, TransportLine, "name", values, line_id)
+        with constraint_errors(foreign_key=(404, "Catégorie non trouvée")):
+            matched = (await session.execute(update(TransportLine).where(TransportLine.id == line_id).values(**values))).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Ligne non trouvée")
+        await session.commit()
+        topology.notify(topology.LINE, line_id)
+
+    current = await awith_current(session, TransportLine, line_id, values, ("name", "category_id", "start_time", "end_time"))
+    if current is None:
+        raise HTTPException(status_code=404, detail="Ligne non trouvée")
+    return TransportLineUpdate(
+        name=current["name"],
+        category_id=current["category_id"],
+        start_time=iso(current["start_time"]),
+        end_time=iso(current["end_time"])
+    )
+
+@router.delete("/api/delete/line/{line_id}", response_model=TransportLineDelete)
+async def delete_transport_line(line_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_line = await session.get(TransportLine, line_id)
+    if not db_line:
+        raise HTTPException(status_code=404, detail="Ligne non trouvée")
+
+    line_read = line_to_read(db_line)
+    line_api = TransportLineDelete(
+        id=line_read.id,
+        name=line_read.name,
+        category_id=line_read.category_id,
+        created_at=line_read.created_at,
+        start_time=line_read.start_time,
+        end_time=line_read.end_time
+    )
+    await session.delete(db_line)
+    with constraint_errors(foreign_key=(400, "Ligne utilisée par des arrêts")):
+        await session.commit()
+    topology.notify(topology.LINE, line_id)
+    return line_api
+
+@router.get("/api/allline", response_model=list[TransportLineRead])
+async def get_all_transport_lines(
+    request: Request,
+    response: Response,
+    category_id: Optional[int] = None,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    cached = not_modified(request, response, topology.LINE)
+    if cached:
+        return cached
+
+    fast = fastjson.ENABLED
+
+    async def load():
+        statement = select(*fastjson.columns(TransportLine, LINE_FIELDS)) if fast else select(TransportLine)
+        if category_id is not None:
+            statement = statement.where(TransportLine.category_id == category_id)
+        rows = (await session.exec(keyset(statement, TransportLine.id, page))).all()
+        if fast:
+            return fastjson.encode_page(rows, LINE_FIELDS, page)
+        return [line_to_read(l) for l in rows]
+
+    lines = await topology_cache.aget_or_load(("allline", fast, category_id, page.limit, page.after), (topology.LINE,), load)
+    if fast:
+        return fastjson.page_response(lines, response)
+    set_next_cursor(response, lines, page)
+    return lines
+
+#------------------------------------------------------------------------------
+# Arrêts
+#------------------------------------------------------------------------------
+
+@router.post("/api/creat/stop", response_model=StopRead)
+async def create_stop(stop_api: StopCreate, session: AsyncSession = Depends(get_async_session)):
+    db_stop = Stop(
+        line_id=stop_api.line_id,
+        name=stop_api.name,
+        latitude=stop_api.latitude,
+        longitude=stop_api.longitude,
+        stop_order=stop_api.stop_order
+    )
+    # ligne inexistante : clef étrangère => 404
+    session.add(db_stop)
+    with constraint_errors(foreign_key=(404, "Ligne de transport non trouvée")):
+        await session.flush()
+        stop_read = stop_to_read(db_stop)
+        await session.commit()
+    topology.notify(topology.STOP, stop_read.id)
+    return stop_read
+
+@router.get("/api/stop/{stop_id}", response_model=StopRead)
+async def get_stop(stop_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_stop = await session.get(Stop, stop_id)
+    if not db_stop:
+        raise HTTPException(status_code=404, detail="Arrêt non trouvé")
+    return db_stop
+
+@router.put("/api/update/stop/{stop_id}", response_model=StopUpdate)
+async def update_stop(stop_id: int, stop_update: StopUpdate, session: AsyncSession = Depends(get_async_session)):
+    values = changes(stop_update, *STOP_UPDATE_FIELDS)
+    if values:
+        with constraint_errors(foreign_key=(404, "Ligne de transport non trouvée")):
+            matched = (await session.execute(update(Stop).where(Stop.id == stop_id).values(**values))).rowcount
+        if not matched:
+            raise HTTPException(status_code=404, detail="Arrêt non trouvé")
+        await session.commit()
+        topology.notify(topology.STOP, stop_id)
+
+    current = await awith_current(session, Stop, stop_id, values, STOP_UPDATE_FIELDS)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Arrêt non trouvé")
+    return StopUpdate(**current)
+
+@router.delete("/api/delete/stop/{stop_id}", response_model=StopRead)
+async def delete_stop(stop_id: int, session: AsyncSession = Depends(get_async_session)):
+    db_stop = await session.get(Stop, stop_id)
+    if not db_stop:
+        raise HTTPException(status_code=404, detail="Arrêt non trouvé")
+
+    stop_api = StopRead(
+        id=db_stop.id,
+        line_id=db_stop.line_id,
+        name=db_stop.name,
+        latitude=db_stop.latitude,
+        longitude=db_stop.longitude,
+        stop_order=db_stop.stop_order
+    )
+    await session.delete(db_stop)
+    await session.commit()
+    topology.notify(topology.STOP, stop_id)
+    return stop_api
+
+@router.get("/api/allstop", response_model=list[StopRead])
+async def get_all_stops(
+    request: Request,
+    response: Response,
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    cached = not_modified(request, response, topology.STOP, topology.LINE)
+    if cached:
+        return cached
+
+    fast = fastjson.ENABLED
+
+    async def load():
+        statement = select(*fastjson.columns(Stop, STOP_FIELDS)) if fast else select(Stop)
+        if line_id is not None:
+            statement = statement.where(Stop.line_id == line_id)
+        if category_id is not None:
+            statement = statement.join(TransportLine).where(TransportLine.category_id == category_id)
+        rows = (await session.exec(keyset(statement, Stop.id, page))).all()
+        if fast:
+            return fastjson.encode_page(rows, STOP_FIELDS, page)
+        return [stop_to_read(s) for s in rows]
+
+    stops = await topology_cache.aget_or_load(
+        ("allstop", fast, line_id, category_id, page.limit, page.after), (topology.STOP, topology.LINE), load
+    )
+    if fast:
+        return fastjson.page_response(stops, response)
+    set_next_cursor(response, stops, page)
+    return stops
+
+#------------------------------------------------------------------------------
+# Lot d'opérations
+#------------------------------------------------------------------------------
+
+@router.post("/api/batch", response_model=BatchResponse)
+async def apply_batch(payload: BatchRequest, session: AsyncSession = Depends(get_async_session)):
+    # même code que la version sync, exécuté sur la connexion async (une seule transaction)
+    return {"results": await session.run_sync(batch.apply, payload.operations)}
@@ -0,0 +1,457 @@
+# routing.py
+# Calcul d'itinéraire entre deux arrêts (GET /api/route?from=&to=).
+#
+# Graphe en mémoire : un nœud par arrêt ; arêtes "trajet" entre arrêts
+# consécutifs d'une même ligne (dans les deux sens, ordre de stop_order) et
+# arêtes "à pied" entre arrêts proches de lignes différentes (correspondances).
+# Le poids est une durée estimée en secondes (vitesses moyennes ci-dessous),
+# la recherche est un A* guidé par la distance à vol d'oiseau et, quand ils sont
+# à jour, par des repères (ALT) : durées précalculées depuis quelques arrêts
+# éloignés, qui donnent par inégalité triangulaire un minorant bien plus serré de
+# la durée restante, donc beaucoup moins de nœuds visités.
+#
+# Le graphe est construit une fois depuis la DB au premier appel, puis mis à
+# jour ligne par ligne après chaque écriture (topology.DirtyTracker) : seules les
+# lignes touchées sont relues et leurs correspondances recalculées. Les repères,
+# eux, ne sont plus valables après une modification : un thread de fond les
+# recalcule (~1 s sur 50k arrêts) et en attendant la recherche se contente de la
+# distance à vol d'oiseau (résultat identique, recherche plus lente).
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+
+from sqlmodel import select
+
+import topology
+from models import TransportLine, Stop
+from spatial import METERS_PER_DEG_LAT
+
+RIDE_SPEED_MS = float(os.environ.get("ROUTE_RIDE_SPEED_KMH", 25)) / 3.6
+WALK_SPEED_MS = float(os.environ.get("ROUTE_WALK_SPEED_KMH", 4.5)) / 3.6
+TRANSFER_RADIUS_M = float(os.environ.get("ROUTE_TRANSFER_RADIUS_M", 300))
+TRANSFER_PENALTY_S = float(os.environ.get("ROUTE_TRANSFER_PENALTY_S", 180))  # attente moyenne à la correspondance
+STOP_DWELL_S = float(os.environ.get("ROUTE_STOP_DWELL_S", 20))               # arrêt du véhicule à chaque station
+MAX_TRANSFERS = int(os.environ.get("ROUTE_MAX_TRANSFERS", 8))                # correspondances gardées par arrêt
+LANDMARKS = int(os.environ.get("ROUTE_LANDMARKS", 16))                       # repères ALT, 0 = A* simple
+ACTIVE_LANDMARKS = 4
+LANDMARK_DELAY = 1.0  # secondes après une écriture avant de recalculer les repères (regroupe les écritures)
+
+logger = logging.getLogger(__name__)
+
+
+class TransitGraph:
+    """Graphe du réseau, sans accès DB (construit et modifié par RoutePlanner ou le benchmark).
+
+    Les distances sont calculées dans une projection plane (mètres) centrée sur
+    ref_lat : à l'échelle d'une ville l'écart avec haversine est négligeable, et
+    la distance à vol d'oiseau reste ainsi un minorant exact de chaque arête,
+    ce qui garantit un A* optimal.
+    """
+
+    def __init__(self, ref_lat: float = 45.0, ride_speed=RIDE_SPEED_MS, walk_speed=WALK_SPEED_MS,
+                 transfer_radius_m=TRANSFER_RADIUS_M, transfer_penalty_s=TRANSFER_PENALTY_S,
+                 stop_dwell_s=STOP_DWELL_S, max_transfers=MAX_TRANSFERS):
+        self.kx = METERS_PER_DEG_LAT * math.cos(math.radians(ref_lat))
+        self.ky = METERS_PER_DEG_LAT
+        self.ride_speed = ride_speed
+        self.walk_speed = walk_speed
+        self.transfer_radius_m = transfer_radius_m
+        self.transfer_penalty_s = transfer_penalty_s
+        self.stop_dwell_s = stop_dwell_s
+        self.max_transfers = max_transfers
+        self.stops = {}       # id -> (x, y, line_id, name, lat, lon)
+        self.line_stops = {}  # line_id -> [ids des arrêts dans l'ordre]
+        self.line_names = {}
+        self.adj = {}         # id -> {voisin: (secondes, mètres, line_id ; None = à pied)}
+        self.cells = {}       # (i, j) -> {ids} : grille de côté transfer_radius_m pour trouver les correspondances
+        self.last_explored = 0  # nœuds visités par la dernière recherche
+        self.version = 0        # incrémentée à chaque modification du graphe
+        self.landmarks = None   # id -> (durée depuis chaque repère) ; None = pas à jour
+
+    def _changed(self):
+        self.version += 1
+        self.landmarks = None
+
+    def _distance(self, a, b) -> float:
+        return math.hypot(a[0] - b[0], a[1] - b[1])
+
+    def _remove_stop(self, stop_id):
+        for neighbour in self.adj.pop(stop_id, ()):
+            self.adj[neighbour].pop(stop_id, None)
+        node = self.stops.pop(stop_id, None)
+        if node is not None:
+            cell = self._cell(node)
+            self.cells[cell].discard(stop_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def remove_line(self, line_id):
+        self._changed()
+        for stop_id in self.line_stops.pop(line_id, ()):
+            self._remove_stop(stop_id)
+
+    def set_line(self, line_id, rows) -> list:
+        """(Re)place les arrêts d'une ligne : rows = [(id, name, lat, lon)] dans l'ordre.
+
+        Les correspondances des nouveaux arrêts sont à créer ensuite avec link().
+        """
+        self.remove_line(line_id)
+        ids = []
+        previous = None
+        for stop_id, name, lat, lon in rows:
+            self._remove_stop(stop_id)  # arrêt passé d'une autre ligne à celle-ci
+            node = (lon * self.kx, lat * self.ky, line_id, name, lat, lon)
+            self.stops[stop_id] = node
+            self.adj[stop_id] = {}
+            self.cells.setdefault(self._cell(node), set()).add(stop_id)
+            if previous is not None:
+                meters = self._distance(self.stops[previous], node)
+                edge = (meters / self.ride_speed + self.stop_dwell_s, meters, line_id)
+                self.adj[previous][stop_id] = edge
+                self.adj[stop_id][previous] = edge
+            previous = stop_id
+            ids.append(stop_id)
+        if ids:
+            self.line_stops[line_id] = ids
+        return ids
+
+    def _cell(self, node):
+        return (int(node[0] // self.transfer_radius_m), int(node[1] // self.transfer_radius_m))
+
+    def link(self, stop_ids):
+        """Correspondances à pied des arrêts donnés vers les arrêts proches des autres lignes."""
+        self._changed()
+        stops, adj, cells = self.stops, self.adj, self.cells
+        radius = self.transfer_radius_m
+        for stop_id in stop_ids:
+            node = stops[stop_id]
+            ci, cj = self._cell(node)
+            # cellules de la taille du rayon : les 9 autour de l'arrêt suffisent
+            near = []
+            for i in (ci - 1, ci, ci + 1):
+                for j in (cj - 1, cj, cj + 1):
+                    for other in cells.get((i, j), ()):
+                        other_node = stops[other]
+                        if other_node[2] != node[2]:
+                            meters = math.hypot(node[0] - other_node[0], node[1] - other_node[1])
+                            if meters <= radius:
+                                near.append((meters, other))
+            if len(near) > self.max_transfers:
+                near = heapq.nsmallest(self.max_transfers, near)
+            for meters, other in near:
+                edge = (meters / self.walk_speed + self.transfer_penalty_s, meters, None)
+                adj[stop_id][other] = edge
+                adj[other][stop_id] = edge
+
+    def adjacency(self) -> dict:
+        """Copie légère {id: [(voisin, secondes)]}, pour calculer les repères sans garder le verrou."""
+        return {stop_id: [(other, edge[0]) for other, edge in neighbours.items()] for stop_id, neighbours in self.adj.items()}
+
+    def set_landmarks(self, version, table):
+        # calculés sur une copie : ignorés si le graphe a changé entre-temps
+        if version == self.version:
+            self.landmarks = table
+
+    def edge_count(self) -> int:
+        return sum(len(neighbours) for neighbours in self.adj.values()) // 2
+
+    def shortest_path(self, source, target):
+        """(durée en s, [ids des arrêts]) du trajet le plus court, None si aucun chemin."""
+        stops, adj = self.stops, self.adj
+        target_node = stops[target]
+        tx, ty = target_node[0], target_node[1]
+        # minorant de la durée restante : distance à vol d'oiseau au plus rapide des deux modes
+        inv_speed = 1.0 / max(self.ride_speed, self.walk_speed)
+        hypot = math.hypot
+        heappush, heappop = heapq.heappush, heapq.heappop
+
+        landmarks = self.landmarks
+        # |d(L, cible) - d(L, n)| <= d(n, cible) pour chaque repère L (graphe non orienté) ;
+        # un repère qui n'atteint pas la cible n'apporte rien
+        to_target = [(k, d) for k, d in enumerate(landmarks[target]) if d != math.inf] if landmarks else []
+        if to_target:
+            source_row = landmarks[source]
+            if any(source_row[k] == math.inf for k, _ in to_target):
+                return None  # un repère atteint la cible mais pas le départ : autre composante
+            # repères "actifs" : les ACTIVE_LANDMARKS qui minorent le mieux au départ, les
+            # autres n'apportent presque rien sur ce trajet mais coûtent à chaque nœud
+            to_target.sort(key=lambda kd: -abs(kd[1] - source_row[kd[0]]))
+            (k1, d1), (k2, d2), (k3, d3), (k4, d4) = (to_target * ACTIVE_LANDMARKS)[:ACTIVE_LANDMARKS]
+
+            def estimate(n):
+                row = landmarks[n]
+                return max(abs(d1 - row[k1]), abs(d2 - row[k2]), abs(d3 - row[k3]), abs(d4 - row[k4]))
+        else:
+            def estimate(n):
+                node = stops[n]
+                return hypot(node[0] - tx, node[1] - ty) * inv_speed
+
+        best = {source: 0.0}
+        best_get = best.get
+        previous = {source: None}
+        done = set()
+        inf = math.inf
+        heap = [(estimate(source), 0.0, source)]
+        while heap:
+            _, cost, node = heappop(heap)
+            if node == target:
+                break
+            if node in done:
+                continue
+            done.add(node)
+            for neighbour, edge in adj[node].items():
+                new_cost = cost + edge[0]
+                if new_cost < best_get(neighbour, inf):
+                    best[neighbour] = new_cost
+                    previous[neighbour] = node
+                    heappush(heap, (new_cost + estimate(neighbour), new_cost, neighbour))
+        else:
+            return None
+        self.last_explored = len(done)
+
+        path = [target]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        path.reverse()
+        return best[target], path
+
+    def legs(self, path) -> list:
+        """Découpe le chemin en tronçons : même ligne ("ride") ou à pied ("walk")."""
+        legs = []
+        for a, b in zip(path, path[1:]):
+            seconds, meters, line_id = self.adj[a][b]
+            leg = legs[-1] if legs else None
+            if leg is None or leg["line_id"] != line_id:
+                leg = {
+                    "mode": "walk" if line_id is None else "ride",
+                    "line_id": line_id,
+                    "line_name": self.line_names.get(line_id),
+                    "stops": [self._stop_dict(a)],
+                    "distance_m": 0.0,
+                    "duration_s": 0.0,
+                }
+                legs.append(leg)
+            leg["stops"].append(self._stop_dict(b))
+            leg["distance_m"] += meters
+            leg["duration_s"] += seconds
+        for leg in legs:
+            leg["distance_m"] = round(leg["distance_m"], 1)
+            leg["duration_s"] = round(leg["duration_s"], 1)
+        return legs
+
+    def _stop_dict(self, stop_id):
+        node = self.stops[stop_id]
+        return {"id": stop_id, "name": node[3], "latitude": node[4], "longitude": node[5]}
+
+
+def _durations_from(adjacency, source) -> dict:
+    """Dijkstra complet : {id: durée depuis source} pour tous les arrêts atteignables."""
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    heappush, heappop = heapq.heappush, heapq.heappop
+    while heap:
+        cost, node = heappop(heap)
+        if cost > best[node]:
+            continue
+        for neighbour, seconds in adjacency[node]:
+            new_cost = cost + seconds
+            if new_cost < best.get(neighbour, math.inf):
+                best[neighbour] = new_cost
+                heappush(heap, (new_cost, neighbour))
+    return best
+
+
+def landmark_table(adjacency, count: int = LANDMARKS) -> dict:
+    """Repères ALT choisis "au plus loin" : chacun est l'arrêt le plus éloigné (en durée)
+    des repères déjà choisis. Renvoie {id: (durée depuis chaque repère)} (inf si inatteignable).
+    """
+    if not adjacency or count <= 0:
+        return None
+    # premier repère : le plus loin d'un arrêt quelconque
+    start = _durations_from(adjacency, next(iter(adjacency)))
+    candidate = max(start, key=start.get)
+    durations = []
+    nearest = {}  # id -> durée jusqu'au repère le plus proche
+    for _ in range(count):
+        found = _durations_from(adjacency, candidate)
+        durations.append(found)
+        for stop_id, seconds in found.items():
+            if seconds < nearest.get(stop_id, math.inf):
+                nearest[stop_id] = seconds
+        candidate = max(nearest, key=nearest.get)
+        if nearest[candidate] == 0.0:
+            break  # chaque arrêt (atteignable) est déjà un repère
+    inf = math.inf
+    return {stop_id: tuple(found.get(stop_id, inf) for found in durations) for stop_id in adjacency}
+
+
+class RoutePlanner:
+    """TransitGraph synchronisé avec les tables Stop et TransportLine."""
+
+    def __init__(self):
+        self.graph = None
+        self.stop_tracker = topology.DirtyTracker(topology.STOP)
+        self.line_tracker = topology.DirtyTracker(topology.LINE)
+        # même principe que spatial.StopIndex : recherches et mises à jour sous un seul verrou
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.updates = 0
+        self.last_build_ms = 0.0
+        self.last_update_ms = 0.0
+        self.landmark_builds = 0
+        self.last_landmarks_ms = 0.0
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @staticmethod
+    def _stops_by_line(session, line_ids=None) -> dict:
+        statement = (
+            select(Stop.id, Stop.line_id, Stop.name, Stop.latitude, Stop.longitude)
+            .order_by(Stop.line_id, Stop.stop_order, Stop.id)
+        )
+        if line_ids is not None:
+            statement = statement.where(Stop.line_id.in_(line_ids))
+        by_line = {}
+        for stop_id, line_id, name, lat, lon in session.exec(statement):
+            by_line.setdefault(line_id, []).append((stop_id, name, lat, lon))
+        return by_line
+
+    def _build(self, session):
+        started = time.perf_counter()
+        by_line = self._stops_by_line(session)
+        lats = [row[2] for rows in by_line.values() for row in rows]
+        graph = TransitGraph(ref_lat=sum(lats) / len(lats) if lats else 45.0)
+        graph.line_names = dict(session.exec(select(TransportLine.id, TransportLine.name)).all())
+        for line_id, rows in by_line.items():
+            graph.set_line(line_id, rows)
+        graph.link(list(graph.stops))
+        self.graph = graph
+        self.builds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+    def _update(self, session, stop_ids, line_ids):
+        started = time.perf_counter()
+        graph = self.graph
+        if line_ids:
+            names = dict(session.exec(select(TransportLine.id, TransportLine.name).where(TransportLine.id.in_(line_ids))).all())
+            for line_id in line_ids:
+                if line_id in names:
+                    graph.line_names[line_id] = names[line_id]
+                else:
+                    graph.line_names.pop(line_id, None)
+                    graph.remove_line(line_id)
+        if stop_ids:
+            # lignes touchées : l'ancienne ligne de chaque arrêt (graphe) et la nouvelle (DB)
+            lines = {graph.stops[s][2] for s in stop_ids if s in graph.stops}
+            lines.update(session.exec(select(Stop.line_id).where(Stop.id.in_(stop_ids))).all())
+            by_line = self._stops_by_line(session, lines)
+            # toutes retirées avant d'en replacer une : un arrêt passé de l'une à l'autre
+            # ne doit pas être supprimé par le retrait de son ancienne ligne
+            for line_id in lines:
+                graph.remove_line(line_id)
+            relinked = []
+            for line_id in lines:
+                relinked += graph.set_line(line_id, by_line.get(line_id, []))
+            graph.link(relinked)
+        self.updates += 1
+        self.last_update_ms = (time.perf_counter() - started) * 1000
+
+    def _refresh(self, session):
+        if not (self.stop_tracker.pending() or self.line_tracker.pending()):
+            return
+        full_stops, stop_ids = self.stop_tracker.take()
+        full_lines, line_ids = self.line_tracker.take()
+        try:
+            if full_stops or full_lines or self.graph is None:
+                self._build(session)
+            else:
+                self._update(session, stop_ids, line_ids)
+            if self.graph.landmarks is None and LANDMARKS > 0:
+                self._schedule_landmarks()
+        except Exception:
+            # lecture DB ratée : graphe peut-être incomplet, il sera reconstruit en entier
+            self.stop_tracker.reset()
+            self.line_tracker.reset()
+            raise
+
+    # --- repères ALT, recalculés en fond (comme snapshot.NetworkSnapshot) ---
+
+    def _schedule_landmarks(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="route-landmarks", daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(LANDMARK_DELAY)
+            self._wake.clear()
+            try:
+                self.compute_landmarks()
+            except Exception:
+                # le thread reste en vie : prochain essai à la prochaine écriture
+                logger.exception("calcul des repères ALT impossible, recherche A* sans repères")
+
+    def compute_landmarks(self):
+        with self._lock:
+            graph = self.graph
+            if graph is None or graph.landmarks is not None:
+                return
+            version, adjacency = graph.version, graph.adjacency()
+        # calcul hors verrou : les recherches continuent (sans repères) pendant ce temps
+        started = time.perf_counter()
+        table = landmark_table(adjacency)
+        with self._lock:
+            graph.set_landmarks(version, table)
+            if graph.landmarks is not None:
+                self.landmark_builds += 1
+                self.last_landmarks_ms = (time.perf_counter() - started) * 1000
+
+    def route(self, session, source, target):
+        """Itinéraire (dict) entre deux arrêts ; KeyError si un arrêt n'existe pas, None si aucun chemin."""
+        with self._lock:
+            self._refresh(session)
+            graph = self.graph
+            if source not in graph.stops:
+                raise KeyError(source)
+            if target not in graph.stops:
+                raise KeyError(target)
+            started = time.perf_counter()
+            found = graph.shortest_path(source, target)
+            if found is None:
+                return None
+            duration, path = found
+            legs = graph.legs(path)
+            return {
+                "from_stop": source,
+                "to_stop": target,
+                "duration_s": round(duration, 1),
+                "distance_m": round(sum(leg["distance_m"] for leg in legs), 1),
+                "transfers": max(0, sum(leg["mode"] == "ride" for leg in legs) - 1),
+                "legs": legs,
+                "search_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+
+    def stats(self) -> dict:
+        graph = self.graph
+        return {
+            "stops": len(graph.stops) if graph else 0,
+            "edges": graph.edge_count() if graph else 0,
+            "builds": self.builds,
+            "last_build_ms": round(self.last_build_ms, 1),
+            "updates": self.updates,
+            "last_update_ms": round(self.last_update_ms, 1),
+            "landmarks_ready": graph is not None and graph.landmarks is not None,
+            "landmark_builds": self.landmark_builds,
+            "last_landmarks_ms": round(self.last_landmarks_ms, 1),
+        }
+
+
+route_planner = RoutePlanner()
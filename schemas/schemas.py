@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
 class UserCreate(SQLModel):
     username: str
@@ -13,6 +13,9 @@ class UserRead(SQLModel):
     email: str
     mots: Optional[str] = None
 
+# champs de /allusers
+USER_LIST_FIELDS = ("id", "username", "email")
+
     
 class UserUpdate(SQLModel):
     username: Optional[str] = None
@@ -93,6 +96,20 @@ class TransportLineDelete(SQLModel):
     start_time: Optional[str] = None
     end_time: Optional[str] = None
 
+#conversion depuis la DB (les dates / heures sont renvoyées en str)
+# champs renvoyés par les listes, dans l'ordre (mode FAST_JSON : select de ces colonnes)
+LINE_FIELDS = tuple(TransportLineRead.model_fields)
+
+def line_to_read(l) -> TransportLineRead:
+    return TransportLineRead(
+        id=l.id,
+        name=l.name,
+        category_id=l.category_id,
+        created_at=l.created_at.isoformat() if l.created_at is not None else None,
+        start_time=l.start_time.isoformat() if l.start_time is not None else None,
+        end_time=l.end_time.isoformat() if l.end_time is not None else None,
+    )
+
 
 
 #stop schemas
@@ -116,6 +133,70 @@ class StopRead(SQLModel):
     longitude: float
     stop_order: int
     
+#arrêt avec sa distance à un point (recherche géographique)
+class StopDistance(StopRead):
+    distance_m: float
+
+#nouvel ordre des arrêts d'une ligne (PUT /api/line/{id}/stops/order)
+class StopOrder(SQLModel):
+    stop_ids: list[int]
+
+#groupe d'arrêts affiché sur la carte à faible zoom
+class StopCluster(SQLModel):
+    latitude: float
+    longitude: float
+    count: int
+
+#arrêts visibles dans une zone de la carte (GET /api/stops?bbox=)
+class StopViewport(SQLModel):
+    clustered: bool
+    stops: list[StopRead] = []
+    clusters: list[StopCluster] = []
+
+#résultat de la recherche par nom (GET /api/search) : un arrêt ou une ligne
+class SearchResult(SQLModel):
+    type: Literal["stop", "line"]
+    id: int
+    name: str
+    line_id: Optional[int] = None  # ligne de l'arrêt
+
+#itinéraire entre deux arrêts (GET /api/route)
+class RouteStop(SQLModel):
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+
+class RouteLeg(SQLModel):
+    mode: str  # "ride" (sur une ligne) ou "walk" (correspondance à pied)
+    line_id: Optional[int] = None
+    line_name: Optional[str] = None
+    stops: list[RouteStop]
+    distance_m: float
+    duration_s: float
+
+class RouteResult(SQLModel):
+    from_stop: int
+    to_stop: int
+    duration_s: float
+    distance_m: float
+    transfers: int
+    legs: list[RouteLeg]
+    search_ms: float
+
+#conversion depuis la DB
+STOP_FIELDS = tuple(StopRead.model_fields)
+
+def stop_to_read(s) -> StopRead:
+    return StopRead(
+        id=s.id,
+        line_id=s.line_id,
+        name=s.name,
+        latitude=s.latitude,
+        longitude=s.longitude,
+        stop_order=s.stop_order,
+    )
+
 #mise a jour
 class StopUpdate(SQLModel):
     line_id: Optional[int] = None
@@ -123,6 +204,8 @@ class StopUpdate(SQLModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     stop_order: Optional[int] = None
+
+STOP_UPDATE_FIELDS = tuple(StopUpdate.model_fields)
     
 #suppression
 class StopDelete(SQLModel):
@@ -131,4 +214,39 @@ class StopDelete(SQLModel):
     name: str
     latitude: float
     longitude: float
-    stop_order: int
\ No newline at end of file
+    stop_order: int
+
+
+#import en masse (POST /api/import/{lines,stops})
+class ImportRowError(SQLModel):
+    row: int
+    error: str
+
+class ImportResult(SQLModel):
+    table: str
+    inserted: int
+    rejected: int
+    elapsed_s: float
+    rows_per_sec: float
+    errors: list[ImportRowError] = []
+
+
+#lot d'opérations dans une seule transaction (POST /api/batch)
+class BatchOperation(SQLModel):
+    op: Literal["create", "update", "delete"]
+    entity: Literal["category", "line", "stop"]
+    id: Optional[int] = None   # update / delete
+    ref: Optional[str] = None  # create : id réutilisable plus loin dans le lot sous la forme "$ref"
+    data: dict = {}            # champs de CategoryCreate / TransportLineUpdate / StopCreate...
+
+class BatchRequest(SQLModel):
+    operations: list[BatchOperation]
+
+class BatchResult(SQLModel):
+    index: int
+    op: str
+    entity: str
+    id: int
+
+class BatchResponse(SQLModel):
+    results: list[BatchResult]
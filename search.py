@@ -0,0 +1,256 @@
+# search.py
+# Recherche par nom des arrêts et des lignes pour l'autocomplétion
+# (GET /api/search?q=), depuis un index en mémoire.
+#
+# Les noms sont normalisés avant d'être indexés comme avant d'être cherchés :
+# minuscules, accents retirés, ponctuation -> espace ("Hôtel-de-Ville" ->
+# "hotel de ville"), donc "hotel de v" trouve "Hôtel de Ville".
+#
+# Structures :
+#   - noms : liste triée de (nom normalisé, type, id). Deux bisect donnent les
+#     noms qui commencent par la requête, déjà dans l'ordre alphabétique ;
+#   - mots : liste triée de (mot, type, id). Complète la réponse avec les noms
+#     dont chaque mot de la requête commence un mot ("lyon" -> "Gare de Lyon") :
+#     parcours de la plage du mot de la requête le plus rare, arrêté dès que
+#     `limit` noms sont trouvés ;
+#   - trigrammes des mots distincts : mot -> "  mo", " mo", "mot", "ot " ;
+#     {trigramme: {mots}}. Quand aucun nom ne correspond, chaque mot de la
+#     requête qui ne commence aucun mot connu est remplacé par un mot proche
+#     (faute de frappe : "hotle de ville" -> "hotel de ville") : les
+#     FUZZY_CANDIDATES plus proches sont essayés dans l'ordre, on garde le premier
+#     qui donne au moins un nom avec les autres mots. Si tous les mots existent
+#     mais aucun nom ne les contient tous, on essaie de corriger chacun d'eux.
+#     Le vocabulaire (quelques dizaines de milliers de mots pour 100k noms) est
+#     bien plus petit que la liste des noms.
+#
+# Ordre : noms qui commencent par la requête, puis noms dont un mot commence par
+# chaque mot de la requête (ordre alphabétique du mot).
+#
+# Mis à jour nom par nom après chaque écriture (topology.DirtyTracker), comme
+# spatial.StopIndex et service_hours.ServiceHours.
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+from sqlmodel import select
+
+import topology
+from models import TransportLine, Stop
+
+STOP, LINE = "stop", "line"
+MAX_PREFIX_CANDIDATES = 5000  # au-delà (requête d'une lettre...) : les premiers par ordre alphabétique
+FUZZY_MIN_SCORE = 0.4         # similarité minimale (trigrammes) entre un mot de la requête et sa correction
+FUZZY_CANDIDATES = 5          # corrections essayées par mot
+
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae"})
+_COMBINING = re.compile(r"[\u0300-\u036f]")  # accents séparés de leur lettre par NFKD
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces simples."""
+    text = _COMBINING.sub("", unicodedata.normalize("NFKD", text.casefold().translate(_LIGATURES)))
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def trigrams(word: str, prefix=False) -> set:
+    """Trigrammes d'un mot complété par des espaces ; un début de mot (dernier mot
+    d'une requête en cours de frappe) n'a pas d'espace final."""
+    padded = "  " + word + ("" if prefix else " ")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Index noms + mots + trigrammes du vocabulaire ; clé = (type, id)."""
+
+    def __init__(self, items=()):
+        """items : [(clé, nom, line_id)] chargés en bloc (un seul tri)."""
+        self.entries = {}   # clé -> (nom, " " + nom normalisé, line_id)
+        self.names = []     # [(nom normalisé, type, id)] triée
+        self.words = []     # [(mot, type, id)] triée
+        self.vocabulary = {}  # mot -> nombre de noms qui le contiennent
+        self.postings = {}  # trigramme -> {mots}
+        for key, name, line_id in items:
+            norm, words = self._add(key, name, line_id)
+            self.names.append((norm, *key))
+            self.words.extend((word, *key) for word in words)
+        self.names.sort()
+        self.words.sort()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, key, name, line_id):
+        norm = normalize(name)
+        words = tuple(dict.fromkeys(norm.split()))
+        self.entries[key] = (name, " " + norm, line_id)
+        for word in words:
+            count = self.vocabulary.get(word, 0)
+            if not count:
+                for gram in trigrams(word):
+                    self.postings.setdefault(gram, set()).add(word)
+            self.vocabulary[word] = count + 1
+        return norm, words
+
+    def insert(self, key, name, line_id=None):
+        self.remove(key)
+        norm, words = self._add(key, name, line_id)
+        insort(self.names, (norm, *key))
+        for word in words:
+            insort(self.words, (word, *key))
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        norm = entry[1][1:]
+        del self.names[bisect_left(self.names, (norm, *key))]
+        for word in dict.fromkeys(norm.split()):
+            del self.words[bisect_left(self.words, (word, *key))]
+            count = self.vocabulary.pop(word) - 1
+            if count:
+                self.vocabulary[word] = count
+                continue
+            for gram in trigrams(word):
+                words = self.postings[gram]
+                words.discard(word)
+                if not words:
+                    del self.postings[gram]
+
+    @staticmethod
+    def _range(sorted_list, prefix):
+        return bisect_left(sorted_list, (prefix,)), bisect_left(sorted_list, (prefix + "\uffff",))
+
+    def _word_matches(self, tokens, found, limit):
+        lo, hi = min((self._range(self.words, t) for t in tokens), key=lambda r: r[1] - r[0])
+        needles = [" " + t for t in tokens]
+        for _, kind, id_ in self.words[lo:min(hi, lo + MAX_PREFIX_CANDIDATES)]:
+            key = (kind, id_)
+            if key in found:
+                continue
+            if all(needle in self.entries[key][1] for needle in needles):  # " mot" : début d'un mot du nom
+                found[key] = None
+                if len(found) >= limit:
+                    return
+
+    def _candidates(self, token, prefix) -> list:
+        """Mots du vocabulaire proches de `token`, les plus proches d'abord."""
+        grams = trigrams(token, prefix)
+        counts = {}
+        for gram in grams:
+            for word in self.postings.get(gram, ()):
+                counts[word] = counts.get(word, 0) + 1
+        ranked = []
+        for word, shared in counts.items():
+            if prefix:
+                # début de mot : part des trigrammes tapés retrouvés dans le mot
+                score = shared / len(grams)
+            else:
+                score = 2 * shared / (len(grams) + len(word) + 1)  # Dice ; un mot a len + 1 trigrammes
+            if score >= FUZZY_MIN_SCORE and word != token:
+                ranked.append((-score, abs(len(word) - len(token)), -self.vocabulary[word], word))
+        ranked.sort()
+        return [word for *_, word in ranked[:FUZZY_CANDIDATES]]
+
+    def _matches_any(self, tokens) -> bool:
+        found = {}
+        self._word_matches(tokens, found, 1)
+        return bool(found)
+
+    def _fuzzy_matches(self, tokens, found, limit):
+        last = len(tokens) - 1
+        unknown = [i for i, t in enumerate(tokens) if not self._matches_any([t])]
+        if unknown:
+            corrected = list(tokens)
+            for i in unknown:
+                # les autres mots inconnus sont mis de côté le temps de choisir celui-ci
+                others = [t for j, t in enumerate(corrected) if j not in unknown or j < i]
+                for word in self._candidates(tokens[i], prefix=i == last):
+                    if self._matches_any(others + [word]):
+                        corrected[i] = word
+                        break
+                else:
+                    return
+            self._word_matches(corrected, found, limit)
+            return
+        for i, token in enumerate(tokens):
+            for word in self._candidates(token, prefix=i == last):
+                corrected = tokens[:i] + [word] + tokens[i + 1:]
+                if self._matches_any(corrected):
+                    self._word_matches(corrected, found, limit)
+                    return
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """[(clé, nom, line_id)] des noms qui correspondent, les meilleurs d'abord."""
+        query = normalize(query)
+        tokens = query.split()
+        if not tokens:
+            return []
+        lo, hi = self._range(self.names, query)
+        found = dict.fromkeys((kind, id_) for _, kind, id_ in self.names[lo:min(hi, lo + limit)])
+        if len(found) < limit:
+            self._word_matches(tokens, found, limit)
+        if not found:
+            self._fuzzy_matches(tokens, found, limit)
+        return [(key, self.entries[key][0], self.entries[key][2]) for key in found]
+
+
+class SearchIndex:
+    """NameIndex des arrêts et des lignes, synchronisé avec la DB."""
+
+    def __init__(self):
+        self.index = NameIndex()
+        self.line_tracker = topology.DirtyTracker(topology.LINE)
+        self.stop_tracker = topology.DirtyTracker(topology.STOP)
+        # même principe que spatial.StopIndex : lectures et mises à jour sous un seul verrou
+        self._lock = threading.Lock()
+
+    def _rows(self, session, line_ids=None, stop_ids=None):
+        """[(clé, nom, line_id)] des lignes puis des arrêts (tous si ids vaut None)."""
+        rows = []
+        if line_ids is None or line_ids:
+            statement = select(TransportLine.id, TransportLine.name)
+            if line_ids is not None:
+                statement = statement.where(TransportLine.id.in_(line_ids))
+            rows += [((LINE, id_), name, None) for id_, name in session.exec(statement)]
+        if stop_ids is None or stop_ids:
+            statement = select(Stop.id, Stop.name, Stop.line_id)
+            if stop_ids is not None:
+                statement = statement.where(Stop.id.in_(stop_ids))
+            rows += [((STOP, id_), name, line_id) for id_, name, line_id in session.exec(statement)]
+        return rows
+
+    def _refresh(self, session):
+        if not (self.line_tracker.pending() or self.stop_tracker.pending()):
+            return
+        full_lines, line_ids = self.line_tracker.take()
+        full_stops, stop_ids = self.stop_tracker.take()
+        try:
+            if full_lines or full_stops:
+                # rechargement complet (démarrage, import en masse) : index reconstruit en bloc
+                self.index = NameIndex(self._rows(session))
+                return
+            rows = self._rows(session, line_ids, stop_ids)
+            found = {key for key, _, _ in rows}
+            for key in [(LINE, id_) for id_ in line_ids] + [(STOP, id_) for id_ in stop_ids]:
+                if key not in found:
+                    self.index.remove(key)  # supprimé
+            for key, name, line_id in rows:
+                self.index.insert(key, name, line_id)
+        except Exception:
+            # lecture DB ratée : on ne sait plus ce qui est à jour, tout sera rechargé
+            self.line_tracker.reset()
+            self.stop_tracker.reset()
+            raise
+
+    def search(self, session, query: str, limit: int = 10) -> list:
+        with self._lock:
+            self._refresh(session)
+            return self.index.search(query, limit)
+
+    def stats(self) -> dict:
+        return {"names": len(self.index), "words": len(self.index.vocabulary), "trigrams": len(self.index.postings)}
+
+
+search_index = SearchIndex()
@@ -0,0 +1,196 @@
+# service_hours.py
+# Lignes en service à une heure donnée (start_time / end_time de TransportLine),
+# pour GET /api/lines/active et GET /api/stops/served.
+#
+# Index d'intervalles sur les minutes de la journée : un arbre de segments de
+# 1440 feuilles (une par minute). Le service d'une ligne est rangé dans au plus
+# ~2 x 11 nœuds ; une recherche lit les 11 nœuds du chemin racine -> minute,
+# son coût dépend du nombre de lignes trouvées, pas du nombre total de lignes.
+#
+# Un service qui passe minuit (end_time < start_time, ex. 22:00 -> 01:30) est
+# rangé en deux morceaux : [22:00, 23:59] et [00:00, 01:30]. Les bornes sont
+# incluses et la précision est la minute (les secondes sont ignorées).
+#
+# Mis à jour ligne par ligne après chaque écriture (topology.DirtyTracker),
+# comme spatial.StopIndex.
+import threading
+from datetime import time
+
+from sqlmodel import select
+
+import topology
+from models import TransportLine, Stop
+from schemas.schemas import TransportLineRead, stop_to_read
+from writes import iso
+
+MINUTES_PER_DAY = 24 * 60
+_SIZE = 2048  # puissance de 2 >= MINUTES_PER_DAY
+
+
+def minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def parse_at(value: str) -> int:
+    """"HH:MM" (ou "HH:MM:SS") -> minute de la journée ; ValueError si invalide."""
+    return minute_of_day(time.fromisoformat(value))
+
+
+def service_ranges(start: int, end: int) -> list:
+    """Minutes de service [(début, fin)] bornes incluses, coupées à minuit si besoin."""
+    if start <= end:
+        return [(start, end)]
+    return [(start, MINUTES_PER_DAY - 1), (0, end)]
+
+
+class IntervalIndex:
+    """Arbre de segments sur les minutes : chaque nœud garde {category_id: {ids}}."""
+
+    def __init__(self):
+        self.nodes = [None] * (2 * _SIZE)
+        self.entries = {}  # id -> (category_id, ranges)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _nodes(self, first, last):
+        # décomposition canonique de [first, last] (bornes incluses)
+        lo, hi = first + _SIZE, last + _SIZE + 1
+        while lo < hi:
+            if lo & 1:
+                yield lo
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                yield hi
+            lo >>= 1
+            hi >>= 1
+
+    def insert(self, key, category_id, start, end):
+        self.remove(key)
+        ranges = service_ranges(start, end)
+        for first, last in ranges:
+            for n in self._nodes(first, last):
+                if self.nodes[n] is None:
+                    self.nodes[n] = {}
+                self.nodes[n].setdefault(category_id, set()).add(key)
+        self.entries[key] = (category_id, ranges)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        category_id, ranges = entry
+        for first, last in ranges:
+            for n in self._nodes(first, last):
+                node = self.nodes[n]
+                node[category_id].discard(key)
+                if not node[category_id]:
+                    del node[category_id]
+
+    def at(self, minute, category_id=None) -> list:
+        """ids en service à cette minute (triés), éventuellement d'une seule catégorie."""
+        found = []
+        n = minute + _SIZE
+        while n:
+            node = self.nodes[n]
+            if node:
+                if category_id is None:
+                    for ids in node.values():
+                        found.extend(ids)
+                elif category_id in node:
+                    found.extend(node[category_id])
+            n >>= 1
+        # un id n'est rangé qu'une fois sur le chemin d'une minute : pas de doublons
+        found.sort()
+        return found
+
+
+class ServiceHours:
+    """IntervalIndex des lignes + arrêts par ligne, synchronisés avec la DB."""
+
+    def __init__(self):
+        self.index = IntervalIndex()
+        self.lines = {}          # id -> TransportLineRead
+        self.stops_by_line = {}  # line_id -> [StopRead] triés par stop_order
+        self.stop_lines = {}     # stop_id -> line_id
+        self.line_tracker = topology.DirtyTracker(topology.LINE)
+        self.stop_tracker = topology.DirtyTracker(topology.STOP)
+        # même principe que spatial.StopIndex : lectures et mises à jour sous un seul verrou
+        self._lock = threading.Lock()
+
+    def _load_lines(self, session, ids=None):
+        statement = select(TransportLine.id, TransportLine.name, TransportLine.category_id,
+                           TransportLine.created_at, TransportLine.start_time, TransportLine.end_time)
+        if ids is not None:
+            statement = statement.where(TransportLine.id.in_(ids))
+        found = set()
+        for line_id, name, category_id, created_at, start_time, end_time in session.exec(statement):
+            self.lines[line_id] = TransportLineRead(
+                id=line_id, name=name, category_id=category_id, created_at=iso(created_at),
+                start_time=iso(start_time), end_time=iso(end_time),
+            )
+            # colonnes vides (anciennes lignes) : horaires par défaut du modèle
+            start, end = minute_of_day(start_time or time(5, 0)), minute_of_day(end_time or time(23, 0))
+            self.index.insert(line_id, category_id, start, end)
+            found.add(line_id)
+        for line_id in (ids or ()):
+            if line_id not in found:
+                self.lines.pop(line_id, None)
+                self.index.remove(line_id)
+
+    def _load_stops(self, session, line_ids=None):
+        statement = select(Stop).order_by(Stop.line_id, Stop.stop_order, Stop.id)
+        if line_ids is not None:
+            statement = statement.where(Stop.line_id.in_(line_ids))
+            for line_id in line_ids:
+                for stop in self.stops_by_line.pop(line_id, []):
+                    self.stop_lines.pop(stop.id, None)
+        for s in session.exec(statement):
+            self.stops_by_line.setdefault(s.line_id, []).append(stop_to_read(s))
+            self.stop_lines[s.id] = s.line_id
+
+    def _refresh(self, session):
+        if not (self.line_tracker.pending() or self.stop_tracker.pending()):
+            return
+        full_lines, line_ids = self.line_tracker.take()
+        full_stops, stop_ids = self.stop_tracker.take()
+        try:
+            if full_lines:
+                self.index = IntervalIndex()
+                self.lines = {}
+                self._load_lines(session)
+            elif line_ids:
+                self._load_lines(session, line_ids)
+            if full_stops:
+                self.stops_by_line, self.stop_lines = {}, {}
+                self._load_stops(session)
+            elif stop_ids:
+                # lignes touchées : l'ancienne ligne de chaque arrêt (index) et la nouvelle (DB)
+                lines = {self.stop_lines[s] for s in stop_ids if s in self.stop_lines}
+                lines.update(session.exec(select(Stop.line_id).where(Stop.id.in_(stop_ids))).all())
+                self._load_stops(session, lines)
+        except Exception:
+            # lecture DB ratée : on ne sait plus ce qui est à jour, tout sera rechargé
+            self.line_tracker.reset()
+            self.stop_tracker.reset()
+            raise
+
+    def active_lines(self, session, minute, category_id=None) -> list:
+        with self._lock:
+            self._refresh(session)
+            return [self.lines[line_id] for line_id in self.index.at(minute, category_id)]
+
+    def served_stops(self, session, minute, category_id=None) -> list:
+        with self._lock:
+            self._refresh(session)
+            stops = []
+            for line_id in self.index.at(minute, category_id):
+                stops.extend(self.stops_by_line.get(line_id, ()))
+            return stops
+
+    def stats(self) -> dict:
+        return {"lines": len(self.index), "stops": len(self.stop_lines)}
+
+
+service_hours = ServiceHours()
@@ -0,0 +1,194 @@
+# snapshot.py
+# Document complet du réseau pour GET /api/network : catégories > lignes > arrêts.
+#
+# Le JSON et ses versions compressées (gzip, et brotli si le module est installé)
+# sont construits une fois par version de la topologie puis servis tels quels
+# depuis la mémoire. Après une écriture (topology.notify), un thread de fond
+# reconstruit le document : la requête suivante reçoit encore l'ancien jusqu'à
+# ce que le nouveau soit prêt, jamais un calcul sur le chemin de la requête
+# (sauf la toute première fois).
+#
+# Comme pour les ETag (topology.VERSION_TTL), un worker qui n'a pas vu l'écriture
+# reconstruit quand même son document toutes les VERSION_TTL secondes.
+#
+# L'ETag est une empreinte du document : une reconstruction qui donne le même
+# JSON garde le même ETag (les clients continuent à recevoir des 304), et deux
+# workers qui servent le même réseau donnent le même ETag.
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from sqlmodel import Session, select
+
+import topology
+from models import categories, TransportLine, Stop
+
+try:
+    import brotli
+except ImportError:  # optionnel : sans lui on ne propose que gzip
+    brotli = None
+
+TABLES = (topology.CATEGORY, topology.LINE, topology.STOP)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9  # 11 coûte plusieurs fois plus cher pour ~3 % de gain
+# délai avant reconstruction : un import / une série d'écritures ne donne qu'un seul rebuild
+REBUILD_DELAY = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def build_document(session) -> dict:
+    # trois SELECT sur les colonnes, sans passer par les modèles ni pydantic
+    stops_by_line = {}
+    stops = session.exec(
+        select(Stop.id, Stop.line_id, Stop.name, Stop.latitude, Stop.longitude, Stop.stop_order)
+        .order_by(Stop.line_id, Stop.stop_order, Stop.id)
+    )
+    for stop_id, line_id, name, lat, lon, order in stops:
+        stops_by_line.setdefault(line_id, []).append({
+            "id": stop_id, "line_id": line_id, "name": name,
+            "latitude": lat, "longitude": lon, "stop_order": order,
+        })
+
+    lines_by_category = {}
+    lines = session.exec(
+        select(TransportLine.id, TransportLine.name, TransportLine.category_id,
+               TransportLine.created_at, TransportLine.start_time, TransportLine.end_time)
+        .order_by(TransportLine.id)
+    )
+    for line_id, name, category_id, created_at, start_time, end_time in lines:
+        lines_by_category.setdefault(category_id, []).append({
+            "id": line_id, "name": name, "category_id": category_id,
+            "created_at": _iso(created_at), "start_time": _iso(start_time), "end_time": _iso(end_time),
+            "stops": stops_by_line.get(line_id, []),
+        })
+
+    return {"categories": [
+        {"id": category_id, "name": name, "lines": lines_by_category.get(category_id, [])}
+        for category_id, name in session.exec(select(categories.id, categories.name).order_by(categories.id))
+    ]}
+
+
+class Snapshot:
+    def __init__(self, etag, body, versions):
+        self.etag = etag
+        self.versions = versions
+        self.built_at = time.monotonic()
+        # encodage -> octets
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+class NetworkSnapshot:
+    def __init__(self, session_factory, ttl: float = topology.VERSION_TTL):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.current = None
+        self.builds = 0
+        self.last_build_ms = 0.0
+        self._build_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def build(self):
+        with self._build_lock:
+            # version lue avant la DB : une écriture pendant la lecture relancera un build
+            versions = topology.version(*TABLES)
+            started = time.perf_counter()
+            with self.session_factory() as session:
+                document = build_document(session)
+            body = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode()
+            self.builds += 1
+            current = self.current
+            if current is not None and current.bodies["identity"] == body:
+                # rien n'a changé (reconstruction après TTL) : mêmes octets compressés, même ETag
+                current.versions = versions
+                current.built_at = time.monotonic()
+            else:
+                etag = 'W/"net-%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+                self.current = Snapshot(etag, body, versions)
+            self.last_build_ms = (time.perf_counter() - started) * 1000
+            return self.current
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=self.ttl)
+            time.sleep(REBUILD_DELAY)
+            self._wake.clear()
+            try:
+                self.build()
+            except Exception:
+                # DB indisponible... : on garde l'ancien document et on réessaiera au prochain réveil
+                logger.exception("reconstruction du document réseau impossible, l'ancien reste servi")
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="network-snapshot", daemon=True)
+                    self._thread.start()
+
+    def schedule(self):
+        if self.current is None:
+            return  # jamais demandé : rien à tenir à jour
+        self._ensure_thread()
+        self._wake.set()
+
+    def get(self) -> Snapshot:
+        snapshot = self.current
+        if snapshot is None:
+            # premier appel : rien à servir, on construit ici une seule fois
+            with self._build_lock:
+                snapshot = self.current or self.build()
+            self._ensure_thread()
+        return snapshot
+
+    def stats(self) -> dict:
+        snapshot = self.current
+        return {
+            "builds": self.builds,
+            "last_build_ms": round(self.last_build_ms, 1),
+            "stale": snapshot is not None and snapshot.versions != topology.version(*TABLES),
+            "sizes": {enc: len(body) for enc, body in snapshot.bodies.items()} if snapshot else {},
+        }
+
+
+def choose_encoding(accept_encoding: str, available) -> str:
+    """Meilleur encodage accepté par le client parmi ceux disponibles (br > gzip > identity)."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if name:
+            accepted[name.strip().lower()] = q
+    for enc in ("br", "gzip"):
+        if enc in available and accepted.get(enc, accepted.get("*", 0)) > 0:
+            return enc
+    return "identity"
+
+
+def _session():
+    from database import engine
+    return Session(engine)
+
+
+network_snapshot = NetworkSnapshot(_session)
+
+
+@topology.on_change
+def _rebuild_on_write(table, ids):
+    network_snapshot.schedule()
@@ -0,0 +1,279 @@
+# spatial.py
+# Index spatial en mémoire des arrêts (grille de cellules lat/lon).
+#
+# Chaque arrêt est rangé dans une cellule de SPATIAL_CELL_DEG degrés (0.01° par
+# défaut, ~1 km). Une recherche ne regarde que les cellules autour du point :
+# le coût dépend du nombre d'arrêts à proximité, pas de la taille du réseau.
+# L'index est construit depuis la table Stop au premier appel, puis mis à jour
+# arrêt par arrêt après chaque écriture (topology.DirtyTracker).
+import heapq
+import math
+import os
+import threading
+
+from sqlmodel import select
+
+import topology
+from models import Stop
+from schemas.schemas import stop_to_read
+
+EARTH_RADIUS_M = 6_371_000
+# même sphère que haversine_m : un degré de latitude y mesure ~111 195 m
+METERS_PER_DEG_LAT = math.radians(1) * EARTH_RADIUS_M
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
+
+
+class GridIndex:
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self.cells = {}    # (i, j) -> {id: item}
+        self.points = {}   # id -> (lat, lon, (i, j), item)
+        # (i, j) -> [nb, somme lat, somme lon] : permet de regrouper (clusters) par
+        # cellule sans parcourir les points
+        self.sums = {}
+        # cellules extrêmes occupées : bornent la recherche en anneaux de nearest()
+        self._bounds = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def clear(self):
+        self.cells.clear()
+        self.points.clear()
+        self.sums.clear()
+        self._bounds = None
+
+    def insert(self, key, lat, lon, item=None):
+        if key in self.points:
+            self.remove(key)
+        cell = self._cell(lat, lon)
+        self.cells.setdefault(cell, {})[key] = item
+        self.points[key] = (lat, lon, cell, item)
+        acc = self.sums.setdefault(cell, [0, 0.0, 0.0])
+        acc[0] += 1
+        acc[1] += lat
+        acc[2] += lon
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            b = self._bounds
+            b[0], b[1] = min(b[0], cell[0]), max(b[1], cell[0])
+            b[2], b[3] = min(b[2], cell[1]), max(b[3], cell[1])
+
+    def remove(self, key):
+        entry = self.points.pop(key, None)
+        if entry is None:
+            return
+        bucket = self.cells[entry[2]]
+        del bucket[key]
+        if not bucket:
+            del self.cells[entry[2]]
+            del self.sums[entry[2]]
+        else:
+            acc = self.sums[entry[2]]
+            acc[0] -= 1
+            acc[1] -= entry[0]
+            acc[2] -= entry[1]
+        # les bornes restent larges après une suppression : sans conséquence sur le résultat
+
+    def _scan(self, cells, lat, lon):
+        points = self.points
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket:
+                for key in bucket:
+                    p = points[key]
+                    yield haversine_m(lat, lon, p[0], p[1]), key
+
+    def within(self, lat, lon, radius_m):
+        """[(distance_m, id)] des points à moins de radius_m, triés par distance."""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlon = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6))
+        i0, j0 = self._cell(lat - dlat, lon - dlon)
+        i1, j1 = self._cell(lat + dlat, lon + dlon)
+        cells = ((i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1))
+        return sorted(d for d in self._scan(cells, lat, lon) if d[0] <= radius_m)
+
+    def _cells_in_box(self, min_lat, min_lon, max_lat, max_lon):
+        i0, j0 = self._cell(min_lat, min_lon)
+        i1, j1 = self._cell(max_lat, max_lon)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # grande emprise (vue de toute la ville) : moins de cellules occupées que
+            # de cellules dans la boîte, on filtre les cellules occupées
+            return [c for c in self.cells if i0 <= c[0] <= i1 and j0 <= c[1] <= j1]
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1) if (i, j) in self.cells]
+
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon, limit=None):
+        """ids des points dans la boîte (au plus `limit`)."""
+        found = []
+        points = self.points
+        for cell in self._cells_in_box(min_lat, min_lon, max_lat, max_lon):
+            for key in self.cells[cell]:
+                p = points[key]
+                if min_lat <= p[0] <= max_lat and min_lon <= p[1] <= max_lon:
+                    found.append(key)
+                    if limit is not None and len(found) >= limit:
+                        return found
+        return found
+
+    def clusters(self, min_lat, min_lon, max_lat, max_lon, cluster_deg):
+        """[(lat, lon, nb)] : points de la boîte regroupés par carrés de cluster_deg degrés.
+
+        Si les carrés sont plus grands que les cellules de l'index, on additionne
+        les sommes des cellules entièrement dans la boîte ; seules les cellules du
+        bord sont parcourues point par point. Sinon on regroupe les points eux-mêmes.
+        """
+        groups = {}
+
+        def add(lat, lon, n, slat, slon):
+            acc = groups.setdefault((math.floor(lat / cluster_deg), math.floor(lon / cluster_deg)), [0, 0.0, 0.0])
+            acc[0] += n
+            acc[1] += slat
+            acc[2] += slon
+
+        if cluster_deg > self.cell_deg:
+            i0, j0 = self._cell(min_lat, min_lon)
+            i1, j1 = self._cell(max_lat, max_lon)
+            for cell in self._cells_in_box(min_lat, min_lon, max_lat, max_lon):
+                if i0 < cell[0] < i1 and j0 < cell[1] < j1:
+                    n, slat, slon = self.sums[cell]
+                    add(slat / n, slon / n, n, slat, slon)
+                    continue
+                for key in self.cells[cell]:
+                    lat, lon = self.points[key][:2]
+                    if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                        add(lat, lon, 1, lat, lon)
+        else:
+            for key in self.in_bbox(min_lat, min_lon, max_lat, max_lon):
+                lat, lon = self.points[key][:2]
+                add(lat, lon, 1, lat, lon)
+        return [(slat / n, slon / n, n) for n, slat, slon in groups.values()]
+
+    def nearest(self, lat, lon, k):
+        """[(distance_m, id)] des k points les plus proches, triés par distance."""
+        if not self.points or k <= 0:
+            return []
+        ci, cj = self._cell(lat, lon)
+        b = self._bounds
+        max_ring = max(abs(ci - b[0]), abs(ci - b[1]), abs(cj - b[2]), abs(cj - b[3]))
+        best = []  # tas max (distances négatives) des k meilleurs
+        ring = 0
+        while ring <= max_ring:
+            # point loin du réseau : l'anneau couvre plus de cellules qu'il n'y en a
+            # d'occupées, un parcours de toutes les cellules coûte moins cher
+            if (2 * ring + 1) ** 2 > len(self.cells):
+                return heapq.nsmallest(k, self._scan(list(self.cells), lat, lon))
+            if ring == 0:
+                cells = [(ci, cj)]
+            else:
+                cells = [(ci + di, cj + dj)
+                         for di in range(-ring, ring + 1)
+                         for dj in (-ring, ring)]
+                cells += [(ci + di, cj + dj)
+                          for di in (-ring, ring)
+                          for dj in range(-ring + 1, ring)]
+            for dist, key in self._scan(cells, lat, lon):
+                if len(best) < k:
+                    heapq.heappush(best, (-dist, key))
+                elif dist < -best[0][0]:
+                    heapq.heapreplace(best, (-dist, key))
+            # tout point au-delà de cet anneau est à plus de `ring` cellules du point en
+            # latitude ou en longitude ; en longitude, distance haversine minimale entre
+            # deux points de latitude au plus worst_lat (la plus défavorable)
+            if len(best) == k:
+                worst_lat = min(abs(lat) + (ring + 1) * self.cell_deg, 89.9)
+                gap = math.radians(ring * self.cell_deg)
+                bound = min(EARTH_RADIUS_M * gap,
+                            2 * EARTH_RADIUS_M * math.asin(math.cos(math.radians(worst_lat)) * math.sin(gap / 2)))
+                if -best[0][0] <= bound:
+                    break
+            ring += 1
+        return sorted((-d, key) for d, key in best)
+
+    def item(self, key):
+        return self.points[key][3]
+
+
+class StopIndex:
+    """GridIndex des arrêts synchronisé avec la table Stop."""
+
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self.grid = GridIndex(cell_deg)
+        self.tracker = topology.DirtyTracker(topology.STOP)
+        # les handlers sync tournent dans plusieurs threads : lectures et mises à jour
+        # passent par le même verrou (une requête dure bien moins d'une ms)
+        self._lock = threading.Lock()
+
+    def _refresh(self, session):
+        if not self.tracker.pending():
+            return
+        full, ids = self.tracker.take()
+        try:
+            if full:
+                grid = GridIndex(self.cell_deg)
+                for s in session.exec(select(Stop)).all():
+                    grid.insert(s.id, s.latitude, s.longitude, stop_to_read(s))
+                self.grid = grid
+                return
+            found = session.exec(select(Stop).where(Stop.id.in_(ids))).all()
+            for s in found:
+                self.grid.insert(s.id, s.latitude, s.longitude, stop_to_read(s))
+            for stop_id in ids - {s.id for s in found}:
+                self.grid.remove(stop_id)
+        except Exception:
+            # lecture DB ratée : on ne sait plus ce qui est à jour, tout sera rechargé
+            self.tracker.reset()
+            raise
+
+    def nearest(self, session, lat, lon, k):
+        with self._lock:
+            self._refresh(session)
+            return [(d, self.grid.item(key)) for d, key in self.grid.nearest(lat, lon, k)]
+
+    def within(self, session, lat, lon, radius_m, limit=None):
+        with self._lock:
+            self._refresh(session)
+            found = self.grid.within(lat, lon, radius_m)
+            return [(d, self.grid.item(key)) for d, key in found[:limit]]
+
+
+    def viewport(self, session, min_lat, min_lon, max_lat, max_lon, zoom=None):
+        """Arrêts visibles dans la boîte, regroupés en clusters si zoom faible ou trop d'arrêts.
+
+        Renvoie (stops, clusters) : une des deux listes est vide.
+        """
+        with self._lock:
+            self._refresh(session)
+            if zoom is None or zoom >= CLUSTER_BELOW_ZOOM:
+                # une de plus que le max pour savoir si on dépasse
+                keys = self.grid.in_bbox(min_lat, min_lon, max_lat, max_lon, limit=MAX_VIEWPORT_STOPS + 1)
+                if len(keys) <= MAX_VIEWPORT_STOPS:
+                    return [self.grid.item(key) for key in keys], []
+            # taille d'un cluster : ~32 px à ce zoom (une tuile de 256 px couvre 360 / 2^zoom degrés),
+            # et jamais plus de CLUSTER_GRID x CLUSTER_GRID clusters sur la boîte
+            cluster_deg = max(
+                360 / 2 ** zoom / 8 if zoom is not None else 0,
+                (max_lat - min_lat) / CLUSTER_GRID,
+                (max_lon - min_lon) / CLUSTER_GRID,
+            )
+            return [], self.grid.clusters(min_lat, min_lon, max_lat, max_lon, cluster_deg)
+
+
+# Vue carte (GET /api/stops?bbox=) : en dessous de ce zoom les arrêts sont regroupés
+CLUSTER_BELOW_ZOOM = int(os.environ.get("CLUSTER_BELOW_ZOOM", 14))
+# au-delà de ce nombre d'arrêts dans la vue on regroupe aussi, quel que soit le zoom
+MAX_VIEWPORT_STOPS = int(os.environ.get("MAX_VIEWPORT_STOPS", 2000))
+CLUSTER_GRID = 64
+
+stop_index = StopIndex(float(os.environ.get("SPATIAL_CELL_DEG", 0.01)))
@@ -0,0 +1,48 @@
+# tests/conftest.py
+# Les tests tournent sur des bases SQLite temporaires, jamais sur la base
+# configurée. L'environnement est fixé ici, avant que main / database ne soient
+# importés : SQL_DEBUG=1 pour les en-têtes X-DB-Queries (querycount.py).
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tests-'), 'default.db')}"
+os.environ["SQL_DEBUG"] = "1"
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.pop("DB_ASYNC", None)
+os.environ.pop("DB_AUTO_MIGRATE", None)
+
+import database  # noqa: E402
+import migrations  # noqa: E402
+import topology  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Base SQLite neuve et migrée, utilisée par l'app pendant le test."""
+    engine_ = database.make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrations.upgrade(engine_)
+    monkeypatch.setattr(database, "engine", engine_, raising=False)
+    # index et caches en mémoire remplis depuis une autre base : tout sera relu
+    for table in (topology.CATEGORY, topology.LINE, topology.STOP):
+        topology.notify(table)
+    yield engine_
+    engine_.dispose()
+
+
+@pytest.fixture
+def client(engine):
+    """TestClient de l'app, authentifié, sur la base du test."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from auth import create_access_token
+
+    client_ = TestClient(main.app)
+    client_.headers["Authorization"] = "Bearer " + create_access_token({"sub": "1"})
+    return client_
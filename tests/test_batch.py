@@ -0,0 +1,83 @@
+import pytest
+
+
+def run(client, *operations):
+    return client.post("/api/batch", json={"operations": list(operations)})
+
+
+def create(entity, data, ref=None):
+    return {"op": "create", "entity": entity, "ref": ref, "data": data}
+
+
+def stop(line, name, order):
+    return create("stop", {"line_id": line, "name": name, "latitude": 43.6, "longitude": 1.44 + order / 100,
+                           "stop_order": order})
+
+
+def counts(client):
+    return (len(client.get("/api/allcategory").json()), len(client.get("/api/allline").json()),
+            len(client.get("/api/allstop").json()))
+
+
+def test_refs_link_new_rows(client):
+    response = run(client,
+                   create("category", {"name": "Tram"}, ref="T"),
+                   create("line", {"name": "T1", "category_id": "$T"}, ref="L"),
+                   stop("$L", "Gare", 0), stop("$L", "Centre", 1),
+                   {"op": "update", "entity": "stop", "id": 1, "data": {"name": "Gare SNCF"}})
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [(r["index"], r["entity"], r["id"]) for r in results] == [
+        (0, "category", 1), (1, "line", 1), (2, "stop", 1), (3, "stop", 2), (4, "stop", 1)]
+    assert [(line["name"], line["category_id"]) for line in client.get("/api/allline").json()] == [("T1", 1)]
+    assert [s["name"] for s in client.get("/api/line/1/stops").json()] == ["Gare SNCF", "Centre"]
+
+
+def test_unknown_and_reused_refs(client):
+    response = run(client, create("category", {"name": "Bus"}), create("line", {"name": "L1", "category_id": "$X"}))
+    assert response.status_code == 400
+    assert response.json()["detail"] == {"error": "référence inconnue : $X", "operations": [1]}
+
+    response = run(client, create("category", {"name": "Bus"}, ref="C"), create("category", {"name": "Tram"}, ref="C"))
+    assert response.status_code == 400 and response.json()["detail"]["operations"] == [1]
+    assert counts(client) == (0, 0, 0)
+
+
+@pytest.mark.parametrize("failing, status, indexes", [
+    ({"op": "update", "entity": "line", "id": 99, "data": {"name": "L9"}}, 404, [3]),
+    (stop(99, "Orphelin", 5), 404, [2, 3]),  # clef étrangère : tout le groupe de créations d'arrêts
+    ({"op": "create", "entity": "stop", "data": {"line_id": "$L", "name": "Sans position"}}, 422, [3]),
+    ({"op": "update", "entity": "line", "id": 1, "data": {"start_time": "25:00"}}, 422, [3]),
+])
+def test_a_refused_operation_rolls_back_the_whole_batch(client, failing, status, indexes):
+    run(client, create("category", {"name": "Bus"}), create("line", {"name": "L0", "category_id": 1}))
+    before = counts(client)
+    response = run(client,
+                   create("category", {"name": "Tram"}, ref="T"),
+                   create("line", {"name": "T1", "category_id": "$T"}, ref="L"),
+                   stop("$L", "Gare", 0),
+                   failing)
+    assert response.status_code == status, response.text
+    assert response.json()["detail"]["operations"] == indexes
+    assert counts(client) == before
+    assert [line["name"] for line in client.get("/api/allline").json()] == ["L0"]
+
+
+def test_rename_to_a_name_in_use_within_the_batch(client):
+    run(client, create("category", {"name": "Bus"}), create("category", {"name": "Tram"}))
+    response = run(client,
+                   {"op": "update", "entity": "category", "id": 1, "data": {"name": "Métro"}},
+                   {"op": "update", "entity": "category", "id": 2, "data": {"name": "Métro"}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == {"error": "le nom est déjà utilisé", "operations": [1]}
+    assert [c["name"] for c in client.get("/api/allcategory").json()] == ["Bus", "Tram"]
+
+
+def test_delete_in_use_and_missing_id(client):
+    run(client, create("category", {"name": "Bus"}), create("line", {"name": "L1", "category_id": 1}))
+    response = run(client, {"op": "delete", "entity": "category", "id": 1})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "Catégorie utilisée par des lignes"
+    response = run(client, {"op": "delete", "entity": "line", "id": None})
+    assert response.status_code == 400 and response.json()["detail"]["operations"] == [0]
+    assert counts(client) == (1, 1, 0)
@@ -0,0 +1,70 @@
+import io
+
+from sqlmodel import Session, select
+
+import bulk_import
+from models import categories, Stop, TransportLine
+
+
+def csv_reader(text):
+    return bulk_import.open_csv(io.BytesIO(text.encode()))
+
+
+def seed_line(engine):
+    with Session(engine) as session:
+        session.add(categories(name="bus"))
+        session.commit()
+        session.add(TransportLine(name="L1", category_id=1))
+        session.commit()
+
+
+def test_import_stops_reports_bad_rows(engine):
+    seed_line(engine)
+    with Session(engine) as session:
+        report = bulk_import.import_stops(session, csv_reader(
+            "line_id,name,latitude,longitude,stop_order\n"
+            "1,Capitole,43.6045,1.4440,1\n"
+            "L1,Esquirol,43.6000,1.4437,2\n"   # ligne désignée par son nom
+            "7,Inconnue,43.6,1.44,3\n"
+            "1,Hors limites,143.6,1.44,4\n"
+        ), batch_size=2).as_dict()
+        names = session.exec(select(Stop.name).order_by(Stop.stop_order)).all()
+    assert (report["inserted"], report["rejected"]) == (2, 2)
+    assert [e["row"] for e in report["errors"]] == [4, 5]
+    assert names == ["Capitole", "Esquirol"]
+
+
+def test_gtfs_stops_txt_is_refused_up_front(engine):
+    seed_line(engine)
+    with Session(engine) as session:
+        report = bulk_import.import_stops(session, csv_reader(
+            "stop_id,stop_name,stop_lat,stop_lon\nS1,Capitole,43.6045,1.4440\n"
+        )).as_dict()
+    assert report["inserted"] == 0
+    assert report["errors"] == [{"row": 1, "error": "colonnes manquantes : line_id, name, latitude, longitude"}]
+
+
+def test_refused_batch_keeps_its_valid_rows(engine):
+    seed_line(engine)
+    report = bulk_import.ImportReport("stop")
+    batch = [(row, {"line_id": 999 if row == 5 else 1, "name": f"S{row}", "latitude": 43.6,
+                    "longitude": 1.44, "stop_order": row}) for row in range(2, 9)]
+    with Session(engine) as session:
+        bulk_import._flush(session, Stop, batch, report)
+        inserted = session.exec(select(Stop.stop_order).order_by(Stop.stop_order)).all()
+    assert inserted == [2, 3, 4, 6, 7, 8]
+    assert report.inserted == 6
+    assert report.errors == [{"row": 5, "error": "refusé par la base : FOREIGN KEY constraint failed"}]
+
+
+def test_import_lines_from_gtfs_routes(engine):
+    with Session(engine) as session:
+        session.add(categories(name="Tramway"))
+        session.commit()
+        report = bulk_import.import_lines(session, csv_reader(
+            "route_id,route_short_name,route_type\nR1,T1,0\nR2,B2,3\n"
+        )).as_dict()
+        lines = session.exec(select(TransportLine.name, TransportLine.category_id)).all()
+    assert report["inserted"] == 1
+    assert report["errors"] == [{"row": 3, "error": "catégorie inconnue"}]
+    assert lines == [("T1", 1)]
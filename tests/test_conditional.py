@@ -0,0 +1,58 @@
+import pytest
+
+import topology
+from conditional import _matches
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"a-1"', True),
+    ('W/"a-1"', True),             # comparaison faible
+    ('"b-2", W/"a-1"', True),
+    ('*', True),
+    ('"a-2"', False),
+    ('"a-1', False),
+])
+def test_if_none_match(header, expected):
+    assert _matches(header, '"a-1"') is expected
+
+
+def get(client, url, etag=None):
+    return client.get(url, headers={"If-None-Match": etag} if etag else {})
+
+
+def test_304_until_a_write_on_the_tables_read(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "L1", "category_id": 1})
+    first = get(client, "/api/allline")
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+    etag = first.headers["etag"]
+
+    cached = get(client, "/api/allline", etag)
+    assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == etag
+
+    # une écriture sur une autre table ne change pas la liste des lignes
+    client.post("/api/creat/category", json={"name": "Tram"})
+    assert get(client, "/api/allline", etag).status_code == 304
+
+    client.put("/api/update/line/1", json={"name": "L1 bis"})
+    fresh = get(client, "/api/allline", etag)
+    assert fresh.status_code == 200 and fresh.headers["etag"] != etag
+    assert [line["name"] for line in fresh.json()] == ["L1 bis"]
+
+
+def test_stop_writes_invalidate_the_stops_of_a_line(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "L1", "category_id": 1})
+    etag = get(client, "/api/line/1/stops").headers["etag"]
+    assert get(client, "/api/line/1/stops", etag).status_code == 304
+    client.post("/api/creat/stop", json={"line_id": 1, "name": "Gare", "latitude": 43.6,
+                                         "longitude": 1.44, "stop_order": 0})
+    response = get(client, "/api/line/1/stops", etag)
+    assert response.status_code == 200 and [s["name"] for s in response.json()] == ["Gare"]
+
+
+def test_etag_changes_with_the_epoch(client, monkeypatch):
+    etag = get(client, "/api/allline").headers["etag"]
+    now = topology.time.time()
+    monkeypatch.setattr(topology.time, "time", lambda: now + topology.VERSION_TTL)
+    assert get(client, "/api/allline", etag).status_code == 200
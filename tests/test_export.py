@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+
+import export
+from models import Stop
+
+
+def seed(client, stops=5):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "L1", "category_id": 1, "start_time": "06:00", "end_time": "22:30"})
+    for order in range(stops):
+        client.post("/api/creat/stop", json={"line_id": 1, "name": f"Arrêt, n°{order}", "latitude": 43.6 + order / 1000,
+                                             "longitude": 1.44, "stop_order": order})
+
+
+def test_ndjson_export(client):
+    seed(client)
+    response = client.get("/api/export/stops.ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="stops.ndjson"'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == client.get("/api/allstop").json()
+
+
+def test_csv_export(client):
+    seed(client)
+    response = client.get("/api/export/lines.csv")
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(r["name"], r["start_time"], r["end_time"]) for r in rows] == [("L1", "06:00:00", "22:30:00")]
+    stops = list(csv.DictReader(io.StringIO(client.get("/api/export/stops.csv").text)))
+    assert [r["name"] for r in stops] == [f"Arrêt, n°{order}" for order in range(5)]  # virgule échappée
+
+
+def test_export_is_streamed_by_chunks(client):
+    seed(client, stops=5)
+    assert len(list(export.iter_ndjson(Stop, export.STOP_FIELDS, chunk_rows=2))) == 3
+    chunks = list(export.iter_csv(Stop, export.STOP_FIELDS, chunk_rows=2))
+    assert len(chunks) == 3
+    assert b"".join(chunks).decode().count("\n") == 6  # en-tête + 5 arrêts
+
+
+def test_empty_table_and_users_without_password(client):
+    assert client.get("/api/export/stops.csv").text.strip() == ",".join(export.STOP_FIELDS)
+    assert client.get("/api/export/stops.ndjson").text == ""
+    client.post("/users", json={"username": "alice", "email": "a@example.com", "password": "pw"})
+    users = [json.loads(line) for line in client.get("/api/export/users.ndjson").text.splitlines()]
+    assert users == [{"id": 1, "username": "alice", "email": "a@example.com"}]
+
+
+def test_unknown_table_or_format(client):
+    assert client.get("/api/export/categories.csv").status_code == 404
+    assert client.get("/api/export/stops.xml").status_code == 404
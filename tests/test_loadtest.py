@@ -0,0 +1,20 @@
+import pytest
+
+from loadtest import _delta, percentile
+
+
+@pytest.mark.parametrize("p, expected", [(0, 1), (50, 5), (90, 9), (95, 10), (99, 10), (100, 10)])
+def test_nearest_rank_percentile(p, expected):
+    assert percentile(list(range(1, 11)), p) == expected
+
+
+def test_percentile_of_few_or_no_values():
+    assert percentile([], 50) is None
+    assert percentile([3.5], 99) == 3.5
+    assert percentile([1, 2], 50) == 1
+
+
+def test_delta_against_the_baseline():
+    assert _delta(12.0, 10.0) == " (+20%)"
+    assert _delta(5.0, 10.0) == " (-50%)"
+    assert _delta(5.0, None) == "" and _delta(5.0, 0) == ""
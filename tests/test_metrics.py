@@ -0,0 +1,10 @@
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_metrics_require_a_token(client):
+    assert TestClient(main.app).get("/metrics").status_code == 401
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+
+import snapshot
+
+
+def test_etag_survives_a_rebuild_without_changes(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    etag = snapshot.network_snapshot.build().etag  # sans attendre le thread de fond
+    assert client.get("/api/network").headers["etag"] == etag
+    snapshot.network_snapshot.build()  # reconstruction (TTL) sans écriture
+    assert client.get("/api/network", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/creat/line", json={"name": "L1", "category_id": 1})
+    rebuilt = snapshot.network_snapshot.build()
+    assert rebuilt.etag != etag
+    response = client.get("/api/network", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["categories"][0]["lines"][0]["name"] == "L1"
+
+
+def test_failed_background_rebuild_is_logged(monkeypatch, caplog):
+    network = snapshot.NetworkSnapshot(session_factory=None, ttl=60)
+    calls = []
+
+    def broken_build():
+        calls.append(1)
+        if len(calls) > 1:
+            raise SystemExit  # sort de la boucle du thread au 2e passage
+        network._wake.set()
+        raise RuntimeError("DB indisponible")
+
+    monkeypatch.setattr(network, "build", broken_build)
+    monkeypatch.setattr(snapshot, "REBUILD_DELAY", 0)
+    network._wake.set()
+    with caplog.at_level(logging.ERROR, logger="snapshot"), pytest.raises(SystemExit):
+        network._run()
+    assert "reconstruction du document réseau impossible" in caplog.text
+    assert "DB indisponible" in caplog.text
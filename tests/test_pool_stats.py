@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import exc
+
+from database import StatsQueuePool
+
+
+def slow_connect():
+    time.sleep(0.2)
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def test_connect_time_is_not_counted_as_waiting():
+    pool = StatsQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=1)
+    pool.connect().close()
+    stats = pool.stats()
+    assert stats["checkouts"] == 1 and stats["wait_max_ms"] < 50
+
+
+def test_only_pool_timeouts_are_counted():
+    pool = StatsQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=0.1)
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["wait_max_ms"] >= 100
+    held.close()
+
+    def refused():
+        raise sqlite3.OperationalError("connexion refusée")
+    broken = StatsQueuePool(refused, pool_size=1, max_overflow=0, timeout=0.1)
+    with pytest.raises(sqlite3.OperationalError):
+        broken.connect()
+    assert broken.stats()["timeouts"] == 0
+
+
+def test_counters_under_concurrent_checkouts():
+    pool = StatsQueuePool(lambda: sqlite3.connect(":memory:", check_same_thread=False),
+                          pool_size=2, max_overflow=2, timeout=5)
+
+    def work():
+        for _ in range(200):
+            pool.connect().close()
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.stats()["checkouts"] == 1600
+    assert pool.recreate().stats()["checkouts"] == 1600
@@ -0,0 +1,11 @@
+from fastapi.testclient import TestClient
+
+import main
+import query_budgets
+
+
+def test_endpoints_within_query_budgets(engine):
+    with TestClient(main.app) as client:
+        results = query_budgets.check(client)
+    over = [(name, count, budget, status) for name, count, budget, status in results if count > budget or status >= 400]
+    assert not over, "requêtes SQL au-delà du budget (nom, requêtes, budget, statut) : %r" % over
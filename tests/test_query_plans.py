@@ -0,0 +1,14 @@
+import query_plans
+
+
+def test_hot_queries_use_an_index(engine):
+    assert query_plans.check(engine) == {}
+
+
+def test_mariadb_full_scan_is_flagged_even_with_a_usable_index():
+    rows = [
+        {"table": "stop", "type": "ALL", "possible_keys": "ix_stop_line_id_stop_order"},
+        {"table": "transportline", "type": "ref", "possible_keys": "ix_transportline_category_id"},
+        {"table": "categories", "type": "ALL", "possible_keys": None},
+    ]
+    assert query_plans._explain_scans(rows) == ["stop (type ALL)"]
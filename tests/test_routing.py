@@ -0,0 +1,99 @@
+import logging
+import random
+
+import pytest
+
+import routing
+from bench_route import dijkstra_cost, synthetic_lines
+
+LAT, LON = 43.6, 1.44
+STEP = 0.004  # ~450 m en latitude
+
+
+def two_lines():
+    """Ligne 1 vers le nord, ligne 2 vers l'est depuis un arrêt à ~100 m du terminus de la 1."""
+    graph = routing.TransitGraph(ref_lat=LAT)
+    graph.set_line(1, [(10 + i, f"N{i}", LAT + i * STEP, LON) for i in range(4)])
+    graph.set_line(2, [(20 + i, f"E{i}", LAT + 3 * STEP + 0.001, LON + 0.001 + i * STEP) for i in range(4)])
+    graph.link(list(graph.stops))
+    return graph
+
+
+def test_route_with_a_walking_transfer():
+    graph = two_lines()
+    duration, path = graph.shortest_path(10, 23)
+    assert path == [10, 11, 12, 13, 20, 21, 22, 23]
+    legs = graph.legs(path)
+    assert [(leg["mode"], leg["line_id"]) for leg in legs] == [("ride", 1), ("walk", None), ("ride", 2)]
+    assert duration == pytest.approx(sum(leg["duration_s"] for leg in legs), abs=0.5)
+    assert legs[1]["duration_s"] >= graph.transfer_penalty_s
+
+
+def test_unreachable_and_updated_lines():
+    graph = two_lines()
+    graph.set_line(3, [(30, "Loin", LAT + 1, LON + 1), (31, "Loin 2", LAT + 1 + STEP, LON + 1)])
+    graph.link([30, 31])
+    assert graph.shortest_path(10, 31) is None
+    # ligne 2 raccourcie : l'arrêt 23 disparaît du graphe
+    graph.link(graph.set_line(2, [(20, "E0", LAT + 3 * STEP + 0.001, LON + 0.001)]))
+    assert 23 not in graph.stops and 23 not in graph.adj.get(22, {})
+    assert graph.shortest_path(10, 20)[1] == [10, 11, 12, 13, 20]
+
+
+def test_astar_and_landmarks_match_dijkstra():
+    rnd = random.Random(3)
+    graph = routing.TransitGraph(ref_lat=LAT)
+    for line_id, rows in synthetic_lines(60, 15, rnd).items():
+        graph.set_line(line_id, rows)
+    graph.link(list(graph.stops))
+    ids = list(graph.stops)
+    pairs = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(60)]
+    expected = [dijkstra_cost(graph, a, b) for a, b in pairs]
+    for landmarks in (None, routing.landmark_table(graph.adjacency(), 8)):
+        graph.set_landmarks(graph.version, landmarks)
+        for (a, b), wanted in zip(pairs, expected):
+            found = graph.shortest_path(a, b)
+            assert (found is None) == (wanted is None)
+            assert found is None or found[0] == pytest.approx(wanted[0])
+
+
+def test_landmarks_computed_for_an_older_graph_are_ignored():
+    graph = two_lines()
+    version, adjacency = graph.version, graph.adjacency()
+    graph.link([10])  # modification pendant le calcul
+    graph.set_landmarks(version, routing.landmark_table(adjacency, 2))
+    assert graph.landmarks is None
+
+
+def test_route_endpoint(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "L1", "category_id": 1})
+    for order in range(3):
+        client.post("/api/creat/stop", json={"line_id": 1, "name": f"S{order}", "latitude": LAT + order * STEP,
+                                             "longitude": LON, "stop_order": order})
+    response = client.get("/api/route", params={"from": 1, "to": 3})
+    assert response.status_code == 200
+    route = response.json()
+    assert [stop["id"] for stop in route["legs"][0]["stops"]] == [1, 2, 3]
+    assert route["transfers"] == 0 and route["legs"][0]["line_name"] == "L1"
+    assert client.get("/api/route", params={"from": 1, "to": 99}).status_code == 404
+
+
+def test_landmark_thread_survives_an_error(monkeypatch, caplog):
+    planner = routing.RoutePlanner()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) > 1:
+            raise SystemExit  # sort de la boucle au 2e passage
+        planner._wake.set()
+        raise RuntimeError("graphe incohérent")
+
+    monkeypatch.setattr(planner, "compute_landmarks", compute)
+    monkeypatch.setattr(routing, "LANDMARK_DELAY", 0)
+    planner._wake.set()
+    with caplog.at_level(logging.ERROR, logger="routing"), pytest.raises(SystemExit):
+        planner._run()
+    assert len(calls) == 2
+    assert "graphe incohérent" in caplog.text
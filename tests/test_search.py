@@ -0,0 +1,86 @@
+import pytest
+
+from search import LINE, STOP, NameIndex, normalize
+
+NAMES = ["Hôtel de Ville", "Gare de Lyon", "Lyon Part-Dieu", "Hôpital Nord", "Place de l'Hôtel",
+         "Gare Saint-Lazare", "Œuvre Saint-Jean", "Lycée Hoche"]
+
+
+def index_of(names=NAMES):
+    return NameIndex([((STOP, i), name, 1) for i, name in enumerate(names)])
+
+
+def names(index, query, limit=10):
+    return [name for _, name, _ in index.search(query, limit)]
+
+
+def test_normalize():
+    assert normalize("  Hôtel-de-Ville ") == "hotel de ville"
+    assert normalize("Œuvre_Saint—Jean") == "oeuvre saint jean"
+
+
+def test_names_starting_with_the_query_come_first():
+    assert names(index_of(), "ly") == ["Lycée Hoche", "Lyon Part-Dieu", "Gare de Lyon"]
+    assert names(index_of(), "hotel de v") == ["Hôtel de Ville"]
+    assert names(index_of(), "HOT") == ["Hôtel de Ville", "Place de l'Hôtel"]
+
+
+def test_every_query_word_must_start_a_word_of_the_name():
+    assert names(index_of(), "gare sa") == ["Gare Saint-Lazare"]
+    assert names(index_of(), "saint") == ["Gare Saint-Lazare", "Œuvre Saint-Jean"]
+    assert names(index_of(), "oeuvre") == ["Œuvre Saint-Jean"]
+    assert names(index_of(), "art") == []  # milieu de mot
+
+
+def test_limit():
+    assert len(index_of().search("gare", 1)) == 1
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("hotle de ville", ["Hôtel de Ville"]),
+    ("gare de lyno", ["Gare de Lyon"]),
+    ("hopitla", ["Hôpital Nord"]),
+    ("gare lazr", ["Gare Saint-Lazare"]),  # dernier mot en cours de frappe
+])
+def test_typos_are_corrected(query, expected):
+    assert names(index_of(), query) == expected
+
+
+def test_no_correction_for_unrelated_words():
+    assert names(index_of(), "xyzzy") == []
+
+
+def test_words_that_exist_but_not_together_are_corrected():
+    # "gare" et "nord" existent, mais aucun nom ne les contient tous les deux
+    assert names(index_of(["Garde Nord", "Gare de Lyon", "Hôpital Nord"]), "gare nord") == ["Garde Nord"]
+
+
+def test_insert_rename_and_remove():
+    index = index_of()
+    index.insert((LINE, 1), "Ligne Hôtel", None)
+    assert ((LINE, 1), "Ligne Hôtel", None) in index.search("hotel")
+    index.insert((LINE, 1), "Ligne Rocade", None)  # renommée
+    assert names(index, "rocade") == ["Ligne Rocade"]
+    assert "Ligne Hôtel" not in names(index, "hotel")
+    index.remove((LINE, 1))
+    assert names(index, "rocade") == []
+    assert len(index) == len(NAMES)
+    # le mot "rocade" a quitté le vocabulaire : plus de correction vers lui
+    assert "rocade" not in index.vocabulary and names(index, "rocde") == []
+
+
+def test_search_endpoint(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "Ligne Hôtel", "category_id": 1})
+    client.post("/api/creat/stop", json={"line_id": 1, "name": "Hôtel de Ville", "latitude": 43.6,
+                                         "longitude": 1.44, "stop_order": 0})
+    response = client.get("/api/search", params={"q": "hotel"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"type": "stop", "id": 1, "name": "Hôtel de Ville", "line_id": 1},
+        {"type": "line", "id": 1, "name": "Ligne Hôtel", "line_id": None},
+    ]
+
+    client.put("/api/update/stop/1", json={"name": "Capitole"})
+    assert [r["name"] for r in client.get("/api/search", params={"q": "capi"}).json()] == ["Capitole"]
+    assert client.get("/api/search", params={"q": ""}).status_code == 422
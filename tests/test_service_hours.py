@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from bench_service_hours import brute, synthetic_lines
+from service_hours import IntervalIndex, parse_at, service_ranges
+
+
+def test_service_crossing_midnight_is_split():
+    assert service_ranges(22 * 60, 90) == [(1320, 1439), (0, 90)]
+    assert service_ranges(300, 1380) == [(300, 1380)]
+
+
+@pytest.mark.parametrize("minute, expected", [
+    (parse_at("21:59"), [1]),
+    (parse_at("22:00"), [1, 2]),
+    (parse_at("23:59"), [1, 2]),
+    (parse_at("00:00"), [2]),
+    (parse_at("01:30"), [2]),
+    (parse_at("01:31"), []),
+    (parse_at("05:00"), [1, 3]),
+])
+def test_bounds_are_included_on_both_sides_of_midnight(minute, expected):
+    index = IntervalIndex()
+    index.insert(1, 10, parse_at("05:00"), parse_at("23:59"))
+    index.insert(2, 20, parse_at("22:00"), parse_at("01:30"))
+    index.insert(3, 10, parse_at("05:00"), parse_at("05:00"))
+    assert index.at(minute) == expected
+
+
+def test_category_filter_update_and_remove():
+    index = IntervalIndex()
+    index.insert(1, 10, 0, 1439)
+    index.insert(2, 20, 0, 1439)
+    assert index.at(600, category_id=20) == [2]
+    index.insert(2, 20, 1380, 60)  # horaires modifiés : passe maintenant minuit
+    assert index.at(600) == [1] and index.at(30, category_id=20) == [2]
+    index.remove(2)
+    assert index.at(30) == [1] and len(index) == 1
+
+
+def test_matches_brute_force():
+    rnd = random.Random(11)
+    lines = synthetic_lines(400, rnd)
+    index = IntervalIndex()
+    for line_id, category_id, start, end in lines:
+        index.insert(line_id, category_id, start, end)
+    for minute in range(0, 1440, 7):
+        assert index.at(minute) == brute(lines, minute)
+        assert index.at(minute, 3) == brute(lines, minute, 3)
+
+
+def test_active_lines_endpoint(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "Jour", "category_id": 1, "start_time": "06:00", "end_time": "21:00"})
+    client.post("/api/creat/line", json={"name": "Noctambus", "category_id": 1,
+                                         "start_time": "22:00", "end_time": "01:30"})
+
+    def active(at):
+        response = client.get("/api/lines/active", params={"at": at})
+        assert response.status_code == 200
+        return [line["name"] for line in response.json()]
+
+    assert active("12:00") == ["Jour"]
+    assert active("23:15") == ["Noctambus"]
+    assert active("00:45") == ["Noctambus"]
+    assert active("03:00") == []
+    client.put("/api/update/line/2", json={"end_time": "03:30"})
+    assert active("03:00") == ["Noctambus"]
+    assert client.get("/api/lines/active", params={"at": "25:00"}).status_code == 422
+
+
+def test_served_stops_endpoint(client):
+    client.post("/api/creat/category", json={"name": "Bus"})
+    client.post("/api/creat/line", json={"name": "Noctambus", "category_id": 1,
+                                         "start_time": "22:00", "end_time": "01:30"})
+    client.post("/api/creat/stop", json={"line_id": 1, "name": "Gare", "latitude": 43.6,
+                                         "longitude": 1.44, "stop_order": 0})
+    served = client.get("/api/stops/served", params={"at": "00:45"}).json()
+    assert [stop["name"] for stop in served] == ["Gare"]
+    assert client.get("/api/stops/served", params={"at": "12:00"}).json() == []
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from bench_spatial import brute_nearest, brute_within, same_results
+from spatial import GridIndex, haversine_m
+
+
+def grid_of(points, cell_deg=0.01):
+    grid = GridIndex(cell_deg)
+    for i, (lat, lon) in enumerate(points):
+        grid.insert(i, lat, lon)
+    return grid
+
+
+def test_within_reaches_stops_just_across_a_cell_edge():
+    grid = grid_of([(0.0100, 0.0)])
+    assert [i for _, i in grid.within(0.00001, 0.0, 1112)] == [0]
+
+
+def test_nearest_does_not_stop_before_a_closer_cell():
+    # 1er point dans l'anneau 1 (~1113 m), 2e plus proche (~1112 m) mais dans l'anneau 2
+    points = [(0.009999, 0.005 + 1113.06 / 111_195), (0.0200, 0.005)]
+    points += [(1.0 + i * 0.01, 1.0) for i in range(50)]  # assez de cellules occupées pour chercher par anneaux
+    grid = grid_of(points)
+    assert [i for _, i in grid.nearest(0.009999, 0.005, 1)] == [1]
+
+
+@pytest.mark.parametrize("center", [(0.0, 0.0), (43.6, 1.44), (70.0, 25.0), (-33.9, 151.2)])
+def test_grid_matches_brute_force_near_cell_edges(center):
+    rnd = random.Random(7)
+    lat0, lon0 = center
+    # points et requêtes collés aux bords des cellules (0.01°), là où les bornes se jouent
+    snap = lambda x: round(x, 2) + rnd.uniform(-2e-6, 2e-6)
+    points = [(snap(lat0 + rnd.uniform(-0.05, 0.05)), snap(lon0 + rnd.uniform(-0.05, 0.05))) for _ in range(400)]
+    queries = [(snap(lat0 + rnd.uniform(-0.05, 0.05)), snap(lon0 + rnd.uniform(-0.05, 0.05))) for _ in range(100)]
+    grid = grid_of(points)
+    for k in (1, 3, 10):
+        got = [grid.nearest(lat, lon, k) for lat, lon in queries]
+        assert same_results(got, [brute_nearest(points, lat, lon, k) for lat, lon in queries])
+    for radius in (300, 1112, 2500):
+        got = [grid.within(lat, lon, radius) for lat, lon in queries]
+        assert same_results(got, [brute_within(points, lat, lon, radius) for lat, lon in queries])
+
+
+def test_remove_and_reinsert():
+    grid = grid_of([(43.60, 1.44), (43.61, 1.45)])
+    grid.remove(0)
+    assert [i for _, i in grid.nearest(43.60, 1.44, 5)] == [1]
+    grid.insert(1, 43.60, 1.44)  # déplacé
+    assert grid.nearest(43.60, 1.44, 1) == [(0.0, 1)]
+    assert len(grid) == 1 and len(grid.cells) == 1
+
+
+def test_haversine_one_degree_of_latitude():
+    assert haversine_m(0, 0, 1, 0) == pytest.approx(111_195, abs=1)
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth import VerifiedTokenCache, create_access_token, verify_token_cached
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache_ = VerifiedTokenCache(maxsize=2)
+    monkeypatch.setattr(auth, "token_cache", cache_)
+    return cache_
+
+
+def test_valid_token_is_decoded_once(cache, monkeypatch):
+    token = create_access_token({"sub": "1"})
+    calls = []
+    decode = auth.verify_token
+    monkeypatch.setattr(auth, "verify_token", lambda t: calls.append(t) or decode(t))
+    assert verify_token_cached(token)["sub"] == "1"
+    payload = verify_token_cached(token)
+    payload["sub"] = "2"  # copie : le payload gardé en cache ne change pas
+    assert verify_token_cached(token)["sub"] == "1"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_invalid_token_is_never_cached(cache):
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            verify_token_cached("pas.un.jwt")
+        assert error.value.status_code == 401
+    assert cache.stats()["size"] == 0
+
+
+def test_expired_entry_is_dropped(cache, monkeypatch):
+    token = create_access_token({"sub": "1"}, expires_delta=timedelta(minutes=5))
+    verify_token_cached(token)
+    now = auth.time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now + 600)
+    verify_token_cached(token)  # "exp" dépassé pour le cache : le token est décodé à nouveau
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 2
+
+
+def test_lru_is_bounded(cache):
+    tokens = [create_access_token({"sub": str(i)}) for i in range(3)]
+    for token in tokens:
+        verify_token_cached(token)
+    assert cache.stats()["size"] == 2
+    verify_token_cached(tokens[0])  # sorti du cache : décodé à nouveau
+    assert cache.stats()["misses"] == 4
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+from sqlmodel import Session
+
+import spatial
+import topology
+from models import Stop, TransportLine, categories
+from spatial import GridIndex
+
+LAT, LON = 43.6, 1.44
+
+
+def scatter(n, seed=5):
+    rnd = random.Random(seed)
+    return [(LAT + rnd.uniform(-0.05, 0.05), LON + rnd.uniform(-0.05, 0.05)) for _ in range(n)]
+
+
+def grid_of(points, cell_deg=0.01):
+    grid = GridIndex(cell_deg)
+    for i, (lat, lon) in enumerate(points):
+        grid.insert(i, lat, lon)
+    return grid
+
+
+@pytest.mark.parametrize("box", [(43.58, 1.42, 43.61, 1.46), (43.6, 1.44, 43.6001, 1.4401), (40, -5, 50, 10)])
+def test_in_bbox_matches_a_scan(box):
+    points = scatter(500)
+    min_lat, min_lon, max_lat, max_lon = box
+    expected = {i for i, (lat, lon) in enumerate(points) if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon}
+    assert set(grid_of(points).in_bbox(*box)) == expected
+
+
+@pytest.mark.parametrize("cluster_deg", [0.002, 0.05])  # plus petit / plus grand qu'une cellule
+def test_clusters_keep_every_stop(cluster_deg):
+    points = scatter(500)
+    clusters = grid_of(points).clusters(LAT - 0.1, LON - 0.1, LAT + 0.1, LON + 0.1, cluster_deg)
+    assert sum(n for _, _, n in clusters) == 500
+    assert len(clusters) < 500
+    for lat, lon, _ in clusters:
+        assert LAT - 0.05 <= lat <= LAT + 0.05 and LON - 0.05 <= lon <= LON + 0.05
+
+
+@pytest.fixture
+def network(engine):
+    points = scatter(300)
+    with Session(engine) as session:
+        session.add(categories(name="Bus"))
+        session.flush()
+        session.add(TransportLine(name="L1", category_id=1))
+        session.flush()
+        session.add_all(Stop(line_id=1, name=f"S{i}", latitude=lat, longitude=lon, stop_order=i)
+                        for i, (lat, lon) in enumerate(points))
+        session.commit()
+    topology.notify(topology.STOP)
+    return points
+
+
+def bbox(min_lat, min_lon, max_lat, max_lon):
+    return f"{min_lon},{min_lat},{max_lon},{max_lat}"
+
+
+def test_stops_at_high_zoom_and_clusters_at_low_zoom(client, network):
+    box = (LAT - 0.02, LON - 0.02, LAT + 0.02, LON + 0.02)
+    inside = {i + 1 for i, (lat, lon) in enumerate(network) if box[0] <= lat <= box[2] and box[1] <= lon <= box[3]}
+
+    view = client.get("/api/stops", params={"bbox": bbox(*box), "zoom": 16}).json()
+    assert not view["clustered"] and view["clusters"] == []
+    assert {stop["id"] for stop in view["stops"]} == inside
+
+    view = client.get("/api/stops", params={"bbox": bbox(*box), "zoom": 10}).json()
+    assert view["clustered"] and view["stops"] == []
+    assert sum(cluster["count"] for cluster in view["clusters"]) == len(inside)
+
+
+def test_too_many_stops_are_clustered_at_any_zoom(client, network, monkeypatch):
+    monkeypatch.setattr(spatial, "MAX_VIEWPORT_STOPS", 50)
+    view = client.get("/api/stops", params={"bbox": bbox(LAT - 1, LON - 1, LAT + 1, LON + 1), "zoom": 18}).json()
+    assert view["clustered"]
+    assert sum(cluster["count"] for cluster in view["clusters"]) == 300
+
+
+def test_viewport_follows_writes_and_answers_304(client, network):
+    params = {"bbox": bbox(LAT + 0.5, LON + 0.5, LAT + 0.6, LON + 0.6), "zoom": 16}
+    first = client.get("/api/stops", params=params)
+    assert first.json()["stops"] == []
+    assert client.get("/api/stops", params=params, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    client.post("/api/creat/stop", json={"line_id": 1, "name": "Nouveau", "latitude": LAT + 0.55,
+                                         "longitude": LON + 0.55, "stop_order": 300})
+    second = client.get("/api/stops", params=params, headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert [stop["name"] for stop in second.json()["stops"]] == ["Nouveau"]
+
+
+@pytest.mark.parametrize("value", ["1,2,3", "a,b,c,d", "2,0,1,1"])
+def test_invalid_bbox(client, value):
+    assert client.get("/api/stops", params={"bbox": value}).status_code == 400
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+import bench_writes
+import main
+
+
+def test_write_endpoints_round_trips(engine):
+    bench_writes.seed(engine)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    results = bench_writes.measure(client, engine)
+    problems = [
+        (label, status, sql + commits, expected, budget)
+        for label, status, sql, commits, expected, budget in results
+        if status != expected or sql + commits > budget
+    ]
+    assert not problems, "(endpoint, statut, allers-retours, statut attendu, max) : %r" % problems
@@ -0,0 +1,61 @@
+def create(client, url, body):
+    response = client.post(url, json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_duplicate_names_are_accepted_on_create(client):
+    assert create(client, "/api/creat/category", {"name": "Bus"}) != create(client, "/api/creat/category", {"name": "Bus"})
+    create(client, "/api/creat/line", {"name": "L1", "category_id": 1})
+    create(client, "/api/creat/line", {"name": "L1", "category_id": 1})
+    create(client, "/users", {"username": "alice", "email": "a@example.com", "password": "pw"})
+    create(client, "/users", {"username": "alice", "email": "b@example.com", "password": "pw"})
+
+
+def test_duplicate_email_is_refused(client):
+    create(client, "/users", {"username": "alice", "email": "a@example.com", "password": "pw"})
+    response = client.post("/users", json={"username": "bob", "email": "a@example.com", "password": "pw"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email déjà utilisé"
+
+
+def test_rename_to_a_name_in_use(client):
+    create(client, "/api/creat/category", {"name": "Bus"})
+    create(client, "/api/creat/category", {"name": "Tram"})
+    create(client, "/api/creat/line", {"name": "L1", "category_id": 1})
+    create(client, "/api/creat/line", {"name": "L2", "category_id": 1})
+    create(client, "/users", {"username": "alice", "email": "a@example.com", "password": "pw"})
+    create(client, "/users", {"username": "bob", "email": "b@example.com", "password": "pw"})
+
+    for url, body in (("/api/update/category/2", {"name": "Bus"}),
+                      ("/api/update/line/2", {"name": "L1"}),
+                      ("/update/users/2", {"username": "alice"})):
+        response = client.put(url, json=body)
+        assert response.status_code == 400, url
+        assert response.json()["detail"] == "le nom est déjà utilisé"
+    # garder son propre nom n'est pas un doublon
+    assert client.put("/api/update/line/1", json={"name": "L1", "start_time": "06:00"}).status_code == 200
+
+
+def test_update_unknown_or_missing_reference(client):
+    create(client, "/api/creat/category", {"name": "Bus"})
+    create(client, "/api/creat/line", {"name": "L1", "category_id": 1})
+    assert client.put("/api/update/line/99", json={"name": "L9"}).status_code == 404
+    assert client.put("/api/update/category/99", json={"name": "X"}).status_code == 404
+    assert client.put("/update/users/99", json={"username": "x"}).status_code == 404
+    response = client.put("/api/update/line/1", json={"category_id": 99})
+    assert (response.status_code, response.json()["detail"]) == (404, "Catégorie non trouvée")
+    response = client.post("/api/creat/line", json={"name": "L2", "category_id": 99})
+    assert (response.status_code, response.json()["detail"]) == (404, "Catégorie non trouvée")
+
+
+def test_batch_rename_to_a_name_in_use(client):
+    create(client, "/api/creat/category", {"name": "Bus"})
+    create(client, "/api/creat/line", {"name": "L1", "category_id": 1})
+    create(client, "/api/creat/line", {"name": "L2", "category_id": 1})
+    response = client.post("/api/batch", json={"operations": [
+        {"op": "update", "entity": "line", "id": 1, "data": {"name": "L1"}},
+        {"op": "update", "entity": "line", "id": 2, "data": {"name": "L1"}},
+    ]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == {"error": "le nom est déjà utilisé", "operations": [1]}
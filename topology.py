@@ -0,0 +1,95 @@
+# topology.py
+# Notification des écritures sur le réseau (catégories, lignes, arrêts).
+#
+# Les endpoints d'écriture (sync dans main.py et async dans routers/) appellent
+# notify() après leur commit ; les caches / index en mémoire s'abonnent avec
+# @on_change et se mettent à jour sans que les endpoints aient à les connaître.
+#
+# Attention : c'est local au process. Avec plusieurs workers uvicorn, seul le
+# worker qui a traité l'écriture est prévenu (les autres comptent sur leur TTL).
+import os
+import threading
+import time
+import uuid
+
+CATEGORY = "categories"
+LINE = "transportline"
+STOP = "stop"
+
+_listeners = []
+
+# Version de chaque table, incrémentée à chaque écriture : sert à construire les ETag
+_versions = {CATEGORY: 0, LINE: 0, STOP: 0}
+_versions_lock = threading.Lock()
+
+# Les compteurs repartent à 0 au redémarrage et ne sont pas partagés entre workers :
+# l'ETag contient donc un id de process, et une "époque" qui change toutes les
+# VERSION_TTL secondes pour borner le temps pendant lequel un autre worker
+# (pas prévenu de l'écriture) peut répondre 304 à tort
+_PROCESS_ID = uuid.uuid4().hex[:8]
+VERSION_TTL = float(os.environ.get("TOPOLOGY_CACHE_TTL", 300))
+
+
+def on_change(listener):
+    """Décorateur : listener(table, ids) est appelé après chaque écriture."""
+    _listeners.append(listener)
+    return listener
+
+
+def notify(table: str, ids=None):
+    # ids : ids modifiés si connus (None = on ne sait pas, tout peut avoir changé)
+    if ids is not None and not isinstance(ids, (list, tuple, set)):
+        ids = (ids,)
+    with _versions_lock:
+        _versions[table] += 1
+    for listener in _listeners:
+        listener(table, ids)
+
+
+def version(*tables) -> tuple:
+    return tuple(_versions[t] for t in tables)
+
+
+def etag(*tables) -> str:
+    """ETag fort pour une réponse qui ne dépend que des tables `tables`."""
+    epoch = int(time.time() // VERSION_TTL)
+    return '"%s-%d-%s"' % (_PROCESS_ID, epoch, ".".join(str(v) for v in version(*tables)))
+
+
+class DirtyTracker:
+    """Suit les ids modifiés d'une table pour mettre à jour un index en mémoire.
+
+    L'index appelle take() avant de répondre : full=True => tout recharger,
+    sinon seuls les ids renvoyés sont à relire en DB (insertion, modif ou suppression).
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self.full = True
+        self.ids = set()
+        self._lock = threading.Lock()
+        on_change(self._on_change)
+
+    def _on_change(self, table, ids):
+        if table != self.table:
+            return
+        with self._lock:
+            if ids is None:
+                self.full = True
+                self.ids.clear()
+            else:
+                self.ids.update(ids)
+
+    def pending(self) -> bool:
+        return self.full or bool(self.ids)
+
+    def take(self):
+        with self._lock:
+            full, ids = self.full, self.ids
+            self.full, self.ids = False, set()
+            return full, ids
+
+    def reset(self):
+        with self._lock:
+            self.full = True
+            self.ids = set()
@@ -0,0 +1,106 @@
+# writes.py
+# Outils communs aux endpoints d'écriture (sync dans main.py, async dans routers/).
+#
+# Les emails en double et les références vers une ligne / catégorie inexistante
+# ne sont plus vérifiés par un SELECT avant l'écriture : ce sont les contraintes
+# de la base (index unique, clefs étrangères) qui refusent l'INSERT / UPDATE, et
+# l'IntegrityError est traduite en la même réponse 400 / 404 qu'avant. Un
+# aller-retour de moins, et plus de course entre la vérification et l'écriture.
+#
+# Les noms (utilisateur, catégorie, ligne) ne sont pas uniques en base : une
+# création avec un nom déjà pris est acceptée, comme avant ; seul un renommage
+# vers le nom d'une autre ligne est refusé (check_name_free, un SELECT).
+from contextlib import contextmanager
+from datetime import time
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+# colonne unique -> message (les anciens messages des vérifications)
+UNIQUE_ERRORS = {
+    "users.email": "Email déjà utilisé",
+}
+NAME_TAKEN = "le nom est déjà utilisé"
+
+
+def integrity_http_error(exc: IntegrityError, foreign_key=None) -> HTTPException:
+    # SQLite : "UNIQUE constraint failed: users.email" / "FOREIGN KEY constraint failed"
+    # MariaDB : "Duplicate entry '...' for key 'ix_users_email'" / "... a foreign key constraint fails ..."
+    message = str(exc.orig)
+    for column, detail in UNIQUE_ERRORS.items():
+        if column in message or "ix_" + column.replace(".", "_") in message:
+            return HTTPException(status_code=400, detail=detail)
+    if foreign_key is not None and "foreign key" in message.lower():
+        return HTTPException(status_code=foreign_key[0], detail=foreign_key[1])
+    return HTTPException(status_code=400, detail="Contrainte de la base non respectée")
+
+
+@contextmanager
+def constraint_errors(foreign_key=None):
+    """IntegrityError -> HTTPException. foreign_key = (status, detail) si une clef étrangère est en jeu.
+
+    La session est abandonnée (rollback à la fermeture par get_session / get_async_session).
+    """
+    try:
+        yield
+    except IntegrityError as e:
+        raise integrity_http_error(e, foreign_key) from None
+
+
+def _other_with_name(model, column, values, row_id):
+    return select(model.id).where(getattr(model, column) == values[column], model.id != row_id).limit(1)
+
+
+def check_name_free(session, model, column, values: dict, row_id):
+    """400 si `values` renomme la ligne `row_id` avec le nom d'une autre ligne."""
+    if column in values and session.exec(_other_with_name(model, column, values, row_id)).first() is not None:
+        raise HTTPException(status_code=400, detail=NAME_TAKEN)
+
+
+async def acheck_name_free(session, model, column, values: dict, row_id):
+    if column in values and (await session.exec(_other_with_name(model, column, values, row_id))).first() is not None:
+        raise HTTPException(status_code=400, detail=NAME_TAKEN)
+
+
+def changes(update_api, *fields) -> dict:
+    """Champs fournis (non None) d'un schéma *Update, limités à `fields`."""
+    return {name: getattr(update_api, name) for name in fields if getattr(update_api, name) is not None}
+
+
+INVALID_TIME = "heure invalide (HH:MM attendu)"
+
+
+def parse_times(values: dict) -> dict:
+    # les heures arrivent en "HH:MM" (str) dans les schémas, la colonne attend un time
+    for name in ("start_time", "end_time"):
+        if isinstance(values.get(name), str):
+            try:
+                values[name] = time.fromisoformat(values[name])
+            except ValueError:
+                raise HTTPException(status_code=422, detail=INVALID_TIME) from None
+    return values
+
+
+def with_current(session, model, row_id, values: dict, fields) -> dict:
+    """`values` complété par les colonnes `fields` non modifiées, relues en DB seulement si besoin.
+
+    None si la ligne n'existe pas.
+    """
+    missing = [name for name in fields if name not in values]
+    if not missing:
+        return values
+    row = session.exec(select(*[getattr(model, name) for name in missing]).where(model.id == row_id)).first()
+    return None if row is None else {**values, **dict(zip(missing, row))}
+
+
+async def awith_current(session, model, row_id, values: dict, fields) -> dict:
+    missing = [name for name in fields if name not in values]
+    if not missing:
+        return values
+    row = (await session.exec(select(*[getattr(model, name) for name in missing]).where(model.id == row_id))).first()
+    return None if row is None else {**values, **dict(zip(missing, row))}
+
+
+def iso(value):
+    return value.isoformat() if value is not None and not isinstance(value, str) else value